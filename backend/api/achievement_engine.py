@@ -0,0 +1,222 @@
+"""
+Event-driven achievement evaluation.
+
+Achievements are indexed in memory by (requirement_type, requirement_category)
+so an event only evaluates the rules it can affect, and all progress changes
+for an event are written in bulk. Completions also re-check the level and
+attribute rules (they only read the user row), so achievements added to the
+catalog after a user already met them unlock on the next completion.
+"""
+import threading
+import time
+
+from django.db import IntegrityError, transaction
+
+from .models import Achievement, UserAchievement, HabitCompletion, ATTRIBUTE_NAMES
+from .read_models import read_models, ACHIEVEMENTS
+
+# Events raised by gameplay
+EVENT_COMPLETION = 'completion'
+EVENT_LEVEL_UP = 'level_up'
+EVENT_ATTRIBUTE_LEVEL_UP = 'attribute_level_up'
+EVENT_STREAK = 'streak'
+
+# Which requirement types each event can move
+EVENT_REQUIREMENT_TYPES = {
+    EVENT_COMPLETION: ('total_completions', 'level', 'attribute_level'),
+    EVENT_LEVEL_UP: ('level',),
+    EVENT_ATTRIBUTE_LEVEL_UP: ('attribute_level',),
+    EVENT_STREAK: ('streak',),
+}
+
+
+class AchievementIndex:
+    """In-process index of the achievement catalog, rebuilt on change or after a TTL"""
+
+    # Other worker processes pick up catalog edits (e.g. seed_achievements) after this long
+    TTL_SECONDS = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._rules = None
+
+    def _build(self):
+        rules = {}
+        for achievement in Achievement.objects.all():
+            key = (achievement.requirement_type, achievement.requirement_category or '')
+            rules.setdefault(key, []).append(achievement)
+        for achievements in rules.values():
+            achievements.sort(key=lambda a: a.requirement_value)
+        return rules
+
+    def get_rules(self, requirement_type, categories=('',)):
+        """Achievements of this type for the given categories ('' = any category)"""
+        with self._lock:
+            if self._rules is None or time.monotonic() - self._built_at > self.TTL_SECONDS:
+                self._rules = self._build()
+                self._built_at = time.monotonic()
+            rules = self._rules
+
+        matched = []
+        for category in categories:
+            matched.extend(rules.get((requirement_type, category), []))
+        return matched
+
+
+class AchievementEngine:
+    """Evaluates only the achievement rules touched by a set of events"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def _candidates(self, events, habit=None, attributes=()):
+        candidates = []
+        for event in events:
+            for requirement_type in EVENT_REQUIREMENT_TYPES.get(event, ()):
+                if requirement_type == 'streak':
+                    categories = ('', habit.category) if habit else ('',)
+                elif requirement_type == 'attribute_level':
+                    # A completion re-checks every attribute; a level-up only the ones that moved
+                    categories = tuple(ATTRIBUTE_NAMES) if event == EVENT_COMPLETION else tuple(attributes)
+                else:
+                    categories = ('',)
+                candidates.extend(self.index.get_rules(requirement_type, categories))
+        return candidates
+
+    def _current_value(self, user, achievement, habit, total_completions):
+        requirement_type = achievement.requirement_type
+        if requirement_type == 'streak':
+            return habit.streak if habit else 0
+        if requirement_type == 'attribute_level':
+            return getattr(user, achievement.requirement_category, 0)
+        if requirement_type == 'level':
+            return user.level
+        if requirement_type == 'total_completions':
+            return total_completions()
+        return 0
+
+    def _claim(self, user, to_create, to_update):
+        """
+        Write the unlocks and return the achievement ids this call actually claimed.
+
+        A concurrent evaluation for the same user may unlock the same rows; only
+        the insert or progress update that lands first counts, so its reward is
+        paid exactly once.
+        """
+        claimed = set()
+        if to_create:
+            try:
+                with transaction.atomic():
+                    UserAchievement.objects.bulk_create(to_create)
+                claimed.update(ua.achievement_id for ua in to_create)
+            except IntegrityError:
+                # Some were unlocked meanwhile; insert the rest one by one
+                for user_achievement in to_create:
+                    try:
+                        with transaction.atomic():
+                            user_achievement.save(force_insert=True)
+                        claimed.add(user_achievement.achievement_id)
+                    except IntegrityError:
+                        pass
+        for user_achievement in to_update:
+            if UserAchievement.objects.filter(
+                pk=user_achievement.pk, progress__lt=user_achievement.progress
+            ).update(progress=user_achievement.progress):
+                claimed.add(user_achievement.achievement_id)
+
+        if claimed:
+            # Bulk writes skip the model signals
+            read_models.invalidate(user.id, ACHIEVEMENTS)
+        return claimed
+
+    def evaluate(self, user, events, habit=None, attributes=(), save=True):
+        """
+        Evaluate the achievements affected by the given events.
+
+        Args:
+            user: The user the events happened to
+            events: Iterable of EVENT_* constants
+            habit: The habit involved (for completion/streak events)
+            attributes: Attribute names that leveled up (for attribute events)
+            save: Save reward XP on the user; pass False when the caller
+                saves the user row itself
+
+        Returns:
+            list: Achievements newly unlocked by these events
+        """
+        newly_unlocked = []
+        pending_events = set(events)
+        pending_attributes = set(attributes)
+        completion_count = {}
+
+        def total_completions():
+            # Counted at most once per evaluation, and only if a rule needs it
+            if 'value' not in completion_count:
+                completion_count['value'] = HabitCompletion.objects.filter(user=user).count()
+            return completion_count['value']
+
+        # Reward XP can itself level the user up, so re-run for the events it raises
+        while pending_events:
+            unlocked_ids = {a.id for a in newly_unlocked}
+            candidates = list({
+                a.id: a for a in self._candidates(pending_events, habit, pending_attributes)
+                if a.id not in unlocked_ids
+            }.values())
+            if not candidates:
+                break
+
+            existing = {
+                ua.achievement_id: ua
+                for ua in UserAchievement.objects.filter(
+                    user=user, achievement_id__in=[a.id for a in candidates]
+                )
+            }
+
+            to_create = []
+            to_update = []
+            unlocked = []
+            for achievement in candidates:
+                user_achievement = existing.get(achievement.id)
+                if user_achievement and user_achievement.progress >= achievement.requirement_value:
+                    continue
+
+                value = self._current_value(user, achievement, habit, total_completions)
+                if value < achievement.requirement_value:
+                    continue
+
+                if user_achievement:
+                    user_achievement.progress = achievement.requirement_value
+                    to_update.append(user_achievement)
+                else:
+                    to_create.append(UserAchievement(
+                        user=user, achievement=achievement, progress=achievement.requirement_value
+                    ))
+                unlocked.append(achievement)
+
+            claimed = self._claim(user, to_create, to_update)
+            unlocked = [a for a in unlocked if a.id in claimed]
+            if not unlocked:
+                break
+            newly_unlocked.extend(unlocked)
+
+            # Award all rewards at once and follow any level-ups it causes
+            level_before = user.level
+            reward_xp = sum(a.reward_xp for a in unlocked)
+            if save:
+                user.add_xp(reward_xp)
+            else:
+                user.apply_xp(reward_xp)
+            pending_events = {EVENT_LEVEL_UP} if user.level > level_before else set()
+            pending_attributes = set()
+
+        return newly_unlocked
+
+
+# Singleton instances
+achievement_index = AchievementIndex()
+achievement_engine = AchievementEngine(achievement_index)
@@ -0,0 +1,104 @@
+"""
+Cross-request micro-batching for AI difficulty scoring.
+
+Scoring requests are collected for a short window (or until the batch is
+full), sent as one structured prompt, and the parsed scores are handed back
+to each waiting caller. Cache lookups and stores happen on the caller's
+thread, so the flusher thread never touches the database.
+"""
+from concurrent.futures import Future
+import threading
+import time
+
+from django.conf import settings
+
+
+class DifficultyBatcher:
+    """Collects difficulty requests and scores them in batches on a flusher thread"""
+
+    def __init__(self, service, max_batch_size=None, window_ms=None):
+        self.service = service
+        self.max_batch_size = max_batch_size or getattr(settings, 'AI_BATCH_MAX_SIZE', 20)
+        self.window = (window_ms or getattr(settings, 'AI_BATCH_WINDOW_MS', 50)) / 1000
+        # Longest a caller waits for its batch before answering with the heuristic
+        self.wait_seconds = getattr(settings, 'AI_BATCH_WAIT_SECONDS', 30)
+        self._pending = []  # (habit tuple, future)
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit_many(self, habits):
+        """
+        Queue (habit_name, description, frequency) tuples together, so a group
+        lands in the same batch(es). Returns one Future per habit, resolving to
+        its difficulty or None.
+        """
+        futures = [Future() for _ in habits]
+        with self._condition:
+            self._pending.extend(zip(habits, futures))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ai-batcher', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return futures
+
+    def submit(self, habit_name, description, frequency):
+        """Queue a habit for scoring; returns a Future resolving to its difficulty or None"""
+        return self.submit_many([(habit_name, description, frequency)])[0]
+
+    def score(self, habit_name, description, frequency):
+        """Blocking helper: difficulty for one habit, batched with concurrent callers"""
+        return self.score_many([(habit_name, description, frequency)])[0]
+
+    def score_many(self, habits):
+        """Blocking helper: difficulties for a group of habits, in order"""
+        service = self.service
+        if not service.client or service.breaker.is_open():
+            # Nothing to batch (or the upstream is failing); the heuristic is instant
+            return [service._fallback_difficulty_calculation(*habit) for habit in habits]
+
+        scores = [service.cache.get(*habit) for habit in habits]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        futures = self.submit_many([habits[i] for i in missing])
+
+        deadline = time.monotonic() + self.wait_seconds
+        for i, future in zip(missing, futures):
+            remaining = max(0, deadline - time.monotonic())
+            difficulty = service.await_with_hedge(future, *habits[i], timeout=remaining)
+            if difficulty is None:
+                # Unparseable, failed or too slow: per-item heuristic, not cached
+                scores[i] = service._fallback_difficulty_calculation(*habits[i])
+            else:
+                service.cache.set(*habits[i], difficulty)
+                scores[i] = difficulty
+        return scores
+
+    def _take_batch(self):
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+
+            # Hold the window open for more callers unless the batch is already full
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            habits = [habit for habit, _ in batch]
+
+            try:
+                scores = self.service.request_batch_difficulties(habits)
+            except Exception as e:
+                print(f"[AI BATCHER] ERROR: Batch of {len(batch)} failed: {e}")
+                scores = [None] * len(batch)
+
+            for (_, future), score in zip(batch, scores):
+                future.set_result(score)
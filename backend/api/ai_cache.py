@@ -0,0 +1,120 @@
+"""
+Two-tier memoization for AI difficulty scores: an in-process LRU in front of
+the AIDifficultyScore table. Keys are normalized habit text, and entries are
+tied to the prompt version so editing the prompt invalidates old scores.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+
+def normalize_text(value):
+    """Lowercase, trim and collapse whitespace so trivial edits share a key"""
+    return re.sub(r'\s+', ' ', (value or '').strip().lower())
+
+
+def make_cache_key(habit_name, description, frequency):
+    normalized = '\x1f'.join(normalize_text(v) for v in (habit_name, description, frequency))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class DifficultyCache:
+    """In-process LRU backed by the database, with TTL and hit/miss counters"""
+
+    def __init__(self, prompt_version, max_entries=None, ttl_seconds=None):
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries or getattr(settings, 'AI_DIFFICULTY_CACHE_SIZE', 2048)
+        self.ttl_seconds = ttl_seconds or getattr(settings, 'AI_DIFFICULTY_CACHE_TTL', 30 * 24 * 3600)
+        self._entries = OrderedDict()  # key -> (difficulty, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _remember(self, key, difficulty, expires_at):
+        with self._lock:
+            self._entries[key] = (difficulty, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, habit_name, description, frequency):
+        """Cached difficulty for this habit text, or None on a miss"""
+        from api.models import AIDifficultyScore
+
+        key = make_cache_key(habit_name, description, frequency)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+
+        cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds)
+        row = AIDifficultyScore.objects.filter(
+            cache_key=key,
+            prompt_version=self.prompt_version,
+            created_at__gte=cutoff
+        ).only('difficulty', 'created_at').first()
+
+        if row is None:
+            self._count('misses')
+            return None
+
+        self._count('db_hits')
+        self._remember(key, row.difficulty, row.created_at.timestamp() + self.ttl_seconds)
+        return row.difficulty
+
+    def set(self, habit_name, description, frequency, difficulty):
+        """Store a fresh AI score in both tiers"""
+        from api.models import AIDifficultyScore
+
+        key = make_cache_key(habit_name, description, frequency)
+        self._remember(key, difficulty, time.time() + self.ttl_seconds)
+
+        try:
+            AIDifficultyScore.objects.update_or_create(
+                cache_key=key,
+                defaults={
+                    'prompt_version': self.prompt_version,
+                    'difficulty': difficulty,
+                    'habit_name': (habit_name or '')[:200],
+                    'frequency': frequency or '',
+                    'created_at': timezone.now(),
+                }
+            )
+        except IntegrityError:
+            # Another worker stored the same key first; its score is just as good
+            pass
+        self._count('stores')
+
+    def remember(self, habit_name, description, frequency, difficulty):
+        """Store a score in the in-process tier only (safe off the request thread)"""
+        key = make_cache_key(habit_name, description, frequency)
+        self._remember(key, difficulty, time.time() + self.ttl_seconds)
+
+    def clear_memory(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['db_hits']) / lookups, 4) if lookups else 0.0
+        stats['prompt_version'] = self.prompt_version
+        return stats
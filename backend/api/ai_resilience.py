@@ -0,0 +1,127 @@
+"""
+Failure handling for the AI upstream: a circuit breaker and latency histograms.
+
+After AI_BREAKER_FAILURE_THRESHOLD consecutive failed calls the breaker opens
+and callers go straight to the heuristic. After AI_BREAKER_RESET_SECONDS one
+trial call is let through (half-open): success closes the breaker, failure
+opens it again. Both classes are per process and thread-safe.
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Upper bounds (ms) of the latency buckets; anything slower lands in '+Inf'
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call"""
+
+    def __init__(self, failure_threshold=None, reset_seconds=None):
+        self.failure_threshold = failure_threshold or getattr(settings, 'AI_BREAKER_FAILURE_THRESHOLD', 5)
+        self.reset_seconds = reset_seconds or getattr(settings, 'AI_BREAKER_RESET_SECONDS', 30)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'short_circuited': 0}
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def is_open(self):
+        """True while calls would be short-circuited (doesn't claim the half-open trial)"""
+        with self._lock:
+            state = self._current_state()
+            return state == OPEN or (state == HALF_OPEN and self._trial_in_flight)
+
+    def allow(self):
+        """Claim permission for one upstream call"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats['short_circuited'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._stats['opened'] += 1
+                    print(f"[AI SERVICE] WARNING: Circuit breaker opened after {self._failures} failure(s)")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._current_state()
+            stats['consecutive_failures'] = self._failures
+            if stats['state'] == OPEN:
+                stats['retry_in_seconds'] = round(self.reset_seconds - (time.monotonic() - self._opened_at), 1)
+        stats['failure_threshold'] = self.failure_threshold
+        stats['reset_seconds'] = self.reset_seconds
+        return stats
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram (Prometheus style)"""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self._sum_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets_ms, elapsed_ms)] += 1
+            self._sum_ms += elapsed_ms
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            sum_ms = self._sum_ms
+
+        buckets, running = {}, 0
+        for bound, count in zip(self.buckets_ms + ('+Inf',), counts):
+            running += count
+            buckets[str(bound)] = running
+        total = running
+        return {
+            'count': total,
+            'sum_ms': round(sum_ms, 1),
+            'mean_ms': round(sum_ms / total, 1) if total else 0.0,
+            'buckets_ms': buckets,
+        }
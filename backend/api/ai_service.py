@@ -1,9 +1,73 @@
 """
 AI service for intelligent habit analysis and XP calculation
 """
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import partial
+import hashlib
+import json
 import os
+import threading
+import time
 from openai import OpenAI
 from django.conf import settings
+from .ai_cache import DifficultyCache
+from .ai_batching import DifficultyBatcher
+from .ai_resilience import CircuitBreaker, CircuitOpenError, LatencyHistogram
+
+MODEL = "gpt-4o-mini"  # Cost-effective model
+
+SYSTEM_PROMPT = "You are an expert habit coach analyzing task difficulty. Respond with only a single number from 1-10."
+
+PROMPT_TEMPLATE = """Analyze this habit and rate its difficulty on a scale of 1-10.
+
+Habit: {habit_name}
+Description: {description}
+Frequency: {frequency}
+
+Consider these factors:
+- Time commitment required
+- Physical/mental effort needed
+- Complexity of the task
+- Consistency required
+- Prerequisites or skills needed
+
+Response format: Return ONLY a single number from 1-10, where:
+1-2 = Very Easy (e.g., "Drink water", "Make bed")
+3-4 = Easy (e.g., "15min walk", "Read 10 pages")
+5-6 = Moderate (e.g., "30min workout", "Cook healthy meal")
+7-8 = Hard (e.g., "Run 5 miles", "Study 2 hours")
+9-10 = Very Hard (e.g., "Complete marathon training", "Write 3000 words")
+
+Return only the number, nothing else."""
+
+BATCH_SYSTEM_PROMPT = "You are an expert habit coach analyzing task difficulty. Respond with only a JSON array of integers from 1-10."
+
+BATCH_PROMPT_TEMPLATE = """Analyze each habit below and rate its difficulty on a scale of 1-10.
+
+{habits}
+
+Consider these factors:
+- Time commitment required
+- Physical/mental effort needed
+- Complexity of the task
+- Consistency required
+- Prerequisites or skills needed
+
+Scale:
+1-2 = Very Easy (e.g., "Drink water", "Make bed")
+3-4 = Easy (e.g., "15min walk", "Read 10 pages")
+5-6 = Moderate (e.g., "30min workout", "Cook healthy meal")
+7-8 = Hard (e.g., "Run 5 miles", "Study 2 hours")
+9-10 = Very Hard (e.g., "Complete marathon training", "Write 3000 words")
+
+Response format: Return ONLY a JSON array of exactly {count} integers, one per habit, in the same order (e.g. [3, 7, 5]). Nothing else."""
+
+BATCH_HABIT_TEMPLATE = "{index}. Habit: {habit_name} | Description: {description} | Frequency: {frequency}"
+
+# Cached scores are only reused while the model and prompts are unchanged
+PROMPT_VERSION = hashlib.sha256(
+    f"{MODEL}|{SYSTEM_PROMPT}|{PROMPT_TEMPLATE}|{BATCH_SYSTEM_PROMPT}|{BATCH_PROMPT_TEMPLATE}".encode()
+).hexdigest()[:16]
 
 
 class AIService:
@@ -12,8 +76,95 @@ class AIService:
     def __init__(self):
         # Initialize OpenAI client
         api_key = getattr(settings, 'OPENAI_API_KEY', os.getenv('OPENAI_API_KEY'))
-        self.client = OpenAI(api_key=api_key) if api_key else None
-        self.model = "gpt-4o-mini"  # Cost-effective model
+        # Hard per-call deadline; SDK retries would multiply it, so they're off by default
+        self.timeout = getattr(settings, 'AI_REQUEST_TIMEOUT', 10)
+        self.client = OpenAI(
+            api_key=api_key,
+            timeout=self.timeout,
+            max_retries=getattr(settings, 'AI_MAX_RETRIES', 0)
+        ) if api_key else None
+        self.model = MODEL
+        self.cache = DifficultyCache(PROMPT_VERSION)
+
+        # Upstream health: trip to the heuristic after repeated failures
+        self.breaker = CircuitBreaker()
+        self.latency = {'single': LatencyHistogram(), 'batch': LatencyHistogram()}
+        # Answer with the heuristic when the AI takes longer than this (0 = always wait)
+        self.hedge_ms = getattr(settings, 'AI_HEDGE_MS', 0)
+        self._hedge_executor = None
+        self._lock = threading.Lock()
+        self._stats = {'failures': 0, 'hedged': 0, 'timeouts': 0, 'late_scores': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _create_completion(self, kind, **kwargs):
+        """
+        Call the chat completions API through the circuit breaker.
+
+        Raises:
+            CircuitOpenError: The breaker is open; no call was made
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("circuit breaker is open")
+
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(timeout=self.timeout, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            self._count('failures')
+            raise
+        finally:
+            self.latency[kind].observe((time.perf_counter() - start) * 1000)
+
+        self.breaker.record_success()
+        return response
+
+    def _get_hedge_executor(self):
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'AI_HEDGE_WORKERS', 4),
+                    thread_name_prefix='ai-hedge'
+                )
+            return self._hedge_executor
+
+    def await_with_hedge(self, future, habit_name, description, frequency, timeout=None):
+        """
+        Wait for an AI score, but no longer than the hedge budget (when one is
+        set) or `timeout` seconds.
+
+        A score that arrives after the caller gave up is kept in the in-memory
+        cache only (this runs off the request thread, so no database access).
+
+        Returns:
+            int or None: The score, or None when the budget ran out
+        """
+        budget = self.hedge_ms / 1000 if self.hedge_ms else timeout
+        try:
+            return future.result(timeout=budget)
+        except FutureTimeout:
+            self._count('hedged' if self.hedge_ms else 'timeouts')
+            print(f"[AI SERVICE] WARNING: No AI answer within {budget * 1000:.0f}ms - using heuristic")
+            future.add_done_callback(partial(self._remember_late_score, habit_name, description, frequency))
+            return None
+
+    def _remember_late_score(self, habit_name, description, frequency, future):
+        if future.exception() is None and future.result() is not None:
+            self.cache.remember(habit_name, description, frequency, future.result())
+            self._count('late_scores')
+
+    def resilience_stats(self):
+        """Breaker state, latency histograms and hedge counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['timeout_seconds'] = self.timeout
+        stats['hedge_ms'] = self.hedge_ms
+        stats['breaker'] = self.breaker.stats()
+        stats['latency'] = {kind: histogram.snapshot() for kind, histogram in self.latency.items()}
+        return stats
 
     def calculate_habit_difficulty(self, habit_name, description, frequency):
         """
@@ -32,59 +183,158 @@ class AIService:
             print("[AI SERVICE] WARNING: No API key found - using fallback heuristic")
             return self._fallback_difficulty_calculation(habit_name, description, frequency)
 
+        # Identical habits ("Drink 8 Glasses of Water") reuse an earlier score
+        cached = self.cache.get(habit_name, description, frequency)
+        if cached is not None:
+            print(f"[AI SERVICE] Cache hit for '{habit_name}': {cached}/10")
+            return cached
+
         try:
             print(f"[AI SERVICE] Analyzing habit: '{habit_name}'")
             print(f"   Description: '{description or 'No description'}'")
             print(f"   Frequency: {frequency}")
 
-            prompt = f"""Analyze this habit and rate its difficulty on a scale of 1-10.
+            if self.hedge_ms:
+                future = self._get_hedge_executor().submit(
+                    self._request_difficulty, habit_name, description, frequency
+                )
+                difficulty = self.await_with_hedge(future, habit_name, description, frequency)
+                if difficulty is None:
+                    return self._fallback_difficulty_calculation(habit_name, description, frequency)
+            else:
+                difficulty = self._request_difficulty(habit_name, description, frequency)
 
-Habit: {habit_name}
-Description: {description or "No description provided"}
-Frequency: {frequency}
+            print(f"[AI SERVICE] SUCCESS: AI returned difficulty: {difficulty}/10")
 
-Consider these factors:
-- Time commitment required
-- Physical/mental effort needed
-- Complexity of the task
-- Consistency required
-- Prerequisites or skills needed
+            # Only real AI scores are cached; heuristic fallbacks are cheap to redo
+            self.cache.set(habit_name, description, frequency, difficulty)
 
-Response format: Return ONLY a single number from 1-10, where:
-1-2 = Very Easy (e.g., "Drink water", "Make bed")
-3-4 = Easy (e.g., "15min walk", "Read 10 pages")
-5-6 = Moderate (e.g., "30min workout", "Cook healthy meal")
-7-8 = Hard (e.g., "Run 5 miles", "Study 2 hours")
-9-10 = Very Hard (e.g., "Complete marathon training", "Write 3000 words")
+            return difficulty
 
-Return only the number, nothing else."""
+        except CircuitOpenError:
+            print("[AI SERVICE] WARNING: Circuit breaker open - using fallback heuristic")
+            return self._fallback_difficulty_calculation(habit_name, description, frequency)
+
+        except Exception as e:
+            print(f"[AI SERVICE] ERROR: AI calculation failed: {e}")
+            print(f"[AI SERVICE] WARNING: Falling back to heuristic")
+            # Fallback to heuristic
+            return self._fallback_difficulty_calculation(habit_name, description, frequency)
+
+    def _request_difficulty(self, habit_name, description, frequency):
+        """One chat completion for one habit. No cache or database access."""
+        prompt = PROMPT_TEMPLATE.format(
+            habit_name=habit_name,
+            description=description or "No description provided",
+            frequency=frequency
+        )
+
+        response = self._create_completion(
+            'single',
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,  # Lower temperature for more consistent scoring
+            max_tokens=10
+        )
+
+        # Parse the response and keep it in the valid range
+        difficulty = int(response.choices[0].message.content.strip())
+        return max(1, min(10, difficulty))
+
+    def calculate_habit_difficulties(self, habits):
+        """
+        Score many habits with a single chat completion.
+
+        Args:
+            habits: List of (habit_name, description, frequency) tuples
+
+        Returns:
+            list: Difficulty scores (1-10), in the same order as habits
+        """
+        if not self.client:
+            print("[AI SERVICE] WARNING: No API key found - using fallback heuristic")
+            return [self._fallback_difficulty_calculation(*habit) for habit in habits]
+
+        # Serve what we can from the cache and only send the misses
+        scores = [self.cache.get(*habit) for habit in habits]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if not missing:
+            return scores
+
+        parsed = self.request_batch_difficulties([habits[i] for i in missing])
+
+        for i, difficulty in zip(missing, parsed):
+            if difficulty is None:
+                # Per-item heuristic for anything the model didn't answer cleanly
+                scores[i] = self._fallback_difficulty_calculation(*habits[i])
+            else:
+                scores[i] = difficulty
+                self.cache.set(*habits[i], difficulty)
 
-            response = self.client.chat.completions.create(
+        return scores
+
+    def request_batch_difficulties(self, habits):
+        """
+        Send one structured prompt for a batch of habits. No cache or database access.
+
+        Returns:
+            list: Difficulty per habit, or None where the response couldn't be used
+        """
+        try:
+            print(f"[AI SERVICE] Analyzing {len(habits)} habit(s) in one batch")
+
+            listing = "\n".join(
+                BATCH_HABIT_TEMPLATE.format(
+                    index=n,
+                    habit_name=habit_name,
+                    description=description or "No description provided",
+                    frequency=frequency
+                )
+                for n, (habit_name, description, frequency) in enumerate(habits, 1)
+            )
+            prompt = BATCH_PROMPT_TEMPLATE.format(habits=listing, count=len(habits))
+
+            response = self._create_completion(
+                'batch',
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are an expert habit coach analyzing task difficulty. Respond with only a single number from 1-10."},
+                    {"role": "system", "content": BATCH_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,  # Lower temperature for more consistent scoring
-                max_tokens=10
+                temperature=0.3,
+                max_tokens=10 + 4 * len(habits)
             )
 
-            # Parse the response
-            difficulty_str = response.choices[0].message.content.strip()
-            difficulty = int(difficulty_str)
-
-            # Ensure it's in valid range
-            difficulty = max(1, min(10, difficulty))
-
-            print(f"[AI SERVICE] SUCCESS: AI returned difficulty: {difficulty}/10")
-
-            return difficulty
-
+            scores = self._parse_batch_scores(response.choices[0].message.content, len(habits))
+            print(f"[AI SERVICE] SUCCESS: Batch returned difficulties: {scores}")
+            return scores
         except Exception as e:
-            print(f"[AI SERVICE] ERROR: AI calculation failed: {e}")
-            print(f"[AI SERVICE] WARNING: Falling back to heuristic")
-            # Fallback to heuristic
-            return self._fallback_difficulty_calculation(habit_name, description, frequency)
+            print(f"[AI SERVICE] ERROR: Batch AI calculation failed: {e}")
+            return [None] * len(habits)
+
+    def _parse_batch_scores(self, content, count):
+        """Parse a JSON array of scores; returns a list of ints or Nones (unparseable)"""
+        try:
+            start, end = content.index('['), content.rindex(']') + 1
+            values = json.loads(content[start:end])
+        except (ValueError, AttributeError):
+            print(f"[AI SERVICE] WARNING: Could not parse batch response: {content!r}")
+            return [None] * count
+
+        if not isinstance(values, list) or len(values) != count:
+            print(f"[AI SERVICE] WARNING: Expected {count} scores, got: {content!r}")
+            return [None] * count
+
+        scores = []
+        for value in values:
+            try:
+                scores.append(max(1, min(10, int(value))))
+            except (TypeError, ValueError):
+                scores.append(None)
+        return scores
 
     def _fallback_difficulty_calculation(self, habit_name, description, frequency):
         """
@@ -146,5 +396,6 @@ Return only the number, nothing else."""
         return final_xp
 
 
-# Singleton instance
+# Singleton instances
 ai_service = AIService()
+difficulty_batcher = DifficultyBatcher(ai_service)
@@ -0,0 +1,146 @@
+"""
+Endpoint benchmarks with committed budgets.
+
+Each hot endpoint is called against a generated dataset and measured for wall
+time (median of several calls), database queries and peak Python allocation.
+Measurements are cold: the user's cached read models are invalidated before
+every measured call. Endpoints served from read models are measured warm as
+well, under "<name>_warm". The results are compared with
+benchmark_budgets.json; see the run_benchmarks management command.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .read_models import read_models
+
+BUDGET_PATH = Path(__file__).with_name('benchmark_budgets.json')
+
+# Dataset sizes passed to generate_dataset
+SCALES = {
+    'small': {'users': 200, 'habits_per_user': 8, 'completions_per_habit': 30},
+    'medium': {'users': 2000, 'habits_per_user': 10, 'completions_per_habit': 50},
+    'large': {'users': 20000, 'habits_per_user': 10, 'completions_per_habit': 50},
+}
+
+# (name, method, path, request body builder or None); writes are rolled back after each call
+ENDPOINTS = [
+    ('stats', 'get', '/api/game/stats/', None),
+    ('stats_detailed', 'get', '/api/game/stats/detailed/', None),
+    ('habits_today', 'get', '/api/game/habits/today/', None),
+    ('habits_complete', 'post', '/api/game/habits/complete/', lambda ctx: {'habit_id': ctx['habit_id']}),
+    ('equipment', 'get', '/api/game/equipment/', None),
+    ('equipped', 'get', '/api/game/equipment/equipped/', None),
+    ('achievements', 'get', '/api/game/achievements/', None),
+    ('leaderboard', 'get', '/api/game/stats/leaderboard/', None),
+    ('checkin_history', 'get', '/api/game/daily-checkin/history/', None),
+    ('tower_start', 'post', '/api/game/tower/start_floor/', None),
+    ('tower_complete', 'post', '/api/game/tower/complete_floor/', None),
+]
+
+# Endpoints answered from per-user read models (also measured with a warm cache)
+CACHED_ENDPOINTS = {'stats', 'stats_detailed', 'equipped', 'achievements'}
+
+# Headroom applied when writing budgets from a measured run
+TIME_HEADROOM = 3.0
+MEMORY_HEADROOM = 2.0
+MIN_TIME_BUDGET_MS = 20
+
+
+def _call(client, method, path, data):
+    """One request; writes are undone so every call sees the same state"""
+    with transaction.atomic():
+        response = getattr(client, method)(path, data, format='json')
+        if method != 'get':
+            transaction.set_rollback(True)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {path} returned {response.status_code}: {response.data}")
+    return response
+
+
+def measure_endpoint(client, method, path, data=None, repeats=5, before_call=None):
+    """
+    before_call runs (untimed) ahead of every measured call, e.g. to drop caches.
+
+    Returns:
+        dict: ms (median wall time), queries, peak_kb (peak traced allocation)
+    """
+    prepare = before_call or (lambda: None)
+    _call(client, method, path, data)  # Warm up lazy setup
+
+    timings = []
+    for _ in range(repeats):
+        prepare()
+        start = time.perf_counter()
+        _call(client, method, path, data)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Allocation tracing slows everything down, so it gets its own call
+    prepare()
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            _call(client, method, path, data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'ms': round(statistics.median(timings), 2),
+        'queries': len(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_endpoints(client, context, repeats=5):
+    """Cold results for every endpoint, plus "<name>_warm" for the cached ones"""
+    def drop_read_models():
+        read_models.invalidate(context['user_id'])
+
+    results = {}
+    for name, method, path, build_data in ENDPOINTS:
+        data = build_data(context) if build_data else None
+        results[name] = measure_endpoint(client, method, path, data, repeats, before_call=drop_read_models)
+        if name in CACHED_ENDPOINTS:
+            results[f'{name}_warm'] = measure_endpoint(client, method, path, data, repeats)
+    return results
+
+
+def load_budgets():
+    if not BUDGET_PATH.exists():
+        return {}
+    return json.loads(BUDGET_PATH.read_text())
+
+
+def save_budgets(budgets):
+    BUDGET_PATH.write_text(json.dumps(budgets, indent=2, sort_keys=True) + '\n')
+
+
+def budgets_from_results(results):
+    """Budgets for one scale: exact query counts, headroom on time and memory"""
+    return {
+        name: {
+            'max_queries': measured['queries'],
+            'max_ms': max(MIN_TIME_BUDGET_MS, round(measured['ms'] * TIME_HEADROOM)),
+            'max_peak_kb': round(measured['peak_kb'] * MEMORY_HEADROOM),
+        }
+        for name, measured in results.items()
+    }
+
+
+def check_budgets(results, budgets):
+    """List of human-readable budget violations (empty if everything fits)"""
+    violations = []
+    for name, measured in results.items():
+        budget = budgets.get(name)
+        if budget is None:
+            continue
+        for metric, limit_key in (('queries', 'max_queries'), ('ms', 'max_ms'), ('peak_kb', 'max_peak_kb')):
+            if measured[metric] > budget[limit_key]:
+                violations.append(f"{name}: {metric} {measured[metric]} > budget {budget[limit_key]}")
+    return violations
@@ -0,0 +1,121 @@
+"""
+Bitset-backed daily check-in calendar.
+
+Each CheckInCalendar row holds one year of check-ins as a 46-byte bitset
+(bit N = day N + 1 of the year). A user's years are stitched into a single
+integer mask over day ordinals, so "checked in today" is one bit test and
+streaks are a few shifts instead of a date-by-date walk.
+"""
+from datetime import date, timedelta
+
+from .models import CheckInCalendar
+
+
+def _day_bit(day):
+    """(byte index, bit mask) for a date within its year's bitset"""
+    index = day.timetuple().tm_yday - 1
+    return index // 8, 1 << (index % 8)
+
+
+def encode_days(days):
+    """Bitset bytes for an iterable of dates within one year"""
+    bits = bytearray(CheckInCalendar.BITSET_BYTES)
+    for day in days:
+        byte, mask = _day_bit(day)
+        bits[byte] |= mask
+    return bytes(bits)
+
+
+def mark_checked_in(user, day):
+    """
+    Set the bit for `day`. Must run inside a transaction.
+
+    Returns:
+        bool: False if the user had already checked in that day
+    """
+    calendar, _ = CheckInCalendar.objects.select_for_update().get_or_create(user=user, year=day.year)
+    bits = bytearray(calendar.days)
+    byte, mask = _day_bit(day)
+    if bits[byte] & mask:
+        return False
+
+    bits[byte] |= mask
+    CheckInCalendar.objects.filter(pk=calendar.pk).update(days=bytes(bits))
+    return True
+
+
+def has_checked_in(user, day):
+    """Whether the user checked in on `day` (one indexed lookup, one bit test)"""
+    bits = CheckInCalendar.objects.filter(user=user, year=day.year).values_list('days', flat=True).first()
+    if bits is None:
+        return False
+    byte, mask = _day_bit(day)
+    return bool(bits[byte] & mask)
+
+
+def _load_mask(user):
+    """
+    All of a user's check-ins as one integer.
+
+    Returns:
+        tuple: (mask, base ordinal); bit i is date.fromordinal(base + i)
+    """
+    rows = list(CheckInCalendar.objects.filter(user=user).order_by('year').values_list('year', 'days'))
+    if not rows:
+        return 0, 0
+
+    base = date(rows[0][0], 1, 1).toordinal()
+    mask = 0
+    for year, bits in rows:
+        mask |= int.from_bytes(bits, 'little') << (date(year, 1, 1).toordinal() - base)
+    return mask, base
+
+
+def _longest_run(mask):
+    """Length of the longest run of set bits"""
+    length = 0
+    while mask:
+        mask &= mask >> 1
+        length += 1
+    return length
+
+
+def _run_ending_at(mask, index):
+    """Length of the run of set bits ending at `index` (walking back in time)"""
+    if index < 0:
+        return 0
+    window = (1 << (index + 1)) - 1
+    gaps = ~mask & window
+    return index + 1 if not gaps else index - gaps.bit_length() + 1
+
+
+def checkin_summary(user, today, days=365):
+    """
+    Calendar data for the contribution view.
+
+    Returns:
+        dict: checkin_dates (ISO dates since `days` ago), checked_in_today,
+        total_checkins, current_streak, longest_streak
+    """
+    mask, base = _load_mask(user)
+    today_index = today.toordinal() - base
+    checked_in_today = today_index >= 0 and bool(mask >> today_index & 1)
+
+    # A streak is still alive until the end of the day after the last check-in
+    current_streak = _run_ending_at(mask, today_index if checked_in_today else today_index - 1)
+
+    start_index = max(0, (today - timedelta(days=days)).toordinal() - base)
+    window = mask >> start_index
+    checkin_dates = []
+    while window:
+        offset = (window & -window).bit_length() - 1
+        checkin_dates.append(date.fromordinal(base + start_index + offset).isoformat())
+        window &= window - 1
+
+    return {
+        'checkin_dates': checkin_dates,
+        'checked_in_today': checked_in_today,
+        'total_checkins': len(checkin_dates),
+        'current_streak': current_streak,
+        'longest_streak': _longest_run(mask),
+    }
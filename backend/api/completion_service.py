@@ -0,0 +1,113 @@
+"""
+Habit completion pipeline.
+
+Everything a completion touches (the completion row, the habit streak, the
+user's XP/levels and achievement progress) is written in one transaction,
+with the user and habit rows locked and each row written once.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Habit, HabitCompletion, ATTRIBUTE_NAMES
+from .achievement_engine import (
+    achievement_engine, EVENT_COMPLETION, EVENT_LEVEL_UP,
+    EVENT_ATTRIBUTE_LEVEL_UP, EVENT_STREAK
+)
+from .leaderboard import record_rank_change
+
+# User columns a completion can change
+PROGRESS_FIELDS = [
+    'level', 'current_xp', 'next_level_xp', 'lifetime_xp', 'max_hp', 'current_hp',
+    *ATTRIBUTE_NAMES,
+    *[f"{attr}_xp" for attr in ATTRIBUTE_NAMES],
+]
+
+
+def calculate_completion_xp(habit, user):
+    """
+    XP for completing a habit: (base + level bonus) * streak multiplier.
+
+    Returns:
+        tuple: (final_xp, base_xp, level_bonus)
+    """
+    base_xp = habit.xp_reward
+    level_bonus = user.level * 5
+
+    # Streak Bonus: +2% per streak count (e.g., 50 streak = +100% = 2x multiplier)
+    streak_multiplier = 1 + (habit.streak * 0.02)
+
+    return int((base_xp + level_bonus) * streak_multiplier), base_xp, level_bonus
+
+
+def complete_habit(user, habit_id, notes=''):
+    """
+    Complete a habit for a user.
+
+    Raises:
+        Habit.DoesNotExist: If the habit isn't one of the user's
+        ValueError: If the habit was already completed today
+
+    Returns:
+        dict: completion, habit, the refreshed user and the XP breakdown
+    """
+    User = get_user_model()
+    today = timezone.now().date()
+
+    with transaction.atomic():
+        # Lock in a fixed order (user, then habit) so parallel completions queue
+        # up instead of overwriting each other's XP
+        locked_user = User.objects.select_for_update().get(pk=user.pk)
+        habit = Habit.objects.select_for_update().get(id=habit_id, user=locked_user)
+
+        if HabitCompletion.objects.filter(
+            habit=habit,
+            user=locked_user,
+            completed_at__date=today
+        ).exists():
+            raise ValueError("Habit already completed today")
+
+        final_xp, base_xp, level_bonus = calculate_completion_xp(habit, locked_user)
+
+        completion = HabitCompletion(
+            habit=habit,
+            user=locked_user,
+            xp_earned=final_xp,
+            notes=notes
+        )
+        completion.save(apply_rewards=False)
+
+        Habit.objects.filter(pk=habit.pk).update(streak=F('streak') + 1, updated_at=timezone.now())
+        habit.streak += 1
+
+        # Apply XP in memory; the user row is written once at the end
+        rank_before = (locked_user.level, locked_user.current_xp)
+        level_before = locked_user.level
+        attributes_before = {attr: getattr(locked_user, attr) for attr in ATTRIBUTE_NAMES}
+        locked_user.apply_xp(final_xp, habit.category)
+
+        events = [EVENT_COMPLETION, EVENT_STREAK]
+        if locked_user.level > level_before:
+            events.append(EVENT_LEVEL_UP)
+        leveled_attributes = [
+            attr for attr, level in attributes_before.items() if getattr(locked_user, attr) > level
+        ]
+        if leveled_attributes:
+            events.append(EVENT_ATTRIBUTE_LEVEL_UP)
+
+        unlocked = achievement_engine.evaluate(
+            locked_user, events, habit=habit, attributes=leveled_attributes, save=False
+        )
+
+        locked_user.save(update_fields=PROGRESS_FIELDS)
+        record_rank_change(locked_user.id, rank_before, (locked_user.level, locked_user.current_xp))
+
+    return {
+        'completion': completion,
+        'habit': habit,
+        'user': locked_user,
+        'base_xp': base_xp,
+        'level_bonus': level_bonus,
+        'unlocked_achievements': unlocked,
+    }
@@ -0,0 +1,96 @@
+"""
+Per-request database instrumentation.
+
+Every query a request runs is timed through a connection execute wrapper, so
+this works with DEBUG off. Queries are grouped by fingerprint (the SQL with
+literals and IN lists collapsed). When one fingerprint repeats past the
+threshold, the request is flagged as a likely N+1. Totals go out in a
+Server-Timing header, and flagged requests (or every request, when
+DB_INSTRUMENTATION_LOG_ALL is set) get one JSON log line.
+"""
+from collections import Counter
+import json
+import re
+import time
+
+from django.conf import settings
+from django.db import connection
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|\d+|\'[^\']*\')\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL with literals and placeholder lists normalized, so repeats of one query compare equal"""
+    sql = _STRING.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql.replace('%s', '?')).strip()
+
+
+class QueryRecorder:
+    """Execute wrapper counting queries, DB time and fingerprints"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        """Fingerprints run at least `threshold` times, most frequent first"""
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n >= threshold]
+
+
+class QueryInstrumentationMiddleware:
+    """Adds DB timing to every response and logs requests with repeated queries"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'DB_REPEATED_QUERY_THRESHOLD', 5)
+        self.log_all = getattr(settings, 'DB_INSTRUMENTATION_LOG_ALL', False)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.duration * 1000
+        repeated = recorder.repeated(self.threshold)
+
+        timings = [
+            f'db;dur={db_ms:.1f};desc="{recorder.count} queries"',
+            f'app;dur={total_ms:.1f}',
+        ]
+        if repeated:
+            timings.append(f'db-repeated;desc="{len(repeated)} repeated fingerprints"')
+        if response.has_header('Server-Timing'):
+            timings.insert(0, response['Server-Timing'])
+        response['Server-Timing'] = ', '.join(timings)
+
+        if repeated or self.log_all:
+            match = request.resolver_match
+            print("[DB] " + json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'queries': recorder.count,
+                'db_ms': round(db_ms, 1),
+                'total_ms': round(total_ms, 1),
+                'n_plus_one': bool(repeated),
+                'repeated': [{'sql': sql[:200], 'count': n} for sql, n in repeated],
+            }))
+
+        return response
@@ -1,10 +1,27 @@
 # backend/api/game_serializers.py
+import re
+from functools import lru_cache
 from rest_framework import serializers
 from .models import (
     CustomUser, Habit, HabitCompletion, Achievement,
     UserAchievement, Equipment, UserEquipment, DailyCheckIn,
     Enemy
 )
+from .loot import describe_loot
+
+
+@lru_cache(maxsize=512)
+def parse_required_level(unlock_requirement):
+    """Extract the level from an unlock requirement (e.g., "Unlocked at Level 4" -> 4)"""
+    match = re.search(r'Level\s+(\d+)', unlock_requirement or '', re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def get_unlocked_character_ids(level):
+    """Set of character ids unlocked at the given level"""
+    from api.game_views import get_available_characters
+    return {c['id'] for c in get_available_characters(level) if c['is_unlocked']}
+
 
 class EnemySerializer(serializers.ModelSerializer):
     class Meta:
@@ -24,7 +41,7 @@ class UserStatsSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = [
-            'id', 'level', 'current_hp', 'max_hp', 'current_xp', 'next_level_xp',
+            'id', 'level', 'current_hp', 'max_hp', 'current_xp', 'next_level_xp', 'lifetime_xp',
             'strength', 'intelligence', 'creativity', 'social', 'health',
             'strength_xp', 'intelligence_xp', 'creativity_xp', 'social_xp', 'health_xp',
             'selected_character', 'selected_theme', 'selected_appearance_id', 'selected_appearance'
@@ -44,20 +61,8 @@ class UserStatsSerializer(serializers.ModelSerializer):
 
     def _get_total_stat(self, user, stat_name):
         """Calculate total stat including equipment bonuses"""
-        base_stat = getattr(user, stat_name)
-
-        # Get all equipped items and sum their bonuses for this stat
-        equipped_items = UserEquipment.objects.filter(
-            user=user,
-            is_equipped=True
-        ).select_related('equipment')
-
-        total_bonus = 0
-        for user_eq in equipped_items:
-            stat_bonus = user_eq.equipment.stat_bonus or {}
-            total_bonus += stat_bonus.get(stat_name, 0)
-
-        return base_stat + total_bonus
+        # Bonuses are materialized on the user row, so this costs no queries
+        return user.get_total_stat(stat_name)
 
     def get_strength(self, obj):
         return self._get_total_stat(obj, 'strength')
@@ -82,11 +87,16 @@ class HabitSerializer(serializers.ModelSerializer):
     class Meta:
         model = Habit
         fields = [
-            'id', 'name', 'description', 'category', 'xp_reward',
+            'id', 'name', 'description', 'category', 'xp_reward', 'xp_status',
             'frequency', 'streak', 'is_active', 'completed_today', 'last_completed_at'
         ]
+        read_only_fields = ['xp_status']
 
     def get_completed_today(self, obj):
+        # Prefer the annotation from HabitViewSet.get_queryset
+        if hasattr(obj, 'completed_today'):
+            return obj.completed_today
+
         from django.utils import timezone
         today = timezone.now().date()
         return obj.completions.filter(
@@ -95,6 +105,9 @@ class HabitSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_last_completed_at(self, obj):
+        if hasattr(obj, 'last_completed_at'):
+            return obj.last_completed_at
+
         completion = obj.completions.filter(
             user=self.context['request'].user
         ).order_by('-completed_at').first()
@@ -123,11 +136,19 @@ class AchievementSerializer(serializers.ModelSerializer):
         ]
     
     def get_user_progress(self, obj):
+        progress_map = self.context.get('achievement_progress')
+        if progress_map is not None:
+            return progress_map.get(obj.id, 0)
+
         user = self.context['request'].user
         user_achievement = UserAchievement.objects.filter(user=user, achievement=obj).first()
         return user_achievement.progress if user_achievement else 0
     
     def get_is_unlocked(self, obj):
+        progress_map = self.context.get('achievement_progress')
+        if progress_map is not None:
+            return progress_map.get(obj.id, 0) >= obj.requirement_value
+
         user = self.context['request'].user
         return UserAchievement.objects.filter(
             user=user, 
@@ -152,16 +173,19 @@ class EquipmentSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
 
         # Check if user has this equipment in their inventory
-        has_equipment = UserEquipment.objects.filter(user=user, equipment=obj).exists()
-        if has_equipment:
+        inventory = self.context.get('inventory')
+        if inventory is not None:
+            if obj.id in inventory:
+                return True
+        elif UserEquipment.objects.filter(user=user, equipment=obj).exists():
             return True
 
         # For character-specific appearance items (armor)
         if obj.equipment_slot == 'armor' and obj.character_specific:
             # First check if the character itself is unlocked
-            from api.game_views import get_available_characters
-            available_chars = get_available_characters(user.level)
-            char_ids = [c['id'] for c in available_chars if c['is_unlocked']]
+            char_ids = self.context.get('unlocked_characters')
+            if char_ids is None:
+                char_ids = get_unlocked_character_ids(user.level)
 
             # Character must be unlocked first
             if obj.character_specific not in char_ids:
@@ -184,20 +208,70 @@ class EquipmentSerializer(serializers.ModelSerializer):
 
     def _check_level_requirement(self, unlock_requirement, user_level):
         """Check if user meets level requirement from unlock_requirement string"""
-        import re
-
-        # Extract level number from unlock requirement string (e.g., "Unlocked at Level 4" -> 4)
-        match = re.search(r'Level\s+(\d+)', unlock_requirement, re.IGNORECASE)
-        if match:
-            required_level = int(match.group(1))
+        required_level = parse_required_level(unlock_requirement)
+        if required_level is not None:
             return user_level >= required_level
 
         return False
     
     def get_is_equipped(self, obj):
+        inventory = self.context.get('inventory')
+        if inventory is not None:
+            return inventory.get(obj.id, False)
+
         user = self.context['request'].user
-        user_equipment = UserEquipment.objects.filter(user=user, equipment=obj).first()
-        return user_equipment.is_equipped if user_equipment else False
+        return UserEquipment.objects.filter(user=user, equipment=obj, is_equipped=True).exists()
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        if obj.is_loot_template:
+            # Show the user's rolled instance rather than the bare template
+            roll = self._get_loot_roll(obj)
+            if roll:
+                data.update(describe_loot(obj, roll['affix'], roll['rolled_stats'], roll['found_on_floor']))
+        return data
+
+    def _get_loot_roll(self, obj):
+        loot_rolls = self.context.get('loot_rolls')
+        if loot_rolls is not None:
+            return loot_rolls.get(obj.id)
+
+        user = self.context['request'].user
+        return UserEquipment.objects.filter(user=user, equipment=obj).values(
+            'affix', 'rolled_stats', 'found_on_floor'
+        ).first()
+
+
+def owned_equipment_data(user_equipment, context):
+    """EquipmentSerializer data for one inventory row, showing that row's roll and equipped state"""
+    loot_rolls = {}
+    if user_equipment.rolled_stats is not None:
+        loot_rolls[user_equipment.equipment_id] = {
+            'affix': user_equipment.affix,
+            'rolled_stats': user_equipment.rolled_stats,
+            'found_on_floor': user_equipment.found_on_floor,
+        }
+    context = {
+        **context,
+        'inventory': {user_equipment.equipment_id: user_equipment.is_equipped},
+        'loot_rolls': loot_rolls,
+    }
+    data = EquipmentSerializer(user_equipment.equipment, context=context).data
+    data['item_id'] = user_equipment.id
+    return data
+
+
+class InventoryItemSerializer(serializers.ModelSerializer):
+    """A row of the user's inventory with its (rolled) equipment"""
+    equipment = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserEquipment
+        fields = ['id', 'is_equipped', 'unlocked_at', 'equipment']
+
+    def get_equipment(self, obj):
+        # Rows can share a loot template, so each one brings its own roll
+        return owned_equipment_data(obj, self.context)
 
 
 class DailyCheckInSerializer(serializers.ModelSerializer):
@@ -3,21 +3,51 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.utils import timezone
-import random
-from django.db.models import Count, Sum, F, Q
+from django.db import transaction
+from django.db.models import Max, F, Exists, OuterRef, Subquery
 from .models import (
     Habit, HabitCompletion, Achievement,
     UserAchievement, Equipment, UserEquipment, DailyCheckIn,
-    Enemy, TowerProgress
+    Enemy, TowerProgress, ATTRIBUTE_NAMES
 )
+from .leaderboard import rank_snapshot
+from .read_models import read_models, STATS, EQUIPPED, ACHIEVEMENTS
+from .checkin_calendar import mark_checked_in, checkin_summary
+from .stats_rollup import category_stats, daily_activity
+from .tower_waves import wave_generator, new_wave_seed
+from .loot import grant_loot
+from .combat import simulate_floor, player_profile
+from .achievement_engine import achievement_engine, EVENT_LEVEL_UP
+from .completion_service import complete_habit
 from .game_serializers import (
     UserStatsSerializer, HabitSerializer, HabitCompletionSerializer,
     AchievementSerializer, EquipmentSerializer, CompleteHabitSerializer,
-    DailyCheckInSerializer, EnemySerializer
+    DailyCheckInSerializer, EnemySerializer, InventoryItemSerializer,
+    get_unlocked_character_ids, owned_equipment_data
 )
 
 
+LEADERBOARD_PAGE_SIZE = 100
+LEADERBOARD_MAX_PAGE_SIZE = 500
+INVENTORY_PAGE_SIZE = 50
+INVENTORY_MAX_PAGE_SIZE = 200
+
+
+def get_int_param(request, name, default, minimum=None, maximum=None):
+    """Parse an integer query param, clamped to [minimum, maximum]"""
+    try:
+        value = int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    if minimum is not None:
+        value = max(minimum, value)
+    if maximum is not None:
+        value = min(maximum, value)
+    return value
+
+
 def get_max_quests_for_level(level):
     """
     Calculate the maximum number of quests a user can create based on their level.
@@ -64,44 +94,84 @@ class UserStatsViewSet(viewsets.ViewSet):
 
     def list(self, request):
         """Get current user's game stats"""
-        serializer = UserStatsSerializer(request.user)
-        return Response(serializer.data)
+        return Response(self._cached_stats(request.user))
+
+    def _cached_stats(self, user):
+        return read_models.get_or_set(STATS, user.id, lambda: UserStatsSerializer(user).data)
 
     @action(detail=False, methods=['get'])
     def detailed(self, request):
         """Get detailed stats with recent completions"""
         user = request.user
-        stats = UserStatsSerializer(user).data
+        stats = self._cached_stats(user)
 
         # Get recent habit completions
         recent_completions = HabitCompletion.objects.filter(
             user=user
         ).select_related('habit')[:10]
 
-        # Get completion stats by category
-        category_stats = Habit.objects.filter(user=user).values('category').annotate(
-            total_habits=Count('id'),
-            total_completions=Count('completions'),
-            total_xp=Sum('completions__xp_earned')
-        )
-
         return Response({
             'stats': stats,
             'recent_completions': HabitCompletionSerializer(recent_completions, many=True).data,
-            'category_stats': category_stats
+            'category_stats': category_stats(user)
         })
 
+    @action(detail=False, methods=['get'])
+    def activity(self, request):
+        """
+        Get per-day completion totals for heatmaps and trends.
+        Query params: days (default 30, max 365)
+        """
+        days = get_int_param(request, 'days', 30, minimum=1, maximum=365)
+        return Response(daily_activity(request.user, timezone.now().date(), days))
+
     @action(detail=False, methods=['get'])
     def leaderboard(self, request):
-        """Get global leaderboard sorted by level and XP"""
+        """
+        Get a page of the global leaderboard sorted by level and XP.
+        Query params: page (default 1), page_size (default 100, max 500)
+        """
+        page = get_int_param(request, 'page', 1, minimum=1)
+        page_size = get_int_param(request, 'page_size', LEADERBOARD_PAGE_SIZE, minimum=1, maximum=LEADERBOARD_MAX_PAGE_SIZE)
+
+        entries = rank_snapshot.page((page - 1) * page_size, page_size)
+        response = Response(self._build_leaderboard_rows(entries))
+        response['X-Total-Count'] = len(rank_snapshot)
+        return response
+
+    @action(detail=False, methods=['get'], url_path='leaderboard/around-me')
+    def leaderboard_around_me(self, request):
+        """
+        Get the current user's rank plus the players ranked around them.
+        Query params: radius (default 5, max 50)
+        """
+        radius = get_int_param(request, 'radius', 5, minimum=0, maximum=50)
+        user = request.user
+
+        rank, total_players, entries = rank_snapshot.around(user.id, user.level, user.current_xp, radius)
+
+        return Response({
+            'rank': rank,
+            'total_players': total_players,
+            'players': self._build_leaderboard_rows(entries)
+        })
+
+    def _build_leaderboard_rows(self, entries):
+        """Join snapshot entries (rank, level, xp, user_id) to their user rows"""
         from django.contrib.auth import get_user_model
         User = get_user_model()
 
-        # Get all users sorted by level (descending) then XP (descending)
-        users = User.objects.all().order_by('-level', '-current_xp')
+        users = User.objects.only(
+            'id', 'username', 'display_name', 'level', 'current_xp', 'next_level_xp',
+            'max_hp', 'current_hp', *ATTRIBUTE_NAMES
+        ).in_bulk([user_id for _, _, _, user_id in entries])
 
         leaderboard_data = []
-        for rank, user in enumerate(users, 1):
+        for rank, _, _, user_id in entries:
+            user = users.get(user_id)
+            if user is None:
+                # Deleted since the snapshot was last updated
+                continue
             leaderboard_data.append({
                 'rank': rank,
                 'id': user.id,
@@ -119,7 +189,7 @@ class UserStatsViewSet(viewsets.ViewSet):
                 'health': user.health,
             })
 
-        return Response(leaderboard_data)
+        return leaderboard_data
 
     @action(detail=False, methods=['get'])
     def characters(self, request):
@@ -164,25 +234,29 @@ class UserStatsViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Update user's character and appearance selections
-        request.user.selected_character = character_id
-        request.user.selected_appearance = default_appearance
-        request.user.save()
+        with transaction.atomic():
+            # Update user's character and appearance selections
+            request.user.selected_character = character_id
+            request.user.selected_appearance = default_appearance
+            request.user.save()
 
-        # Update UserEquipment: unequip all armor, equip only the default appearance
-        UserEquipment.objects.filter(
-            user=request.user,
-            equipment__equipment_slot='armor'
-        ).update(is_equipped=False)
+            # Update UserEquipment: unequip all armor, equip only the default appearance
+            UserEquipment.objects.filter(
+                user=request.user,
+                equipment__equipment_slot='armor'
+            ).update(is_equipped=False)
 
-        user_equipment, created = UserEquipment.objects.get_or_create(
-            user=request.user,
-            equipment=default_appearance,
-            defaults={'is_equipped': True}
-        )
-        if not created:
-            user_equipment.is_equipped = True
-            user_equipment.save()
+            user_equipment, created = UserEquipment.objects.get_or_create(
+                user=request.user,
+                equipment=default_appearance,
+                defaults={'is_equipped': True}
+            )
+            if not created:
+                user_equipment.is_equipped = True
+                user_equipment.save()
+
+            # Armor swap changes the equipped set, so refresh the bonus vector
+            request.user.recalculate_equipment_bonuses()
 
         return Response({
             'message': f'Character changed to {character_id}',
@@ -244,7 +318,19 @@ class HabitViewSet(viewsets.ModelViewSet):
     serializer_class = HabitSerializer
 
     def get_queryset(self):
-        return Habit.objects.filter(user=self.request.user, is_active=True)
+        user = self.request.user
+        today = timezone.now().date()
+        user_completions = HabitCompletion.objects.filter(habit=OuterRef('pk'), user=user)
+
+        # Completion status is annotated so a page of habits costs a single query
+        return Habit.objects.filter(user=user, is_active=True).annotate(
+            completed_today=Exists(user_completions.filter(completed_at__date=today)),
+            last_completed_at=Subquery(
+                user_completions.order_by().values('habit').annotate(
+                    last=Max('completed_at')
+                ).values('last')[:1]
+            ),
+        )
 
     def create(self, request, *args, **kwargs):
         """Override create to handle errors gracefully"""
@@ -308,7 +394,11 @@ class HabitViewSet(viewsets.ModelViewSet):
         habit = self.get_object()
         if habit.user != self.request.user:
             raise PermissionError("You can only edit your own habits")
-        serializer.save()
+        if 'xp_reward' in serializer.validated_data:
+            # An explicit XP value wins over any pending AI score
+            serializer.save(xp_status='final')
+        else:
+            serializer.save()
 
     def destroy(self, request, *args, **kwargs):
         """Soft delete - set is_active to False"""
@@ -334,116 +424,32 @@ class HabitViewSet(viewsets.ModelViewSet):
             notes = serializer.validated_data.get('notes', '')
             
             try:
-                habit = Habit.objects.get(id=habit_id, user=request.user)
-                
-                # Check if already completed today
-                today = timezone.now().date()
-                if HabitCompletion.objects.filter(
-                    habit=habit,
-                    user=request.user,
-                    completed_at__date=today
-                ).exists():
-                    return Response(
-                        {'error': 'Habit already completed today'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Calculate XP with bonuses
-                base_xp = habit.xp_reward
-                level_bonus = request.user.level * 5
-
-                # Streak Bonus: +2% per streak count (e.g., 50 streak = +100% = 2x multiplier)
-                streak_multiplier = 1 + (habit.streak * 0.02)
-
-                # Calculate final XP
-                final_xp = int((base_xp + level_bonus) * streak_multiplier)
-
-                # Create completion record
-                completion = HabitCompletion.objects.create(
-                    habit=habit,
-                    user=request.user,
-                    xp_earned=final_xp,
-                    notes=notes
-                )
-
-                # Check for achievement progress
-                self._check_achievements(request.user, habit)
-
-                return Response({
-                    'message': 'Habit completed successfully',
-                    'xp_earned': completion.xp_earned,
-                    'base_xp': base_xp,
-                    'level_bonus': level_bonus,
-                    'streak_bonus_percent': int(habit.streak * 2),  # Show as percentage
-                    'new_streak': habit.streak,
-                    'user_stats': UserStatsSerializer(request.user).data
-                })
-                
+                # XP, streak, achievements and the completion row are written in one transaction
+                result = complete_habit(request.user, habit_id, notes)
             except Habit.DoesNotExist:
                 return Response(
                     {'error': 'Habit not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            except ValueError as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            habit = result['habit']
+            return Response({
+                'message': 'Habit completed successfully',
+                'xp_earned': result['completion'].xp_earned,
+                'base_xp': result['base_xp'],
+                'level_bonus': result['level_bonus'],
+                'streak_bonus_percent': int(habit.streak * 2),  # Show as percentage
+                'new_streak': habit.streak,
+                'user_stats': UserStatsSerializer(result['user']).data
+            })
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    def _check_achievements(self, user, habit):
-        """Check and update achievement progress for all achievement types"""
-        # Get all achievements to check against
-        achievements = Achievement.objects.all()
-
-        for achievement in achievements:
-            user_achievement, created = UserAchievement.objects.get_or_create(
-                user=user,
-                achievement=achievement,
-                defaults={'progress': 0}
-            )
-
-            # Skip if already unlocked
-            if user_achievement.progress >= achievement.requirement_value:
-                continue
-
-            new_progress = user_achievement.progress
-            unlocked = False
-
-            # Check based on achievement type
-            if achievement.requirement_type == 'streak':
-                # Check if this habit's streak meets the requirement
-                if not achievement.requirement_category or achievement.requirement_category == habit.category:
-                    if habit.streak >= achievement.requirement_value:
-                        new_progress = achievement.requirement_value
-                        unlocked = True
-
-            elif achievement.requirement_type == 'attribute_level':
-                # Check if user has reached the required attribute level
-                if hasattr(user, achievement.requirement_category):
-                    attr_level = getattr(user, achievement.requirement_category)
-                    if attr_level >= achievement.requirement_value:
-                        new_progress = achievement.requirement_value
-                        unlocked = True
-
-            elif achievement.requirement_type == 'level':
-                # Check if user has reached the required character level
-                if user.level >= achievement.requirement_value:
-                    new_progress = achievement.requirement_value
-                    unlocked = True
-
-            elif achievement.requirement_type == 'total_completions':
-                # Check if user has completed the required number of habits
-                total_completions = HabitCompletion.objects.filter(user=user).count()
-                if total_completions >= achievement.requirement_value:
-                    new_progress = achievement.requirement_value
-                    unlocked = True
-
-            # Update progress if it changed
-            if new_progress != user_achievement.progress:
-                user_achievement.progress = new_progress
-                user_achievement.save()
-
-                # Award XP if just unlocked
-                if unlocked:
-                    user.add_xp(achievement.reward_xp)
-    
     @action(detail=False, methods=['get'])
     def check_limit(self, request):
         """Check current quest limit and usage for the user"""
@@ -487,17 +493,26 @@ class AchievementViewSet(viewsets.ReadOnlyModelViewSet):
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
+        context['achievement_progress'] = self._get_progress_map()
         return context
+
+    def _get_progress_map(self):
+        """Load the user's progress rows once per request (achievement_id -> progress)"""
+        if not hasattr(self, '_progress_map'):
+            user = self.request.user
+            self._progress_map = read_models.get_or_set(ACHIEVEMENTS, user.id, lambda: dict(
+                UserAchievement.objects.filter(user=user).values_list('achievement_id', 'progress')
+            ))
+        return self._progress_map
     
     @action(detail=False, methods=['get'])
     def unlocked(self, request):
         """Get user's unlocked achievements"""
-        unlocked = UserAchievement.objects.filter(
-            user=request.user,
-            progress=F('achievement__requirement_value')
-        ).select_related('achievement')
-        
-        achievements = [ua.achievement for ua in unlocked]
+        progress_map = self._get_progress_map()
+        achievements = [
+            achievement for achievement in self.get_queryset().filter(id__in=progress_map.keys())
+            if progress_map[achievement.id] >= achievement.requirement_value
+        ]
         serializer = self.get_serializer(achievements, many=True)
         return Response(serializer.data)
 
@@ -507,11 +522,55 @@ class EquipmentViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = EquipmentSerializer
     queryset = Equipment.objects.all()
 
+    def get_queryset(self):
+        # Tower loot drops are listed per item by the inventory endpoint, not as catalog entries
+        return Equipment.objects.filter(is_loot_template=False)
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
+
+        # Request-scoped inventory index so the serializer doesn't query per item
+        # (catalog unlocks only: they are unique per user, unlike loot drops)
+        context['inventory'] = dict(
+            UserEquipment.objects.filter(user=self.request.user, found_on_floor__isnull=True).values_list(
+                'equipment_id', 'is_equipped'
+            )
+        )
+        context['unlocked_characters'] = get_unlocked_character_ids(self.request.user.level)
         return context
 
+    @action(detail=False, methods=['get'])
+    def inventory(self, request):
+        """
+        Get a page of the user's own items.
+        Query params: after (cursor from the previous page), limit (default 50, max 200),
+        slot, type, character, equipped (true/false)
+        """
+        limit = get_int_param(request, 'limit', INVENTORY_PAGE_SIZE, minimum=1, maximum=INVENTORY_MAX_PAGE_SIZE)
+        after = get_int_param(request, 'after', 0, minimum=0)
+
+        items = UserEquipment.objects.filter(user=request.user, id__gt=after).select_related('equipment')
+        params = request.query_params
+        if params.get('slot'):
+            items = items.filter(equipment__equipment_slot=params['slot'])
+        if params.get('type'):
+            items = items.filter(equipment__equipment_type=params['type'])
+        if params.get('character'):
+            items = items.filter(equipment__character_specific=params['character'])
+        if params.get('equipped') in ('true', 'false'):
+            items = items.filter(is_equipped=params['equipped'] == 'true')
+
+        # Fetch one extra row to know whether there is a next page
+        page = list(items.order_by('id')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        return Response({
+            'results': InventoryItemSerializer(page, many=True, context={'request': request}).data,
+            'next_cursor': page[-1].id if has_more else None
+        })
+
     def _check_level_requirement(self, unlock_requirement, user_level):
         """Check if user meets level requirement from unlock_requirement string"""
         import re
@@ -548,6 +607,7 @@ class EquipmentViewSet(viewsets.ReadOnlyModelViewSet):
         return False
 
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def equip(self, request, pk=None):
         """Equip or unequip an item"""
         equipment = self.get_object()
@@ -563,8 +623,25 @@ class EquipmentViewSet(viewsets.ReadOnlyModelViewSet):
         user_equipment, created = UserEquipment.objects.get_or_create(
             user=request.user,
             equipment=equipment,
+            found_on_floor=None,
             defaults={'is_equipped': True}
         )
+        return self._apply_equip(request, user_equipment, created)
+
+    @action(detail=False, methods=['post'], url_path=r'inventory/(?P<item_id>\d+)/equip')
+    @transaction.atomic
+    def equip_item(self, request, item_id=None):
+        """Equip or unequip one inventory item by its id (needed for tower loot, where drops share a template)"""
+        user_equipment = UserEquipment.objects.select_for_update().select_related('equipment').filter(
+            user=request.user, id=item_id
+        ).first()
+        if user_equipment is None:
+            return Response({'error': 'Item not found in your inventory'}, status=status.HTTP_404_NOT_FOUND)
+        return self._apply_equip(request, user_equipment, created=False)
+
+    def _apply_equip(self, request, user_equipment, created):
+        """Equip a new row, or toggle an existing one, keeping one equipped item per slot"""
+        equipment = user_equipment.equipment
 
         # If newly created, handle equipping logic
         if created:
@@ -594,6 +671,8 @@ class EquipmentViewSet(viewsets.ReadOnlyModelViewSet):
                     equipment__equipment_type=equipment.equipment_type
                 ).exclude(id=user_equipment.id).update(is_equipped=False)
 
+            request.user.recalculate_equipment_bonuses()
+
             return Response({
                 'message': f'Equipped {equipment.name}',
                 'is_equipped': user_equipment.is_equipped,
@@ -642,6 +721,7 @@ class EquipmentViewSet(viewsets.ReadOnlyModelViewSet):
                     ).exclude(id=user_equipment.id).update(is_equipped=False)
 
         user_equipment.save()
+        request.user.recalculate_equipment_bonuses()
 
         return Response({
             'message': f"{'Equipped' if user_equipment.is_equipped else 'Unequipped'} {equipment.name}",
@@ -652,14 +732,16 @@ class EquipmentViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def equipped(self, request):
         """Get currently equipped items"""
-        equipped = UserEquipment.objects.filter(
-            user=request.user,
-            is_equipped=True
-        ).select_related('equipment')
+        def build():
+            equipped = UserEquipment.objects.filter(
+                user=request.user,
+                is_equipped=True
+            ).select_related('equipment')
 
-        equipment_items = [ue.equipment for ue in equipped]
-        serializer = self.get_serializer(equipment_items, many=True)
-        return Response(serializer.data)
+            context = {'request': request, 'unlocked_characters': get_unlocked_character_ids(request.user.level)}
+            return [owned_equipment_data(user_equipment, context) for user_equipment in equipped]
+
+        return Response(read_models.get_or_set(EQUIPPED, request.user.id, build))
 
 
 class DailyCheckInViewSet(viewsets.ViewSet):
@@ -670,20 +752,19 @@ class DailyCheckInViewSet(viewsets.ViewSet):
         """Create a daily check-in for the user (100 XP per check-in)"""
         today = timezone.now().date()
 
-        # Check if user already checked in today
-        existing_checkin = DailyCheckIn.objects.filter(
-            user=request.user,
-            checked_in_at__date=today
-        ).first()
-
-        if existing_checkin:
-            return Response(
-                {'error': 'You have already checked in today. Come back tomorrow!'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        with transaction.atomic():
+            # Setting today's calendar bit doubles as the "already checked in" check
+            if not mark_checked_in(request.user, today):
+                return Response(
+                    {'error': 'You have already checked in today. Come back tomorrow!'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        # Create new check-in
-        checkin = DailyCheckIn.objects.create(user=request.user)
+            # Create new check-in
+            level_before = request.user.level
+            checkin = DailyCheckIn.objects.create(user=request.user)
+            if request.user.level > level_before:
+                achievement_engine.evaluate(request.user, [EVENT_LEVEL_UP])
 
         return Response({
             'message': 'Daily check-in successful! You earned 100 XP!',
@@ -694,30 +775,7 @@ class DailyCheckInViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def history(self, request):
         """Get daily check-in history for the past year (for contribution calendar)"""
-        from datetime import timedelta
-
-        # Get last 365 days of check-ins
-        start_date = timezone.now().date() - timedelta(days=365)
-        checkins = DailyCheckIn.objects.filter(
-            user=request.user,
-            checked_in_at__date__gte=start_date
-        ).order_by('checked_in_at')
-
-        # Format as list of dates for easier frontend processing
-        checkin_dates = [checkin.checked_in_at.date().isoformat() for checkin in checkins]
-
-        # Get today's check-in status
-        today = timezone.now().date()
-        checked_in_today = DailyCheckIn.objects.filter(
-            user=request.user,
-            checked_in_at__date=today
-        ).exists()
-
-        return Response({
-            'checkin_dates': checkin_dates,
-            'checked_in_today': checked_in_today,
-            'total_checkins': len(checkin_dates)
-        })
+        return Response(checkin_summary(request.user, timezone.now().date()))
 
 
 class TowerViewSet(viewsets.ViewSet):
@@ -728,76 +786,57 @@ class TowerViewSet(viewsets.ViewSet):
         """Start a floor and return enemies for waves"""
         user = request.user
         progress, _ = TowerProgress.objects.get_or_create(user=user)
-        
-        # Logic to generate enemies based on floor
         floor = progress.current_floor
-        enemies = []
-        
-        # Scaling logic
-        # HP: Exponential Growth (70 * 1.15^(floor-1))
-        base_hp = int(70 * (1.15 ** (floor - 1)))
-        
-        # Damage: Aggressive Linear (8 + 2.5*floor)
-        base_dmg = int(8 + (2.5 * floor))
-        
-        for i in range(5):  # 5 Waves
-            # Determine enemy type based on floor
-            if floor <= 3:
-                enemy_type = random.choice([
-                    {'name': 'Blue Slime', 'sprite': '/enemies/blue_slime.png'},
-                    {'name': 'Red Slime', 'sprite': '/enemies/red_slime.png'}
-                ])
-            else:
-                enemy_type = random.choice([
-                    {'name': 'Skeleton Warrior', 'sprite': '/enemies/skeleton_warrior.png'},
-                    {'name': 'Skeleton Captain', 'sprite': '/enemies/skeleton_captain.png'}
-                ])
-
-            enemy_data = {
-                'id': i + 1,  # Pseudo ID for the session
-                'name': f"{enemy_type['name']} {i+1}",
-                'level': floor,
-                'base_hp': base_hp + (i * 5),
-                'base_damage': base_dmg + i,
-                'sprite_path': enemy_type['sprite'],
-                'xp_reward': 20 * floor,
-                'gold_reward': 10 * floor
-            }
-            enemies.append(enemy_data)
-            
+
+        # Same attempt, same waves: repeated calls are served from the memo
         return Response({
             'floor': floor,
-            'waves': enemies
+            'waves': wave_generator.waves_for(user.id, floor, progress.wave_seed)
         })
 
     @action(detail=False, methods=['post'])
+    @transaction.atomic
     def complete_floor(self, request):
         """Complete the current floor and award rewards"""
         user = request.user
-        progress, _ = TowerProgress.objects.get_or_create(user=user)
-        
-        # In a real secure app, we'd verify the combat log or token.
-        # Here we trust the client for the "auto-battler" simulation.
+        # Locked so two concurrent claims can't both award the same floor
+        progress, _ = TowerProgress.objects.select_for_update().get_or_create(user=user)
         
         floor = progress.current_floor
+        waves = wave_generator.waves_for(user.id, floor, progress.wave_seed)
+
+        # Replay the floor server-side instead of trusting the client's result
+        combat = simulate_floor(waves, player_profile(user), seed=f"{user.id}:{floor}:{progress.wave_seed}")
+        if not combat['victory']:
+            print(f"[TOWER] Simulated loss on floor {floor} for user {user.id} "
+                  f"(cleared {combat['waves_cleared']}/{len(waves)} waves)")
+            if settings.TOWER_VERIFY_CLEARS:
+                # Counts as a defeat: the retry gets fresh waves instead of the same lost replay
+                wave_generator.forget(user.id, floor, progress.wave_seed)
+                progress.wave_seed = new_wave_seed()
+                progress.save(update_fields=['wave_seed'])
+                return Response(
+                    {'error': 'Floor clear could not be verified', 'defeat': True, 'combat': combat},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         
         # Social Scaling: Increase XP Reward
-        # Base: 20 * floor. +5% per Social point.
+        # Base: the final wave's reward (20 * floor by default). +5% per Social point.
         social_bonus = 1 + (user.social * 0.05)
-        xp_reward = int((20 * floor) * social_bonus)
+        xp_reward = int(waves[-1]['xp_reward'] * social_bonus)
         
         # Award XP
+        level_before = user.level
         user.add_xp(xp_reward)
+        if user.level > level_before:
+            achievement_engine.evaluate(user, [EVENT_LEVEL_UP])
         
-        # Generate Item Reward
-        reward_item = self._generate_random_equipment(floor)
-        user_equipment = UserEquipment.objects.create(
-            user=user,
-            equipment=reward_item,
-            is_equipped=False
-        )
+        # Generate Item Reward: a rolled drop of a fixed loot template
+        user_equipment = grant_loot(user, floor)
         
-        # Update Progress
+        # Update Progress (the next floor gets a fresh wave seed)
+        wave_generator.forget(user.id, floor, progress.wave_seed)
+        progress.wave_seed = new_wave_seed()
         progress.current_floor += 1
         if progress.current_floor > progress.highest_floor:
             progress.highest_floor = progress.current_floor
@@ -806,57 +845,8 @@ class TowerViewSet(viewsets.ViewSet):
         return Response({
             'message': f"Floor {floor} completed!",
             'xp_earned': xp_reward,
-            'item_reward': EquipmentSerializer(reward_item, context={'request': request}).data,
+            'item_reward': owned_equipment_data(user_equipment, {'request': request}),
+            'combat': combat,
             'next_floor': progress.current_floor,
             'user_stats': UserStatsSerializer(user).data
         })
-
-    def _generate_random_equipment(self, floor):
-        """Generate a random piece of equipment based on floor level"""
-        import random
-        
-        slots = ['weapon', 'helmet', 'chest', 'legs', 'feet']
-        slot = random.choice(slots)
-        
-        # Adjectives based on floor/power
-        prefixes = ['Rusty', 'Common', 'Sturdy', 'Polished', 'Fine', 'Superior', 'Epic', 'Legendary', 'Mythic', 'Godly']
-        prefix_index = min(len(prefixes) - 1, floor // 2)
-        prefix = prefixes[prefix_index]
-        
-        names = {
-            'weapon': ['Sword', 'Axe', 'Dagger', 'Staff', 'Mace'],
-            'helmet': ['Helm', 'Cap', 'Visor', 'Hood', 'Crown'],
-            'chest': ['Armor', 'Vest', 'Tunic', 'Plate', 'Robes'],
-            'legs': ['Greaves', 'Pants', 'Leggings', 'Kilt', 'Guards'],
-            'feet': ['Boots', 'Shoes', 'Sandals', 'Sabatons', 'Greaves']
-        }
-        base_name = random.choice(names[slot])
-        
-        # Generate Stats
-        stats = {}
-        attributes = ['strength', 'intelligence', 'creativity', 'social', 'health']
-        
-        # Number of stats increases with floor
-        num_stats = 1 + (floor // 5)
-        selected_attrs = random.sample(attributes, min(len(attributes), num_stats))
-        
-        for attr in selected_attrs:
-            # Stat value scales with floor
-            base_val = 1 + (floor // 2)
-            variance = random.randint(0, floor)
-            stats[attr] = base_val + variance
-
-        # Create Equipment
-        # Note: In a real game, we might reuse Equipment definitions to save DB space,
-        # but for this "looter" feel where every drop is unique, creating new entries is fine for this scale.
-        equipment = Equipment.objects.create(
-            name=f"{prefix} {base_name}",
-            equipment_type='outfit', # Simplified for now
-            equipment_slot=slot,
-            description=f"A {prefix.lower()} {base_name} found on floor {floor}.",
-            stat_bonus=stats,
-            gold_cost=floor * 50,
-            sprite_path=f"/equipment/{slot}/{base_name.lower()}.png" # Placeholder path
-        )
-        
-        return equipment
\ No newline at end of file
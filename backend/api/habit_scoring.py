@@ -0,0 +1,96 @@
+"""
+Background AI scoring for newly created habits.
+
+Habits are saved right away with a provisional heuristic XP. The AI score is
+computed by a small worker pool after the creating transaction commits, and
+written back with xp_status='final'. Habits created together (e.g. from the
+onboarding survey) are scheduled as one job, so they share AI batches.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'AI_SCORING_WORKERS', 4),
+                thread_name_prefix='habit-scoring'
+            )
+        return _executor
+
+
+def score_habit(habit_id):
+    """Compute the AI XP for a provisional habit and mark it final"""
+    from api.models import Habit
+
+    habit = Habit.objects.filter(pk=habit_id, xp_status='provisional').first()
+    if habit is None:
+        # Deleted, or already scored by someone else
+        return None
+
+    xp_reward = habit.calculate_xp_reward()
+
+    # Only overwrite a still-provisional value (the user may have edited it meanwhile)
+    Habit.objects.filter(pk=habit_id, xp_status='provisional').update(
+        xp_reward=xp_reward,
+        xp_status='final'
+    )
+    print(f"[HABIT SCORING] Habit {habit_id} scored: {xp_reward} XP")
+    return xp_reward
+
+
+def score_habits(habit_ids):
+    """Compute the AI XP for a group of provisional habits, submitted to the batcher together"""
+    from api.ai_service import ai_service, difficulty_batcher
+    from api.models import Habit
+
+    habits = list(Habit.objects.filter(pk__in=habit_ids, xp_status='provisional').order_by('pk'))
+    difficulties = difficulty_batcher.score_many(
+        [(habit.name, habit.description, habit.frequency) for habit in habits]
+    )
+
+    scored = 0
+    for habit, difficulty in zip(habits, difficulties):
+        xp_reward = ai_service.calculate_xp_from_difficulty(difficulty, habit.frequency)
+        scored += Habit.objects.filter(pk=habit.pk, xp_status='provisional').update(
+            xp_reward=xp_reward,
+            xp_status='final'
+        )
+    print(f"[HABIT SCORING] Scored {scored} of {len(habit_ids)} habit(s) as a group")
+    return scored
+
+
+def _run_in_worker(score, habit_ids):
+    close_old_connections()
+    try:
+        score(habit_ids)
+    except Exception as e:
+        print(f"[HABIT SCORING] ERROR: Could not score habit(s) {habit_ids}: {e}")
+    finally:
+        close_old_connections()
+
+
+def _schedule(score, arg):
+    if getattr(settings, 'AI_SCORING_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, score, arg))
+    else:
+        transaction.on_commit(lambda: score(arg))
+
+
+def schedule_habit_scoring(habit_id):
+    """Queue AI scoring for a habit once the current transaction commits"""
+    _schedule(score_habit, habit_id)
+
+
+def schedule_habits_scoring(habit_ids):
+    """Queue AI scoring for habits created together, as one group"""
+    if habit_ids:
+        _schedule(score_habits, list(habit_ids))
@@ -0,0 +1,292 @@
+"""
+Leaderboard rank snapshot.
+
+Ranks live in a compact, sorted array of (level, xp, user_id) records in a
+memory-mapped file, so every worker process shares one ranking. XP changes
+shift a single record into place; pages and "around me" lookups never scan
+the user table. If an update finds the snapshot out of sync with the
+database, it is marked stale and the next read rebuilds it.
+"""
+import bisect
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Sequence
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
+
+MAGIC = b'LBRS'
+HEADER = struct.Struct('<4sIII')  # magic, version, count, capacity
+RECORD = struct.Struct('<iiq')    # level, xp, user_id
+MIN_CAPACITY = 1024
+
+
+def rank_key(level, xp, user_id):
+    """Sort key: highest level first, then highest XP, then oldest account"""
+    return (-level, -xp, user_id)
+
+
+class _RecordView(Sequence):
+    """Read-only sequence of rank keys over the mapped records (for bisect)"""
+
+    def __init__(self, buf, count):
+        self.buf = buf
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        level, xp, user_id = RECORD.unpack_from(self.buf, HEADER.size + index * RECORD.size)
+        return rank_key(level, xp, user_id)
+
+
+class RankSnapshot:
+    """Sorted rank array shared across processes through a memory-mapped file"""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.RLock()
+        self._file = None
+        self._mm = None
+        self._inode = None
+
+    @property
+    def path(self):
+        return str(self._path or settings.LEADERBOARD_SNAPSHOT_PATH)
+
+    @property
+    def stale_path(self):
+        return self.path + '.stale'
+
+    def mark_stale(self):
+        """Flag the snapshot for a rebuild on the next read (by any worker)"""
+        open(self.stale_path, 'a').close()
+
+    def _claim_stale(self):
+        """True for exactly one caller after the snapshot was marked stale"""
+        try:
+            os.remove(self.stale_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @contextmanager
+    def _locked(self, exclusive=False):
+        """Thread lock plus an advisory file lock shared with other workers"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a+b') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+        self._mm = self._file = self._inode = None
+
+    def _map(self):
+        """Map the current snapshot file, remapping if it was rebuilt elsewhere"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            self._close()
+            return False
+
+        if self._mm is None or inode != self._inode:
+            self._close()
+            self._file = open(self.path, 'r+b')
+            self._mm = mmap.mmap(self._file.fileno(), 0)
+            self._inode = inode
+        return True
+
+    def _header(self):
+        _, version, count, capacity = HEADER.unpack_from(self._mm, 0)
+        return version, count, capacity
+
+    def _records(self):
+        return _RecordView(self._mm, self._header()[1])
+
+    def _read(self, index):
+        level, xp, user_id = RECORD.unpack_from(self._mm, HEADER.size + index * RECORD.size)
+        return level, xp, user_id
+
+    def _write_header(self, count):
+        version, _, capacity = self._header()
+        HEADER.pack_into(self._mm, 0, MAGIC, version + 1, count, capacity)
+
+    @contextmanager
+    def _reading(self):
+        """Shared-lock the snapshot for reading, building it on first use"""
+        if not os.path.exists(self.path):
+            self.rebuild()
+        elif self._claim_stale():
+            print("[LEADERBOARD] Rebuilding stale rank snapshot")
+            self.rebuild()
+        with self._locked():
+            if not self._map():
+                raise FileNotFoundError(self.path)
+            yield
+
+    def rebuild(self):
+        """
+        Rebuild the whole snapshot from the user table and swap it in atomically.
+
+        The exclusive lock is held from the read to the swap, so updates made
+        meanwhile wait and apply to the new file instead of the discarded one.
+        """
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+
+        with self._locked(exclusive=True):
+            # Drift noticed from here on applies to the data read below, so it must survive
+            self._claim_stale()
+            rows = User.objects.order_by('-level', '-current_xp', 'id').values_list('level', 'current_xp', 'id')
+            records = bytearray()
+            count = 0
+            for level, xp, user_id in rows.iterator(chunk_size=5000):
+                records += RECORD.pack(level, xp, user_id)
+                count += 1
+
+            # Leave headroom so new users can be inserted in place
+            capacity = max(MIN_CAPACITY, count * 2)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, 0, count, capacity))
+                f.write(records)
+                f.write(b'\0' * (capacity - count) * RECORD.size)
+
+            os.replace(tmp_path, self.path)
+            self._close()
+        return count
+
+    def _find(self, user_id, level, xp):
+        """Index of the user's record, or None if it isn't in the snapshot"""
+        records = self._records()
+        index = bisect.bisect_left(records, rank_key(level, xp, user_id))
+        if index < len(records) and self._read(index)[2] == user_id:
+            return index
+        return None
+
+    def update(self, user_id, old, new):
+        """
+        Move a user's record after an XP change.
+
+        Args:
+            user_id: The user whose XP changed
+            old: (level, xp) before the change, or None for a new user
+            new: (level, xp) after the change, or None to remove the user
+        """
+        if not os.path.exists(self.path):
+            # Built lazily on first read
+            return
+
+        with self._locked(exclusive=True):
+            if not self._map():
+                return
+
+            _, count, capacity = self._header()
+            old_index = self._find(user_id, *old) if old else None
+            if old and old_index is None and new and self._find(user_id, *new) is not None:
+                # Committed before a rebuild read it; already in place
+                return
+            if old and old_index is None:
+                # Out of sync with the database for this user; resync on the next read
+                print(f"[LEADERBOARD] WARNING: Rank snapshot drifted at user {user_id}; marking it stale")
+                self.mark_stale()
+                return
+            if not old and new and self._find(user_id, *new) is not None:
+                # Already picked up by a rebuild
+                return
+
+            if new is None:
+                if old_index is not None:
+                    self._shift(old_index + 1, count, -1)
+                    self._write_header(count - 1)
+                return
+
+            if old_index is None and count >= capacity:
+                # Out of headroom; release the lock and rebuild with more capacity
+                rebuild_needed = True
+            else:
+                rebuild_needed = False
+                records = self._records()
+                new_index = bisect.bisect_left(records, rank_key(new[0], new[1], user_id))
+
+                if old_index is None:
+                    self._shift(new_index, count, 1)
+                    count += 1
+                elif new_index > old_index:
+                    new_index -= 1
+                    self._shift(old_index + 1, new_index + 1, -1)
+                elif new_index < old_index:
+                    self._shift(new_index, old_index, 1)
+
+                RECORD.pack_into(self._mm, HEADER.size + new_index * RECORD.size, new[0], new[1], user_id)
+                self._write_header(count)
+
+        if rebuild_needed:
+            self.rebuild()
+
+    def _shift(self, start, end, offset):
+        """Move records [start, end) by offset slots"""
+        if end <= start:
+            return
+        src = HEADER.size + start * RECORD.size
+        self._mm.move(src + offset * RECORD.size, src, (end - start) * RECORD.size)
+
+    def __len__(self):
+        with self._reading():
+            return self._header()[1]
+
+    def page(self, offset, limit):
+        """Ranked slice: list of (rank, level, xp, user_id)"""
+        with self._reading():
+            count = self._header()[1]
+            end = min(count, offset + limit)
+            return [(index + 1,) + self._read(index) for index in range(max(0, offset), end)]
+
+    def rank_of(self, user_id, level, xp):
+        """1-based rank for these stats, found by bisection"""
+        with self._reading():
+            return bisect.bisect_left(self._records(), rank_key(level, xp, user_id)) + 1
+
+    def around(self, user_id, level, xp, radius):
+        """The user's rank plus up to `radius` neighbours on each side"""
+        with self._reading():
+            count = self._header()[1]
+            index = bisect.bisect_left(self._records(), rank_key(level, xp, user_id))
+            start = max(0, index - radius)
+            end = min(count, index + radius + 1)
+            return index + 1, count, [(i + 1,) + self._read(i) for i in range(start, end)]
+
+
+# Singleton instance
+rank_snapshot = RankSnapshot()
+
+
+def record_rank_change(user_id, old, new):
+    """Apply a rank change once the surrounding transaction commits"""
+    from django.db import transaction
+
+    def apply():
+        try:
+            rank_snapshot.update(user_id, old, new)
+        except Exception as e:
+            # The snapshot is derived data; never fail gameplay over it
+            print(f"[LEADERBOARD] WARNING: Could not update rank snapshot for user {user_id}: {e}")
+
+    transaction.on_commit(apply)
@@ -0,0 +1,91 @@
+"""
+Tower loot: a fixed catalog of item templates plus per-drop rolls.
+
+Every drop references one of the LOOT_NAMES templates (one Equipment row per
+slot and base name). The affix, rolled stats and floor are stored on the
+drop's own UserEquipment row, so the Equipment catalog stays the same size no
+matter how many floors are cleared, and duplicate drops are kept side by side.
+"""
+import random
+
+from .models import Equipment, UserEquipment, ATTRIBUTE_NAMES
+
+LOOT_NAMES = {
+    'weapon': ['Sword', 'Axe', 'Dagger', 'Staff', 'Mace'],
+    'helmet': ['Helm', 'Cap', 'Visor', 'Hood', 'Crown'],
+    'chest': ['Armor', 'Vest', 'Tunic', 'Plate', 'Robes'],
+    'legs': ['Greaves', 'Pants', 'Leggings', 'Kilt', 'Guards'],
+    'feet': ['Boots', 'Shoes', 'Sandals', 'Sabatons', 'Greaves'],
+}
+
+# Adjectives based on floor/power
+AFFIXES = ['Rusty', 'Common', 'Sturdy', 'Polished', 'Fine', 'Superior', 'Epic', 'Legendary', 'Mythic', 'Godly']
+
+LOOT_GOLD_PER_FLOOR = 50
+
+
+def get_loot_template(slot, base_name):
+    """The catalog row for a loot base item, created on first use"""
+    # A concurrent first drop trips equipment_unique_loot_template; get_or_create then re-reads its row
+    template, _ = Equipment.objects.get_or_create(
+        is_loot_template=True,
+        equipment_slot=slot,
+        name=base_name,
+        defaults={
+            'equipment_type': 'outfit',  # Simplified for now
+            'description': f"A {base_name.lower()} recovered from the tower.",
+            'gold_cost': LOOT_GOLD_PER_FLOOR,
+            'sprite_path': f"/equipment/{slot}/{base_name.lower()}.png",  # Placeholder path
+        }
+    )
+    return template
+
+
+def roll_loot(floor, rng=random):
+    """
+    Roll a drop for a floor.
+
+    Returns:
+        tuple: (slot, base_name, affix, stats)
+    """
+    slot = rng.choice(list(LOOT_NAMES))
+    base_name = rng.choice(LOOT_NAMES[slot])
+    affix = AFFIXES[min(len(AFFIXES) - 1, floor // 2)]
+
+    # Number of stats increases with floor
+    num_stats = 1 + (floor // 5)
+    stats = {}
+    for attr in rng.sample(ATTRIBUTE_NAMES, min(len(ATTRIBUTE_NAMES), num_stats)):
+        # Stat value scales with floor
+        stats[attr] = 1 + (floor // 2) + rng.randint(0, floor)
+    return slot, base_name, affix, stats
+
+
+def describe_loot(template, affix, rolled_stats, found_on_floor):
+    """Display fields for a rolled drop of this template"""
+    floor = found_on_floor or 1
+    return {
+        'name': f"{affix} {template.name}" if affix else template.name,
+        'description': f"A {affix.lower()} {template.name} found on floor {floor}." if affix else template.description,
+        'stat_bonus': rolled_stats if rolled_stats is not None else template.stat_bonus,
+        'gold_cost': template.gold_cost * floor,
+    }
+
+
+def roll_strength(stats):
+    return sum((stats or {}).values())
+
+
+def grant_loot(user, floor, rng=random):
+    """
+    Roll a drop and add it to the user's inventory, unequipped.
+    Every drop is its own UserEquipment row, even for a template already owned.
+
+    Returns:
+        UserEquipment: the new inventory row
+    """
+    slot, base_name, affix, stats = roll_loot(floor, rng)
+    template = get_loot_template(slot, base_name)
+    return UserEquipment.objects.create(
+        user=user, equipment=template, affix=affix, rolled_stats=stats, found_on_floor=floor
+    )
@@ -0,0 +1,40 @@
+"""
+Management command to benchmark the tower combat simulator
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from api.combat import simulate_floor
+from api.tower_waves import wave_generator
+
+# Per-floor budget for verifying clears inline in complete_floor
+BUDGET_US = 1000
+
+
+class Command(BaseCommand):
+    help = 'Time the deterministic combat simulator over many generated floors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--floors', type=int, default=50, help='Distinct floors to simulate')
+        parser.add_argument('--rounds', type=int, default=200, help='Simulations per floor')
+
+    def handle(self, *args, **options):
+        floors = [
+            (floor, wave_generator.waves_for(0, floor, seed=floor))
+            for floor in range(1, options['floors'] + 1)
+        ]
+        player = {'hp': 150, 'strength': 20, 'intelligence': 20, 'creativity': 20}
+
+        victories = 0
+        start = time.perf_counter()
+        for round_number in range(options['rounds']):
+            for floor, waves in floors:
+                victories += simulate_floor(waves, player, seed=f"0:{floor}:{round_number}")['victory']
+        elapsed = time.perf_counter() - start
+
+        runs = options['rounds'] * len(floors)
+        per_floor_us = elapsed / runs * 1_000_000
+        self.stdout.write(f'Simulated {runs} floor(s) in {elapsed * 1000:.1f} ms ({victories} won)')
+
+        style = self.style.SUCCESS if per_floor_us < BUDGET_US else self.style.ERROR
+        self.stdout.write(style(f'{per_floor_us:.1f} us per floor (budget {BUDGET_US} us)'))
@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model
 from django.db import IntegrityError
 import random
 
+from api.xp_curve import total_lifetime_xp
+
 User = get_user_model()
 
 class Command(BaseCommand):
@@ -58,6 +60,7 @@ class Command(BaseCommand):
                     }
                 )
                 if created:
+                    user.lifetime_xp = total_lifetime_xp(user.level, user.current_xp)
                     user.set_password(password)
                     user.save()
                     created_count += 1
@@ -0,0 +1,389 @@
+"""
+Management command to generate a large synthetic dataset for load and scaling tests.
+
+Users are split into chunks. Each chunk's rows (user, habits, completions,
+rollups, check-ins, calendars, inventory, tower progress, achievements) are
+generated in a worker process from (seed, chunk index), so a given seed always
+produces the same data. The main process writes each chunk with bulk_create.
+User and habit ids are assigned up front so workers never need the database.
+"""
+import random
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api import xp_curve
+from api.checkin_calendar import encode_days
+from api.leaderboard import rank_snapshot
+from api.loot import LOOT_NAMES, get_loot_template, roll_loot, roll_strength
+from api.models import (
+    ATTRIBUTE_NAMES, Achievement, CheckInCalendar, CompletionRollup, DailyCheckIn,
+    Equipment, Habit, HabitCompletion, TowerProgress, UserAchievement, UserEquipment
+)
+
+User = get_user_model()
+
+DATASET_PASSWORD = 'demo123'
+
+# (name, category, frequency, xp_reward)
+HABIT_POOL = [
+    ('Morning Run', 'health', 'daily', 40), ('Drink Water', 'health', 'daily', 10),
+    ('Sleep 8 Hours', 'health', 'daily', 30), ('Stretch', 'health', 'daily', 15),
+    ('Gym Session', 'strength', 'daily', 60), ('Push-ups', 'strength', 'daily', 25),
+    ('Yoga', 'strength', 'weekly', 35), ('Long Hike', 'strength', 'weekly', 80),
+    ('Read 30 Minutes', 'intelligence', 'daily', 30), ('Study Spanish', 'intelligence', 'daily', 45),
+    ('Online Course', 'intelligence', 'weekly', 70), ('Write Code', 'intelligence', 'daily', 50),
+    ('Sketch', 'creativity', 'daily', 30), ('Play Guitar', 'creativity', 'daily', 35),
+    ('Journal', 'creativity', 'daily', 20), ('Photography Walk', 'creativity', 'weekly', 45),
+    ('Call a Friend', 'social', 'weekly', 25), ('Family Dinner', 'social', 'weekly', 30),
+    ('Volunteer', 'social', 'monthly', 100), ('Meet Someone New', 'social', 'weekly', 50),
+]
+
+# Fields whose auto_now_add would overwrite the generated timestamps
+GENERATED_TIMESTAMPS = [
+    (Habit, 'created_at'),
+    (HabitCompletion, 'completed_at'),
+    (DailyCheckIn, 'checked_in_at'),
+    (UserEquipment, 'unlocked_at'),
+    (UserAchievement, 'unlocked_at'),
+]
+
+
+def _init_worker():
+    # Needed where workers are spawned rather than forked
+    django.setup()
+
+
+def _moment_on(day, now, rng):
+    """A random time within `day` (UTC), never later than now"""
+    start = datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+    latest = min(86399, int((now - start).total_seconds()))
+    return start + timedelta(seconds=rng.randint(0, latest))
+
+
+def _current_streak(offsets):
+    """Consecutive days ending today (or yesterday) from days-ago offsets"""
+    offsets = set(offsets)
+    start = 0 if 0 in offsets else 1
+    streak = 0
+    while start + streak in offsets:
+        streak += 1
+    return streak
+
+
+def generate_chunk(spec):
+    """
+    Build every row for one chunk of users. Runs in a worker; no database access.
+
+    Returns:
+        dict: model name -> list of field dicts (completions/check-ins as tuples)
+    """
+    shared = spec['shared']
+    rng = random.Random(f"{shared['seed']}:{spec['index']}")
+    now = datetime.fromtimestamp(shared['now'], tz=dt_timezone.utc)
+    today = now.date()
+    days = shared['days']
+
+    rows = defaultdict(list)
+    habit_id = spec['habit_id_start']
+    for offset, habit_count in enumerate(spec['habit_counts']):
+        user_id = spec['user_id_start'] + offset
+        lifetime_xp = 0
+        attribute_xp = dict.fromkeys(ATTRIBUTE_NAMES, 0)
+        rollups = defaultdict(lambda: [0, 0])
+        total_completions = 0
+        best_streak = defaultdict(int)
+
+        # Habits and their completions (at most one per habit per day)
+        pool = rng.sample(HABIT_POOL, min(habit_count, len(HABIT_POOL)))
+        while len(pool) < habit_count:
+            name, category, frequency, xp_reward = rng.choice(HABIT_POOL)
+            pool.append((f"{name} #{len(pool)}", category, frequency, xp_reward))
+
+        for name, category, frequency, xp_reward in pool:
+            completion_count = min(days, max(0, int(rng.gauss(shared['completions_per_habit'], shared['completions_per_habit'] / 3))))
+            offsets = rng.sample(range(days), completion_count)
+            streak = _current_streak(offsets)
+            best_streak[category] = max(best_streak[category], streak)
+            best_streak[''] = max(best_streak[''], streak)
+
+            rows['habits'].append({
+                'id': habit_id, 'user_id': user_id, 'name': name, 'category': category,
+                'frequency': frequency, 'xp_reward': xp_reward, 'streak': streak,
+                'created_at': now - timedelta(days=days),
+            })
+            for day_offset in offsets:
+                xp_earned = xp_reward + rng.randint(0, 20)
+                completed_at = _moment_on(today - timedelta(days=day_offset), now, rng)
+                rows['completions'].append((habit_id, user_id, completed_at, xp_earned))
+                rollup = rollups[(completed_at.date(), category)]
+                rollup[0] += 1
+                rollup[1] += xp_earned
+                lifetime_xp += xp_earned
+                attribute_xp[category] += xp_earned
+            total_completions += completion_count
+            habit_id += 1
+
+        for (day, category), (count, xp) in rollups.items():
+            rows['rollups'].append({'user_id': user_id, 'day': day, 'category': category, 'completions': count, 'xp_earned': xp})
+
+        # Daily check-ins and their calendar bitsets
+        checkin_rate = rng.uniform(0.1, 0.8)
+        checkin_days = defaultdict(list)
+        for day_offset in range(days):
+            if rng.random() < checkin_rate:
+                checked_in_at = _moment_on(today - timedelta(days=day_offset), now, rng)
+                rows['checkins'].append((user_id, checked_in_at))
+                checkin_days[checked_in_at.year].append(checked_in_at.date())
+                lifetime_xp += 100
+        for year, year_days in checkin_days.items():
+            rows['calendars'].append({'user_id': user_id, 'year': year, 'days': encode_days(year_days)})
+
+        # Tower progress and loot (one inventory row per drop)
+        floors_cleared = min(50, int(rng.expovariate(1 / 6)))
+        drops = []
+        for floor in range(1, floors_cleared + 1):
+            lifetime_xp += 20 * floor
+            slot, base_name, affix, stats = roll_loot(floor, rng)
+            drops.append((slot, base_name, {'affix': affix, 'rolled_stats': stats, 'found_on_floor': floor}))
+        rows['tower'].append({
+            'user_id': user_id, 'current_floor': floors_cleared + 1,
+            'highest_floor': floors_cleared + 1, 'wave_seed': rng.randint(0, 2 ** 31 - 1),
+        })
+
+        bonuses = dict.fromkeys(ATTRIBUTE_NAMES, 0)
+        for item in shared['starter_items']:
+            rows['inventory'].append({
+                'user_id': user_id, 'equipment_id': item['id'], 'is_equipped': item['equipped'], 'unlocked_at': now,
+            })
+            if item['equipped']:
+                for stat_name, value in item['stat_bonus'].items():
+                    bonuses[stat_name] = bonuses.get(stat_name, 0) + value
+
+        # Equip the strongest drop per slot
+        strongest = {}
+        for index, (slot, _, drop) in enumerate(drops):
+            best = strongest.get(slot)
+            if best is None or roll_strength(drop['rolled_stats']) > roll_strength(drops[best][2]['rolled_stats']):
+                strongest[slot] = index
+        equipped_drops = set(strongest.values())
+        for index, (slot, base_name, drop) in enumerate(drops):
+            is_equipped = index in equipped_drops
+            rows['inventory'].append({
+                'user_id': user_id, 'equipment_id': shared['loot_templates'][(slot, base_name)],
+                'is_equipped': is_equipped, 'unlocked_at': now, **drop,
+            })
+            if is_equipped:
+                for stat_name, value in drop['rolled_stats'].items():
+                    bonuses[stat_name] += value
+
+        # Character and attribute levels consistent with the XP earned above
+        level = xp_curve.level_for_lifetime_xp(lifetime_xp)
+        user = {
+            'id': user_id,
+            'username': f"{shared['prefix']}{user_id}",
+            'email': f"{shared['prefix']}{user_id}@example.com",
+            'display_name': f"Synthetic Player {user_id}",
+            'password': shared['password'] or make_password(DATASET_PASSWORD),
+            'date_joined': now - timedelta(days=days),
+            'level': level,
+            'current_xp': lifetime_xp - xp_curve.level_threshold(level),
+            'next_level_xp': xp_curve.xp_to_next_level(level),
+            'lifetime_xp': lifetime_xp,
+            'max_hp': 100 + xp_curve.HP_PER_LEVEL * (level - 1),
+            'current_hp': 100,
+        }
+        for attribute, xp in attribute_xp.items():
+            user[attribute], user[f"{attribute}_xp"], _ = xp_curve.resolve_attribute_xp(1, 0, xp)
+            user[f"{attribute}_bonus"] = bonuses[attribute]
+        if shared['default_appearance_id']:
+            user['selected_appearance_id'] = shared['default_appearance_id']
+        rows['users'].append(user)
+
+        # Achievements already earned by this history
+        for achievement in shared['achievements']:
+            requirement_type = achievement['requirement_type']
+            if requirement_type == 'level':
+                value = level
+            elif requirement_type == 'total_completions':
+                value = total_completions
+            elif requirement_type == 'streak':
+                value = best_streak[achievement['requirement_category'] or '']
+            elif requirement_type == 'attribute_level':
+                value = user.get(achievement['requirement_category'], 0)
+            else:
+                value = 0
+            if value >= achievement['requirement_value']:
+                rows['achievements'].append({
+                    'user_id': user_id, 'achievement_id': achievement['id'],
+                    'progress': achievement['requirement_value'], 'unlocked_at': now,
+                })
+
+    return rows
+
+
+@contextmanager
+def keep_generated_timestamps():
+    """
+    Temporarily stop auto_now_add from overwriting generated timestamps.
+
+    The flag lives on the shared field objects, so only use this around the
+    command's own bulk inserts; the original values are restored even on error.
+    """
+    fields = [model._meta.get_field(name) for model, name in GENERATED_TIMESTAMPS]
+    original = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in zip(fields, original):
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible synthetic dataset (users, habits, completions, check-ins, inventory, ...) at scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+        parser.add_argument('--habits-per-user', type=int, default=10, help='Average habits per user')
+        parser.add_argument('--completions-per-habit', type=int, default=50, help='Average completions per habit')
+        parser.add_argument('--days', type=int, default=365, help='Days of history to generate')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed, same dataset)')
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes (1 = generate inline)')
+        parser.add_argument('--chunk-users', type=int, default=500, help='Users generated per worker task')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create statement')
+        parser.add_argument('--prefix', default='synth_', help='Username prefix for generated users')
+        parser.add_argument(
+            '--unique-passwords', action='store_true',
+            help='Hash a salted password per user in the workers (slow) instead of sharing one hash',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        habits_per_user = options['habits_per_user']
+        habit_counts = [
+            rng.randint(habits_per_user // 2, habits_per_user + habits_per_user // 2)
+            for _ in range(options['users'])
+        ]
+
+        user_id_start = (User.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+        habit_id_start = (Habit.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+        shared = self._shared_context(options)
+
+        specs = []
+        chunk_users = options['chunk_users']
+        for index, start in enumerate(range(0, options['users'], chunk_users)):
+            counts = habit_counts[start:start + chunk_users]
+            specs.append({
+                'index': index,
+                'user_id_start': user_id_start + start,
+                'habit_id_start': habit_id_start + sum(habit_counts[:start]),
+                'habit_counts': counts,
+                'shared': shared,
+            })
+
+        self.stdout.write(
+            f"Generating {options['users']} users / {sum(habit_counts)} habits in {len(specs)} chunk(s) "
+            f"with {options['workers']} worker(s), seed {options['seed']}..."
+        )
+
+        totals = defaultdict(int)
+        with keep_generated_timestamps():
+            for rows in self._generate(specs, options['workers']):
+                self._write_chunk(rows, options['batch_size'], totals)
+                self.stdout.write(
+                    f"  {totals['users']} users, {totals['habits']} habits, {totals['completions']} completions written"
+                )
+
+        # Explicit ids were used; move the sequences past them (no-op on SQLite)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Habit]):
+                cursor.execute(sql)
+
+        rank_snapshot.rebuild()
+        summary = ', '.join(f'{count} {name}' for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'\nDone! Wrote {summary}.'))
+
+    def _shared_context(self, options):
+        """Catalog data every worker needs, fetched once"""
+        starter_items = []
+        default_appearance_id = None
+        for item in Equipment.objects.filter(is_default=True, is_loot_template=False):
+            is_appearance = item.equipment_slot == 'armor' and item.character_specific == 'default'
+            if is_appearance:
+                default_appearance_id = item.id
+            starter_items.append({
+                'id': item.id,
+                'equipped': is_appearance or (item.equipment_type == 'theme' and item.name == 'Default Theme'),
+                'stat_bonus': item.stat_bonus or {},
+            })
+
+        loot_templates = {
+            (slot, base_name): get_loot_template(slot, base_name).id
+            for slot, names in LOOT_NAMES.items() for base_name in names
+        }
+
+        return {
+            'seed': options['seed'],
+            'now': timezone.now().timestamp(),
+            'days': options['days'],
+            'completions_per_habit': options['completions_per_habit'],
+            'prefix': options['prefix'],
+            'password': None if options['unique_passwords'] else make_password(DATASET_PASSWORD),
+            'starter_items': starter_items,
+            'default_appearance_id': default_appearance_id,
+            'loot_templates': loot_templates,
+            'achievements': list(Achievement.objects.values(
+                'id', 'requirement_type', 'requirement_value', 'requirement_category'
+            )),
+        }
+
+    def _generate(self, specs, workers):
+        """Yield chunk rows in order, keeping only a few chunks in flight"""
+        if workers <= 1:
+            yield from map(generate_chunk, specs)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = deque()
+            for spec in specs:
+                pending.append(pool.submit(generate_chunk, spec))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _write_chunk(self, rows, batch_size, totals):
+        """Insert one chunk's rows in foreign-key order"""
+        inserts = [
+            ('users', User, [User(**row) for row in rows['users']]),
+            ('habits', Habit, [Habit(**row) for row in rows['habits']]),
+            ('completions', HabitCompletion, [
+                HabitCompletion(habit_id=habit_id, user_id=user_id, completed_at=completed_at, xp_earned=xp_earned)
+                for habit_id, user_id, completed_at, xp_earned in rows['completions']
+            ]),
+            ('rollups', CompletionRollup, [CompletionRollup(**row) for row in rows['rollups']]),
+            ('checkins', DailyCheckIn, [
+                DailyCheckIn(user_id=user_id, checked_in_at=checked_in_at)
+                for user_id, checked_in_at in rows['checkins']
+            ]),
+            ('calendars', CheckInCalendar, [CheckInCalendar(**row) for row in rows['calendars']]),
+            ('inventory', UserEquipment, [UserEquipment(**row) for row in rows['inventory']]),
+            ('tower', TowerProgress, [TowerProgress(**row) for row in rows['tower']]),
+            ('achievements', UserAchievement, [UserAchievement(**row) for row in rows['achievements']]),
+        ]
+        with transaction.atomic():
+            for name, model, objects in inserts:
+                model.objects.bulk_create(objects, batch_size=batch_size)
+                totals[name] += len(objects)
@@ -0,0 +1,74 @@
+"""
+Management command to build check-in calendar bitsets from DailyCheckIn rows
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from api.models import CheckInCalendar, DailyCheckIn
+from api.checkin_calendar import encode_days
+
+BATCH_SIZE = 1000
+USERS_PER_CHUNK = 1000
+
+
+def rebuild_user_range(start, stop):
+    """
+    Rewrite the calendars of users with start <= id < stop from their check-ins.
+
+    The range's calendar rows are locked before the check-ins are read, so a
+    concurrent check-in either commits first (and is read here) or waits and
+    then sets its bit on the rebuilt row.
+
+    Returns:
+        int: calendars written
+    """
+    user_range = {'user_id__gte': start, 'user_id__lt': stop}
+    with transaction.atomic():
+        existing = {
+            (calendar.user_id, calendar.year): calendar
+            for calendar in CheckInCalendar.objects.select_for_update().filter(**user_range)
+        }
+
+        days_by_calendar = defaultdict(set)
+        checkins = DailyCheckIn.objects.filter(**user_range).order_by().values_list('user_id', 'checked_in_at')
+        for user_id, checked_in_at in checkins.iterator(chunk_size=5000):
+            day = checked_in_at.date()
+            days_by_calendar[(user_id, day.year)].add(day)
+
+        updated, created = [], []
+        for (user_id, year), days in days_by_calendar.items():
+            calendar = existing.pop((user_id, year), None)
+            if calendar is None:
+                created.append(CheckInCalendar(user_id=user_id, year=year, days=encode_days(days)))
+            else:
+                calendar.days = encode_days(days)
+                updated.append(calendar)
+
+        CheckInCalendar.objects.bulk_update(updated, ['days'], batch_size=BATCH_SIZE)
+        CheckInCalendar.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        # Calendars with no check-ins behind them
+        CheckInCalendar.objects.filter(pk__in=[calendar.pk for calendar in existing.values()]).delete()
+    return len(days_by_calendar)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every user\'s per-year check-in bitsets from their DailyCheckIn history'
+
+    def handle(self, *args, **options):
+        bounds = [
+            DailyCheckIn.objects.aggregate(last=Max('user_id'))['last'],
+            CheckInCalendar.objects.aggregate(last=Max('user_id'))['last'],
+        ]
+        last_user_id = max((bound for bound in bounds if bound is not None), default=0)
+
+        written = 0
+        for start in range(0, last_user_id + 1, USERS_PER_CHUNK):
+            try:
+                written += rebuild_user_range(start, start + USERS_PER_CHUNK)
+            except IntegrityError:
+                # A check-in created one of the new calendar rows meanwhile; it's locked on the retry
+                written += rebuild_user_range(start, start + USERS_PER_CHUNK)
+
+        self.stdout.write(self.style.SUCCESS(f'Done! Built {written} check-in calendar(s).'))
@@ -0,0 +1,22 @@
+"""
+Management command to rebuild daily completion rollups from HabitCompletion rows
+"""
+from django.core.management.base import BaseCommand
+from api.stats_rollup import rebuild_rollups, REBUILD_USERS_PER_CHUNK
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user, per-day, per-category completion rollups from raw completions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users-per-chunk',
+            type=int,
+            default=REBUILD_USERS_PER_CHUNK,
+            help='Size of each user-id range (one aggregate query and one transaction per range)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding completion rollups...')
+        count = rebuild_rollups(users_per_chunk=options['users_per_chunk'])
+        self.stdout.write(self.style.SUCCESS(f'Done! Wrote {count} rollup row(s).'))
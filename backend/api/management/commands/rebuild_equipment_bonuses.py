@@ -0,0 +1,43 @@
+"""
+Management command to rebuild the materialized equipment bonus vector
+"""
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from api.models import ATTRIBUTE_NAMES
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recompute each user\'s equipment stat bonuses from their equipped UserEquipment rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only rebuild bonuses for this username',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all().order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+
+        rebuilt = 0
+        changed = 0
+        for user in users.iterator():
+            before = [getattr(user, f"{stat}_bonus") for stat in ATTRIBUTE_NAMES]
+            with transaction.atomic():
+                user.recalculate_equipment_bonuses()
+            after = [getattr(user, f"{stat}_bonus") for stat in ATTRIBUTE_NAMES]
+
+            rebuilt += 1
+            if before != after:
+                changed += 1
+                self.stdout.write(
+                    self.style.WARNING(f'  Repaired bonuses for {user.username}: {before} -> {after}')
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nDone! Rebuilt bonuses for {rebuilt} user(s), {changed} were out of date.')
+        )
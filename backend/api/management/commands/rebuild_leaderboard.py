@@ -0,0 +1,14 @@
+"""
+Management command to rebuild the leaderboard rank snapshot
+"""
+from django.core.management.base import BaseCommand
+from api.leaderboard import rank_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the memory-mapped leaderboard rank snapshot from the user table'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Rebuilding rank snapshot at {rank_snapshot.path}...')
+        count = rank_snapshot.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Done! Ranked {count} user(s).'))
@@ -58,8 +58,10 @@ class Command(BaseCommand):
         seed_commands = [
             ('seed_equipment', 'equipment'),
             ('seed_achievements', 'achievements'),
+            ('seed_enemies', 'enemies'),
             ('seed_demo_users', 'demo users'),
             ('create_mock_users', 'mock users'),
+            ('rebuild_leaderboard', 'leaderboard snapshot'),
         ]
 
         for command_name, description in seed_commands:
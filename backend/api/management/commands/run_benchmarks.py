@@ -0,0 +1,105 @@
+"""
+Management command to benchmark the hot endpoints against their budgets
+"""
+import io
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from api import benchmarks
+from api.models import CustomUser, Habit
+
+
+class Command(BaseCommand):
+    help = 'Measure time, queries and memory of the hot endpoints on generated datasets and check them against budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', action='append', choices=list(benchmarks.SCALES),
+            help='Dataset scale to run (repeatable, default: small)',
+        )
+        parser.add_argument('--repeats', type=int, default=5, help='Timed calls per endpoint')
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes for dataset generation')
+        parser.add_argument(
+            '--update-budgets', action='store_true',
+            help='Write the measured results (with headroom) to the budget file instead of checking',
+        )
+
+    def handle(self, *args, **options):
+        scales = options['scale'] or ['small']
+        budgets = benchmarks.load_budgets()
+        violations = []
+
+        setup_test_environment()
+        try:
+            for scale in scales:
+                results = self._run_scale(scale, options)
+                self._report(scale, results, budgets.get(scale, {}))
+
+                if options['update_budgets']:
+                    budgets[scale] = benchmarks.budgets_from_results(results)
+                elif scale not in budgets:
+                    self.stdout.write(self.style.WARNING(f'No budgets recorded for scale "{scale}"'))
+                else:
+                    violations += [f'[{scale}] {v}' for v in benchmarks.check_budgets(results, budgets[scale])]
+        finally:
+            teardown_test_environment()
+
+        if options['update_budgets']:
+            benchmarks.save_budgets(budgets)
+            self.stdout.write(self.style.SUCCESS(f'Budgets written to {benchmarks.BUDGET_PATH}'))
+            return
+
+        if violations:
+            raise CommandError('Budgets exceeded:\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget.'))
+
+    def _run_scale(self, scale, options):
+        """Build a throwaway database at this scale and measure every endpoint"""
+        self.stdout.write(f'\n[{scale}] Generating dataset {benchmarks.SCALES[scale]}...')
+        # Own database file so a concurrent test run isn't clobbered
+        work_dir = tempfile.TemporaryDirectory()
+        connection.settings_dict['TEST'] = {
+            **connection.settings_dict.get('TEST', {}), 'NAME': f'{work_dir.name}/benchmark.sqlite3'
+        }
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Verification still simulates the floor; turning it off times the award path even on a simulated loss
+            with override_settings(
+                LEADERBOARD_SNAPSHOT_PATH=f'{work_dir.name}/leaderboard.snapshot', TOWER_VERIFY_CLEARS=False
+            ):
+                for command in ('seed_equipment', 'seed_achievements', 'seed_enemies'):
+                    call_command(command, stdout=io.StringIO())
+                call_command(
+                    'generate_dataset', seed=42, workers=options['workers'],
+                    stdout=io.StringIO(), **benchmarks.SCALES[scale]
+                )
+
+                # A typical player: the median by lifetime XP
+                players = CustomUser.objects.filter(username__startswith='synth_').order_by('lifetime_xp')
+                user = players[players.count() // 2]
+                habit = Habit.objects.create(
+                    user=user, name='Benchmark Quest', category='health', xp_reward=50
+                )
+
+                client = APIClient()
+                client.force_authenticate(user)
+                return benchmarks.run_endpoints(
+                    client, {'user_id': user.id, 'habit_id': habit.id}, options['repeats']
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            work_dir.cleanup()
+
+    def _report(self, scale, results, budgets):
+        self.stdout.write(f'[{scale}] {"endpoint":<20} {"ms":>9} {"queries":>8} {"peak KB":>9}')
+        for name, measured in results.items():
+            budget = budgets.get(name)
+            over = budget and benchmarks.check_budgets({name: measured}, {name: budget})
+            line = f'[{scale}] {name:<20} {measured["ms"]:>9} {measured["queries"]:>8} {measured["peak_kb"]:>9}'
+            self.stdout.write(self.style.ERROR(line) if over else line)
@@ -0,0 +1,38 @@
+"""
+Management command to finish AI scoring for habits left provisional
+(e.g. if a worker process restarted before its background job ran)
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.models import Habit
+from api.ai_service import ai_service
+
+
+class Command(BaseCommand):
+    help = 'Compute AI XP for habits still marked provisional'
+
+    def handle(self, *args, **options):
+        pending = list(Habit.objects.filter(xp_status='provisional').order_by('id'))
+
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('No provisional habits found!'))
+            return
+
+        self.stdout.write(f'Scoring {len(pending)} provisional habit(s)...')
+
+        # One chat completion per chunk instead of one per habit
+        batch_size = getattr(settings, 'AI_BATCH_MAX_SIZE', 20)
+        scored = 0
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            difficulties = ai_service.calculate_habit_difficulties(
+                [(habit.name, habit.description, habit.frequency) for habit in chunk]
+            )
+            for habit, difficulty in zip(chunk, difficulties):
+                xp_reward = ai_service.calculate_xp_from_difficulty(difficulty, habit.frequency)
+                scored += Habit.objects.filter(pk=habit.pk, xp_status='provisional').update(
+                    xp_reward=xp_reward,
+                    xp_status='final'
+                )
+
+        self.stdout.write(self.style.SUCCESS(f'\nDone! Scored {scored} habit(s).'))
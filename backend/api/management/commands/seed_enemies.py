@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from api.models import Enemy
+from api.tower_waves import DEFAULT_ENEMY_TEMPLATES
+
+
+class Command(BaseCommand):
+    help = 'Seed the tower enemy catalog into the database'
+
+    def handle(self, *args, **options):
+        created_count = 0
+        for enemy_data in DEFAULT_ENEMY_TEMPLATES:
+            enemy, created = Enemy.objects.get_or_create(
+                name=enemy_data['name'],
+                defaults={key: value for key, value in enemy_data.items() if key != 'name'}
+            )
+            if created:
+                created_count += 1
+                self.stdout.write(
+                    self.style.SUCCESS(f'[+] Created enemy: {enemy.name}')
+                )
+            else:
+                self.stdout.write(
+                    self.style.WARNING(f'[!] Enemy already exists: {enemy.name}')
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\n[+] Total enemies created: {created_count}')
+        )
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:46
+
+from django.db import migrations, models
+
+ATTRIBUTE_NAMES = ['strength', 'intelligence', 'creativity', 'social', 'health']
+
+
+def backfill_equipment_bonuses(apps, schema_editor):
+    """Sum stat_bonus over each user's equipped items into the new columns"""
+    CustomUser = apps.get_model('api', 'CustomUser')
+    UserEquipment = apps.get_model('api', 'UserEquipment')
+
+    totals = {}
+    equipped = UserEquipment.objects.filter(is_equipped=True).values_list(
+        'user_id', 'equipment__stat_bonus'
+    )
+    for user_id, stat_bonus in equipped.iterator():
+        user_totals = totals.setdefault(user_id, dict.fromkeys(ATTRIBUTE_NAMES, 0))
+        for stat_name, value in (stat_bonus or {}).items():
+            if stat_name in user_totals:
+                user_totals[stat_name] += value
+
+    for user_id, user_totals in totals.items():
+        CustomUser.objects.filter(pk=user_id).update(
+            **{f"{stat_name}_bonus": total for stat_name, total in user_totals.items()}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_add_unique_habit_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='creativity_bonus',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='health_bonus',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='intelligence_bonus',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='social_bonus',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='strength_bonus',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_equipment_bonuses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:54
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_customuser_equipment_bonuses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIDifficultyScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('prompt_version', models.CharField(max_length=16)),
+                ('difficulty', models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10)])),
+                ('habit_name', models.CharField(max_length=200)),
+                ('frequency', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
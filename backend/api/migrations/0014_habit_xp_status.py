@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_aidifficultyscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='xp_status',
+            field=models.CharField(choices=[('provisional', 'Provisional'), ('final', 'Final')], default='final', max_length=20),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:59
+
+from django.db import migrations, models
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def level_threshold(level):
+    """Total XP needed to reach `level` on the 100 * 1.5x curve (frozen copy of api.xp_curve)"""
+    total, needed = 0, 100
+    for _ in range(1, level):
+        total += needed
+        needed = int(needed * 1.5)
+    return total
+
+
+def backfill_lifetime_xp(apps, schema_editor):
+    """Derive lifetime XP from level and progress, a chunk of users at a time"""
+    CustomUser = apps.get_model('api', 'CustomUser')
+
+    thresholds = {}
+    last_id = 0
+    while True:
+        users = list(
+            CustomUser.objects.filter(id__gt=last_id).order_by('id').only('id', 'level', 'current_xp')[:BACKFILL_CHUNK_SIZE]
+        )
+        if not users:
+            break
+        for user in users:
+            if user.level not in thresholds:
+                thresholds[user.level] = level_threshold(user.level)
+            user.lifetime_xp = thresholds[user.level] + user.current_xp
+        CustomUser.objects.bulk_update(users, ['lifetime_xp'])
+        last_id = users[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_habit_xp_status'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='lifetime_xp',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_lifetime_xp, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['-level', '-current_xp', 'id'], name='user_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BITSET_BYTES = 46
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def backfill_calendars(apps, schema_editor):
+    """Build each user's per-year bitsets from their DailyCheckIn history"""
+    DailyCheckIn = apps.get_model('api', 'DailyCheckIn')
+    CheckInCalendar = apps.get_model('api', 'CheckInCalendar')
+
+    def flush(calendars):
+        CheckInCalendar.objects.bulk_create([
+            CheckInCalendar(user_id=user_id, year=year, days=bytes(bits))
+            for (user_id, year), bits in calendars.items()
+        ])
+        calendars.clear()
+
+    calendars = {}
+    last_user_id = None
+    checkins = DailyCheckIn.objects.order_by('user_id').values_list('user_id', 'checked_in_at')
+    for user_id, checked_in_at in checkins.iterator(chunk_size=5000):
+        # Rows come grouped by user, so a full buffer can be written between users
+        if user_id != last_user_id and len(calendars) >= BACKFILL_CHUNK_SIZE:
+            flush(calendars)
+        last_user_id = user_id
+
+        day = checked_in_at.date()
+        bits = calendars.setdefault((user_id, day.year), bytearray(BITSET_BYTES))
+        index = day.timetuple().tm_yday - 1
+        bits[index // 8] |= 1 << (index % 8)
+    flush(calendars)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_customuser_lifetime_xp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckInCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('days', models.BinaryField(default=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00', max_length=46)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkin_calendars', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'year'), name='unique_checkin_calendar_per_year')],
+            },
+        ),
+        migrations.RunPython(backfill_calendars, migrations.RunPython.noop),
+    ]
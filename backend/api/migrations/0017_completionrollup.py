@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:02
+
+import django.db.models.deletion
+from django.conf import settings
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+
+BACKFILL_USERS_PER_CHUNK = 1000
+
+
+def backfill_rollups(apps, schema_editor):
+    """Aggregate existing completions into rollups, one user-id range at a time"""
+    HabitCompletion = apps.get_model('api', 'HabitCompletion')
+    CompletionRollup = apps.get_model('api', 'CompletionRollup')
+
+    last_user_id = HabitCompletion.objects.aggregate(last=Max('user_id'))['last'] or 0
+    for start in range(0, last_user_id + 1, BACKFILL_USERS_PER_CHUNK):
+        totals = HabitCompletion.objects.filter(
+            user_id__gte=start, user_id__lt=start + BACKFILL_USERS_PER_CHUNK
+        ).order_by().annotate(
+            day=TruncDate('completed_at', tzinfo=dt_timezone.utc)
+        ).values('user_id', 'day', 'habit__category').annotate(count=Count('id'), xp=Sum('xp_earned'))
+        CompletionRollup.objects.bulk_create([
+            CompletionRollup(
+                user_id=row['user_id'], day=row['day'], category=row['habit__category'],
+                completions=row['count'], xp_earned=row['xp']
+            )
+            for row in totals
+        ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_checkincalendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompletionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(choices=[('strength', 'Strength'), ('intelligence', 'Intelligence'), ('creativity', 'Creativity'), ('social', 'Social'), ('health', 'Health')], max_length=20)),
+                ('completions', models.IntegerField(default=0)),
+                ('xp_earned', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completion_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day', 'category'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'category'), name='unique_completion_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
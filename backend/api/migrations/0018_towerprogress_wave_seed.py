@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_completionrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='towerprogress',
+            name='wave_seed',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:05
+
+import re
+
+from django.db import migrations, models
+
+ATTRIBUTE_NAMES = ['strength', 'intelligence', 'creativity', 'social', 'health']
+
+# Description written by the old per-drop generator, e.g. "A sturdy Sword found on floor 4."
+GENERATED_DESCRIPTION = re.compile(r'^A \w+ .+ found on floor (\d+)\.$')
+
+
+def fold_generated_loot(apps, schema_editor):
+    """
+    Replace per-drop Equipment rows with shared templates.
+
+    The first inventory row for each generated item is the player who found it;
+    it is repointed at the template with the drop's affix and stats, next to any
+    other drops of the same template. Later rows are copies handed to new
+    players by the old "grant everything" signal and are dropped along with the
+    generated item.
+    """
+    Equipment = apps.get_model('api', 'Equipment')
+    UserEquipment = apps.get_model('api', 'UserEquipment')
+    CustomUser = apps.get_model('api', 'CustomUser')
+
+    templates = {}
+    affected_users = set()
+    generated = Equipment.objects.filter(equipment_type='outfit', is_loot_template=False).order_by('id')
+    for item in generated.iterator():
+        match = GENERATED_DESCRIPTION.match(item.description or '')
+        if not match or ' ' not in item.name:
+            continue
+        affix, base_name = item.name.split(' ', 1)
+        floor = int(match.group(1))
+
+        key = (item.equipment_slot, base_name)
+        if key not in templates:
+            templates[key], _ = Equipment.objects.get_or_create(
+                is_loot_template=True,
+                equipment_slot=item.equipment_slot,
+                name=base_name,
+                defaults={
+                    'equipment_type': 'outfit',
+                    'description': f"A {base_name.lower()} recovered from the tower.",
+                    'gold_cost': 50,
+                    'sprite_path': f"/equipment/{item.equipment_slot}/{base_name.lower()}.png",
+                }
+            )
+        template = templates[key]
+
+        owners = list(UserEquipment.objects.filter(equipment=item).order_by('id'))
+        affected_users.update(owned.user_id for owned in owners if owned.is_equipped)
+        if owners:
+            finder = owners[0]
+            finder.equipment = template
+            finder.affix = affix
+            finder.rolled_stats = item.stat_bonus
+            finder.found_on_floor = floor
+            finder.save()
+
+        # Remaining copies cascade away with the generated item
+        item.delete()
+
+    for user_id in affected_users:
+        totals = dict.fromkeys(ATTRIBUTE_NAMES, 0)
+        equipped = UserEquipment.objects.filter(user_id=user_id, is_equipped=True).values_list(
+            'rolled_stats', 'equipment__stat_bonus'
+        )
+        for rolled_stats, stat_bonus in equipped:
+            for stat_name, value in (rolled_stats if rolled_stats is not None else stat_bonus or {}).items():
+                if stat_name in totals:
+                    totals[stat_name] += value
+        CustomUser.objects.filter(pk=user_id).update(
+            **{f"{stat_name}_bonus": total for stat_name, total in totals.items()}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_towerprogress_wave_seed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='is_loot_template',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userequipment',
+            name='affix',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='userequipment',
+            name='found_on_floor',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userequipment',
+            name='rolled_stats',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        # Drops of one template are separate rows; only catalog unlocks stay unique
+        migrations.AlterUniqueTogether(
+            name='userequipment',
+            unique_together=set(),
+        ),
+        migrations.RunPython(fold_generated_loot, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userequipment',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(found_on_floor__isnull=True), fields=('user', 'equipment'),
+                name='userequipment_unique_unlock'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='equipment',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(is_loot_template=True), fields=('equipment_slot', 'name'),
+                name='equipment_unique_loot_template'
+            ),
+        ),
+    ]
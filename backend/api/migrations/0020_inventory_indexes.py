@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_loot_templates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['equipment_slot'], name='equipment_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['equipment_type'], name='equipment_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['character_specific'], name='equipment_character_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userequipment',
+            index=models.Index(fields=['user', 'is_equipped', 'id'], name='userequipment_inventory_idx'),
+        ),
+    ]
@@ -4,6 +4,10 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+# The five trainable attributes; also used as Habit categories and stat_bonus keys
+ATTRIBUTE_NAMES = ['strength', 'intelligence', 'creativity', 'social', 'health']
+
+
 class CustomUser(AbstractUser):
     """
     Custom User model with display_name field and game stats
@@ -16,6 +20,8 @@ class CustomUser(AbstractUser):
     max_hp = models.IntegerField(default=100)
     current_xp = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     next_level_xp = models.IntegerField(default=100)
+    # Total XP ever earned; unlike current_xp it never resets, so it ranks total progress
+    lifetime_xp = models.BigIntegerField(default=0)
     
     # Attribute Stats
     strength = models.IntegerField(default=1, validators=[MinValueValidator(1)])
@@ -31,6 +37,13 @@ class CustomUser(AbstractUser):
     social_xp = models.IntegerField(default=0)
     health_xp = models.IntegerField(default=0)
 
+    # Equipment Bonuses (sum of stat_bonus over equipped items, kept in sync on equip)
+    strength_bonus = models.IntegerField(default=0)
+    intelligence_bonus = models.IntegerField(default=0)
+    creativity_bonus = models.IntegerField(default=0)
+    social_bonus = models.IntegerField(default=0)
+    health_bonus = models.IntegerField(default=0)
+
     # Character Selection
     selected_character = models.CharField(
         max_length=50,
@@ -55,37 +68,79 @@ class CustomUser(AbstractUser):
         help_text="Currently equipped appearance for the selected character"
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['-level', '-current_xp', 'id'], name='user_rank_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} (Level {self.level})"
     
-    def add_xp(self, amount, attribute=None):
-        """Add XP to user and handle leveling up"""
-        self.current_xp += amount
-        
-        # Check for level up
-        while self.current_xp >= self.next_level_xp:
-            self.current_xp -= self.next_level_xp
-            self.level += 1
-            self.next_level_xp = int(self.next_level_xp * 1.5)  # Increase XP needed for next level
-            self.max_hp += 10
+    def apply_xp(self, amount, attribute=None):
+        """Apply XP and level-ups in memory without saving"""
+        from api import xp_curve
+
+        self.lifetime_xp += amount
+        # Resolve the final level in one step, however large the grant
+        self.level, self.current_xp, self.next_level_xp, levels_gained = xp_curve.resolve_character_xp(
+            self.level, self.current_xp, self.next_level_xp, amount
+        )
+        if levels_gained:
+            self.max_hp += xp_curve.HP_PER_LEVEL * levels_gained
             self.current_hp = self.max_hp  # Restore HP on level up
         
         # Add attribute-specific XP if specified
-        if attribute:
+        if attribute in ATTRIBUTE_NAMES:
             attr_xp_field = f"{attribute}_xp"
-            if hasattr(self, attr_xp_field):
-                current_attr_xp = getattr(self, attr_xp_field)
-                setattr(self, attr_xp_field, current_attr_xp + amount)
-                
-                # Check for attribute level up (every 100 XP)
-                if getattr(self, attr_xp_field) >= 100:
-                    attr_level_field = attribute
-                    current_level = getattr(self, attr_level_field)
-                    setattr(self, attr_level_field, current_level + 1)
-                    setattr(self, attr_xp_field, getattr(self, attr_xp_field) - 100)
-        
+            level, attr_xp, _ = xp_curve.resolve_attribute_xp(
+                getattr(self, attribute), getattr(self, attr_xp_field), amount
+            )
+            setattr(self, attribute, level)
+            setattr(self, attr_xp_field, attr_xp)
+
+    def add_xp(self, amount, attribute=None):
+        """Add XP to user and handle leveling up"""
+        rank_before = (self.level, self.current_xp)
+        self.apply_xp(amount, attribute)
         self.save()
 
+        # Shift this user's entry in the shared leaderboard snapshot
+        from api.leaderboard import record_rank_change
+        record_rank_change(self.id, rank_before, (self.level, self.current_xp))
+
+    def get_total_stat(self, stat_name):
+        """Base attribute level plus the materialized equipment bonus"""
+        return getattr(self, stat_name) + getattr(self, f"{stat_name}_bonus")
+
+    def recalculate_equipment_bonuses(self, save=True):
+        """
+        Rebuild the equipment bonus vector from the user's equipped items.
+        Call inside the same transaction that changes what is equipped.
+        """
+        totals = dict.fromkeys(ATTRIBUTE_NAMES, 0)
+        equipped_bonuses = UserEquipment.objects.filter(
+            user=self,
+            is_equipped=True
+        ).values_list('rolled_stats', 'equipment__stat_bonus')
+
+        for rolled_stats, stat_bonus in equipped_bonuses:
+            # Tower loot carries its own rolled stats
+            if rolled_stats is not None:
+                stat_bonus = rolled_stats
+            for stat_name, value in (stat_bonus or {}).items():
+                if stat_name in totals:
+                    totals[stat_name] += value
+
+        for stat_name, total in totals.items():
+            setattr(self, f"{stat_name}_bonus", total)
+
+        if save:
+            self.save(update_fields=[f"{stat_name}_bonus" for stat_name in ATTRIBUTE_NAMES])
+
+        # Callers unequip other items with queryset update(), which sends no signals
+        from api.read_models import read_models, EQUIPPED
+        read_models.invalidate(self.id, EQUIPPED)
+
 
 class Habit(models.Model):
     CATEGORY_CHOICES = [
@@ -101,6 +156,11 @@ class Habit(models.Model):
         ('weekly', 'Weekly'),
         ('monthly', 'Monthly'),
     ]
+
+    XP_STATUS_CHOICES = [
+        ('provisional', 'Provisional'),  # Heuristic XP, AI score still being computed
+        ('final', 'Final'),
+    ]
     
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='habits')
     name = models.CharField(max_length=200)
@@ -108,6 +168,7 @@ class Habit(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     xp_reward = models.IntegerField(default=10, validators=[MinValueValidator(1), MaxValueValidator(200)])
     frequency = models.CharField(max_length=20, choices=FREQUENCY_CHOICES, default='daily')
+    xp_status = models.CharField(max_length=20, choices=XP_STATUS_CHOICES, default='final')
     streak = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -132,10 +193,10 @@ class Habit(models.Model):
         Calculate XP reward using AI to analyze task difficulty.
         Returns an integer between 40-200 XP.
         """
-        from api.ai_service import ai_service
+        from api.ai_service import ai_service, difficulty_batcher
 
-        # Use AI to determine difficulty (1-10 scale)
-        difficulty = ai_service.calculate_habit_difficulty(
+        # Use AI to determine difficulty (1-10 scale), batched with concurrent requests
+        difficulty = difficulty_batcher.score(
             habit_name=self.name,
             description=self.description,
             frequency=self.frequency
@@ -149,15 +210,42 @@ class Habit(models.Model):
 
         return calculated_xp
 
+    def calculate_provisional_xp_reward(self):
+        """
+        Instant XP estimate used while the AI score is computed in the background.
+        Returns (xp, is_final): a cached AI score or the heuristic is already final.
+        """
+        from api.ai_service import ai_service
+
+        if ai_service.client:
+            difficulty = ai_service.cache.get(self.name, self.description, self.frequency)
+            is_final = difficulty is not None
+        else:
+            # Without an API key the heuristic is the final answer
+            difficulty, is_final = None, True
+
+        if difficulty is None:
+            difficulty = ai_service._fallback_difficulty_calculation(self.name, self.description, self.frequency)
+
+        return ai_service.calculate_xp_from_difficulty(difficulty, self.frequency), is_final
+
     def save(self, *args, **kwargs):
         """Override save to auto-calculate XP on creation"""
+        schedule_scoring = False
         if not self.pk:  # Only on creation
             # Only calculate XP if it's still at default value (10)
             # This allows imported quests to keep their predefined XP values
             if self.xp_reward == 10:
-                self.xp_reward = self.calculate_xp_reward()
+                # Don't block the request on the model; score it after commit
+                self.xp_reward, is_final = self.calculate_provisional_xp_reward()
+                self.xp_status = 'final' if is_final else 'provisional'
+                schedule_scoring = not is_final
         super().save(*args, **kwargs)
 
+        if schedule_scoring:
+            from api.habit_scoring import schedule_habit_scoring
+            schedule_habit_scoring(self.pk)
+
 
 class HabitCompletion(models.Model):
     habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='completions')
@@ -171,21 +259,51 @@ class HabitCompletion(models.Model):
         # Prevent duplicate completions on the same day for daily habits
         
     
-    def save(self, *args, **kwargs):
-        today = self.completed_at.date() if self.completed_at else timezone.now().date()
-        if HabitCompletion.objects.filter(
-            habit=self.habit, user=self.user, completed_at__date=today
-        ).exists():
-            raise ValueError("Habit already completed today")
-        
-        if not self.xp_earned:
-            self.xp_earned = self.habit.xp_reward
+    def save(self, *args, apply_rewards=True, **kwargs):
+        """
+        Award XP and bump the streak when a completion is first saved.
+        The completion service passes apply_rewards=False because it applies
+        them itself under row locks (see api.completion_service).
+        """
+        if apply_rewards and self._state.adding:
+            today = self.completed_at.date() if self.completed_at else timezone.now().date()
+            if HabitCompletion.objects.filter(
+                habit=self.habit, user=self.user, completed_at__date=today
+            ).exists():
+                raise ValueError("Habit already completed today")
+            
+            if not self.xp_earned:
+                self.xp_earned = self.habit.xp_reward
+
+            self.user.add_xp(self.xp_earned, self.habit.category)
+            self.habit.streak += 1
+            self.habit.save()
+
+        adding = self._state.adding
+        super().save(*args, **kwargs)
 
-        self.user.add_xp(self.xp_earned, self.habit.category)
-        self.habit.streak += 1
-        self.habit.save()
+        if adding:
+            from api.stats_rollup import record_completion
+            record_completion(self.user_id, self.habit.category, self.completed_at.date(), self.xp_earned)
+
+
+class CompletionRollup(models.Model):
+    """Completions and XP per user, day and category, kept up to date as completions are saved"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='completion_rollups')
+    day = models.DateField()
+    category = models.CharField(max_length=20, choices=Habit.CATEGORY_CHOICES)
+    completions = models.IntegerField(default=0)
+    xp_earned = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'category'], name='unique_completion_rollup')
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.day} {self.category}: {self.completions}"
 
-        super().save(*args, **kwargs)
 
 class Achievement(models.Model):
     name = models.CharField(max_length=200)
@@ -255,7 +373,23 @@ class Equipment(models.Model):
     gold_cost = models.IntegerField(default=100, validators=[MinValueValidator(0)])
     unlock_requirement = models.TextField(blank=True)
     is_default = models.BooleanField(default=False)
+    # Tower loot base item; each drop's affix and rolled stats live on its UserEquipment row
+    is_loot_template = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['equipment_slot'], name='equipment_slot_idx'),
+            models.Index(fields=['equipment_type'], name='equipment_type_idx'),
+            models.Index(fields=['character_specific'], name='equipment_character_idx'),
+        ]
+        constraints = [
+            # One loot template per slot and base name, so concurrent first drops share it
+            models.UniqueConstraint(
+                fields=['equipment_slot', 'name'], condition=models.Q(is_loot_template=True),
+                name='equipment_unique_loot_template'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.equipment_slot})"
@@ -267,11 +401,35 @@ class UserEquipment(models.Model):
     is_equipped = models.BooleanField(default=False)
     unlocked_at = models.DateTimeField(auto_now_add=True)
 
+    # Tower loot only: the rolled instance of a loot template (one row per drop)
+    affix = models.CharField(max_length=50, blank=True)
+    rolled_stats = models.JSONField(null=True, blank=True)  # Overrides equipment.stat_bonus when set
+    found_on_floor = models.IntegerField(null=True, blank=True)
+
     class Meta:
-        unique_together = ['user', 'equipment']
+        constraints = [
+            # Catalog items are unlocked once; loot drops (found_on_floor set) can repeat a template
+            models.UniqueConstraint(
+                fields=['user', 'equipment'], condition=models.Q(found_on_floor__isnull=True),
+                name='userequipment_unique_unlock'
+            ),
+        ]
+        indexes = [
+            # Inventory pages: a user's rows in id order, optionally by equipped state
+            models.Index(fields=['user', 'is_equipped', 'id'], name='userequipment_inventory_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.equipment.name}"
+        return f"{self.user.username} - {self.display_name}"
+
+    @property
+    def display_name(self):
+        return f"{self.affix} {self.equipment.name}" if self.affix else self.equipment.name
+
+    @property
+    def stat_bonus(self):
+        """Effective stat bonus of this item for its owner"""
+        return self.rolled_stats if self.rolled_stats is not None else self.equipment.stat_bonus
 
 
 class DailyCheckIn(models.Model):
@@ -293,6 +451,23 @@ class DailyCheckIn(models.Model):
         super().save(*args, **kwargs)
 
 
+class CheckInCalendar(models.Model):
+    """A user's daily check-ins for one year, one bit per day of the year"""
+    BITSET_BYTES = 46  # 366 days
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='checkin_calendars')
+    year = models.IntegerField()
+    days = models.BinaryField(max_length=BITSET_BYTES, default=bytes(BITSET_BYTES))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year'], name='unique_checkin_calendar_per_year')
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.year} check-ins"
+
+
 class Enemy(models.Model):
     name = models.CharField(max_length=100)
     level = models.IntegerField(default=1)
@@ -310,7 +485,21 @@ class TowerProgress(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='tower_progress')
     current_floor = models.IntegerField(default=1)
     highest_floor = models.IntegerField(default=1)
+    wave_seed = models.IntegerField(default=0)  # Seeds the current floor's waves; re-rolled per floor
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return f"{self.user.username} - Floor {self.current_floor}"
\ No newline at end of file
+        return f"{self.user.username} - Floor {self.current_floor}"
+
+
+class AIDifficultyScore(models.Model):
+    """Persistent cache of AI difficulty scores, keyed by normalized habit text"""
+    cache_key = models.CharField(max_length=64, unique=True)  # sha256 of normalized name/description/frequency
+    prompt_version = models.CharField(max_length=16)
+    difficulty = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(10)])
+    habit_name = models.CharField(max_length=200)
+    frequency = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.habit_name} ({self.frequency}) - {self.difficulty}/10"
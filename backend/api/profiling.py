@@ -0,0 +1,158 @@
+"""
+On-demand profiling of a single request, for superusers.
+
+Send `X-Profile: 1` (or `?_profile=1`) to profile a request with cProfile and
+tracemalloc. Superusers are recognised by session or token. The report (top functions, allocation sites and ORM time) is
+written to PROFILE_OUTPUT_DIR, along with a .prof file for pstats/snakeviz.
+The file name is returned in the X-Profile-Report header. Use `inline` as the
+value to get the report back as the response body instead. Any other value
+(`0`, `false`, ...) leaves the request alone. Untriggered requests only pay
+for the header and query string check.
+"""
+import cProfile
+from datetime import datetime
+import json
+from pathlib import Path
+import pstats
+import re
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .db_instrumentation import QueryRecorder
+from .views import IsSuperUser
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+TOP_FINGERPRINTS = 10
+
+# Values that turn profiling on; 'inline' returns the report as the response
+PROFILE_TO_FILE = ('1', 'true', 'yes', 'on')
+PROFILE_INLINE = 'inline'
+
+
+def _profile_mode(request):
+    """'file', 'inline' or None (the common case, decided without parsing anything)"""
+    mode = request.META.get('HTTP_X_PROFILE')
+    if mode is None and '_profile=' in request.META.get('QUERY_STRING', ''):
+        mode = request.GET.get('_profile')
+    if mode is None:
+        return None
+    mode = mode.strip().lower()
+    if mode == PROFILE_INLINE:
+        return 'inline'
+    return 'file' if mode in PROFILE_TO_FILE else None
+
+
+def _is_superuser(request):
+    """Session user from AuthenticationMiddleware, else authenticate the way the API views do (token)"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_superuser
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return bool(IsSuperUser().has_permission(drf_request, None))
+    except APIException:
+        return False
+
+
+def _top_functions(profiler):
+    stats = pstats.Stats(profiler)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    rows = []
+    for func in stats.fcn_list[:TOP_FUNCTIONS]:
+        primitive_calls, calls, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 2),
+            'cumtime_ms': round(cumtime * 1000, 2),
+        })
+    return rows
+
+
+def _top_allocations(snapshot):
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ])
+    return [
+        {'site': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+    ]
+
+
+class RequestProfilerMiddleware:
+    """Profiles requests that ask for it, when they come from a superuser"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.output_dir = Path(getattr(settings, 'PROFILE_OUTPUT_DIR', settings.BASE_DIR / 'profiles'))
+
+    def __call__(self, request):
+        mode = _profile_mode(request)
+        if mode is None or not _is_superuser(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        recorder = QueryRecorder()
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        start = time.perf_counter()
+
+        try:
+            with connection.execute_wrapper(recorder):
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            total_ms = (time.perf_counter() - start) * 1000
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+
+        report = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'orm': {
+                'queries': recorder.count,
+                'db_ms': round(recorder.duration * 1000, 1),
+                'top_fingerprints': [
+                    {'sql': sql[:200], 'count': n}
+                    for sql, n in recorder.fingerprints.most_common(TOP_FINGERPRINTS)
+                ],
+            },
+            'peak_kb': round(peak / 1024, 1),
+            'top_functions': _top_functions(profiler),
+            'top_allocations': _top_allocations(snapshot),
+        }
+
+        if mode == 'inline':
+            return JsonResponse(report)
+
+        name = self._write_report(request, report, profiler)
+        print(f"[PROFILER] {request.method} {request.path} -> {name}")
+        response['X-Profile-Report'] = name
+        return response
+
+    def _write_report(self, request, report, profiler):
+        """Write the JSON report and the raw .prof dump; returns the shared base name"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{request.method.lower()}-{slug}"
+        (self.output_dir / f'{name}.json').write_text(json.dumps(report, indent=2))
+        profiler.dump_stats(str(self.output_dir / f'{name}.prof'))
+        return name
@@ -0,0 +1,151 @@
+"""
+Per-user read models in the Django cache.
+
+Each user's cached payload lives under a versioned key, e.g.
+readmodel:stats:42:<version>. Invalidating bumps the version, so readers
+never see an entry written before the change, and superseded entries simply
+expire. Read models that embed Equipment catalog fields also carry a global
+catalog version, bumped whenever the catalog changes.
+
+This holds on any backend that every worker shares (file, Redis, memcached).
+The local-memory backend is per process, so with more than one worker
+(WEB_CONCURRENCY > 1) read-model caching is turned off rather than serving
+entries another worker has already invalidated.
+
+Invalidation is wired to model signals in signals.py; code that writes with
+bulk_create/bulk_update/update() must call invalidate() itself.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+STATS = 'stats'                 # UserStatsSerializer payload
+EQUIPPED = 'equipped'           # Equipped items list
+ACHIEVEMENTS = 'achievements'   # achievement_id -> progress map
+READ_MODELS = (STATS, EQUIPPED, ACHIEVEMENTS)
+# Payloads that embed Equipment fields (selected appearance, equipped items)
+CATALOG_READ_MODELS = (STATS, EQUIPPED)
+CATALOG_VERSION_KEY = 'readmodel:catalog:v'
+
+
+def _new_version():
+    # Time-based, so a version key that was evicted never comes back with an old value
+    return int(time.time() * 1000)
+
+
+class ReadModelCache:
+    """Versioned per-user cache entries with hit/miss counters"""
+
+    def __init__(self, alias='default', ttl_seconds=None):
+        self.alias = alias
+        self.ttl_seconds = ttl_seconds or getattr(settings, 'READ_MODEL_CACHE_TTL', 300)
+        self._lock = threading.Lock()
+        self._stats = {name: {'hits': 0, 'misses': 0, 'invalidations': 0} for name in READ_MODELS}
+        self._catalog_invalidations = 0
+        self._warned_disabled = False
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self):
+        """False when the backend is per process but several workers serve requests"""
+        per_process = settings.CACHES[self.alias]['BACKEND'].endswith('LocMemCache')
+        enabled = not (per_process and getattr(settings, 'WEB_CONCURRENCY', 1) > 1)
+        if not enabled and not self._warned_disabled:
+            self._warned_disabled = True
+            print("[READ MODELS] WARNING: local-memory cache with several workers; "
+                  "read-model caching is off (set CACHE_BACKEND=file)")
+        return enabled
+
+    def _count(self, name, counter):
+        with self._lock:
+            self._stats[name][counter] += 1
+
+    def _version_key(self, name, user_id):
+        return f'readmodel:{name}:{user_id}:v'
+
+    def _version(self, key):
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, _new_version(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def get_or_set(self, name, user_id, build):
+        """Cached payload for this user, built (and stored) on a miss"""
+        if not self.enabled:
+            return build()
+
+        key = f'readmodel:{name}:{user_id}:{self._version(self._version_key(name, user_id))}'
+        if name in CATALOG_READ_MODELS:
+            key += f':{self._version(CATALOG_VERSION_KEY)}'
+        value = self.cache.get(key)
+        if value is not None:
+            self._count(name, 'hits')
+            return value
+
+        self._count(name, 'misses')
+        value = build()
+        self.cache.set(key, value, timeout=self.ttl_seconds)
+        return value
+
+    def _bump_key(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # No version yet (or evicted): any fresh one differs from what readers used
+            self.cache.set(key, _new_version(), timeout=None)
+
+    def _bump(self, names, user_id):
+        for name in names:
+            self._bump_key(self._version_key(name, user_id))
+            self._count(name, 'invalidations')
+
+    def _bump_catalog(self):
+        self._bump_key(CATALOG_VERSION_KEY)
+        with self._lock:
+            self._catalog_invalidations += 1
+
+    def invalidate(self, user_id, *names):
+        """
+        Drop this user's cached read models (all of them if no names given).
+
+        Bumped now and again on commit, so a reader that re-caches the
+        pre-commit state in between can't keep it.
+        """
+        names = names or READ_MODELS
+        self._bump(names, user_id)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._bump(names, user_id))
+
+    def invalidate_catalog(self):
+        """Drop every user's read models that embed Equipment catalog fields"""
+        self._bump_catalog()
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(self._bump_catalog)
+
+    def stats(self):
+        """Hit/miss counters per read model for this process"""
+        with self._lock:
+            stats = {name: dict(counters) for name, counters in self._stats.items()}
+        for counters in stats.values():
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        hits = sum(c['hits'] for c in stats.values())
+        lookups = hits + sum(c['misses'] for c in stats.values())
+        return {
+            'backend': settings.CACHES[self.alias]['BACKEND'].rsplit('.', 1)[-1],
+            'enabled': self.enabled,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'catalog_invalidations': self._catalog_invalidations,
+            'read_models': stats,
+        }
+
+
+# Singleton instance
+read_models = ReadModelCache()
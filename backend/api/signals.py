@@ -1,9 +1,14 @@
 # backend/api/signals.py
-from django.db.models.signals import post_migrate, post_save
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
-from .models import Equipment, UserEquipment
+from django.db import IntegrityError, transaction
+from .models import Equipment, UserEquipment, Achievement, Enemy, HabitCompletion, UserAchievement, ATTRIBUTE_NAMES
+from .achievement_engine import achievement_index
+from .tower_waves import wave_generator
+from .leaderboard import record_rank_change
+from .read_models import read_models, STATS, EQUIPPED, ACHIEVEMENTS
+from .stats_rollup import remove_completion
 
 User = get_user_model()
 
@@ -65,36 +70,117 @@ def create_demo_users(sender, **kwargs):
 @receiver(post_save, sender=User)
 def initialize_user_equipment(sender, instance, created, **kwargs):
     """
-    Auto-initialize default appearance and equipment for new users
+    Auto-initialize default appearance and equipment for new users.
+    Only the starter set (is_default items) is granted, so registration cost
+    doesn't grow with the catalog; other items unlock by level.
     """
     if not created:
         return
 
+    # New players enter the leaderboard snapshot at their starting rank
+    record_rank_change(instance.id, None, (instance.level, instance.current_xp))
+
     try:
-        # Step 1: Set the default appearance for the selected character
-        default_appearance = Equipment.objects.filter(
-            equipment_slot='armor',
-            character_specific=instance.selected_character,
-            is_default=True
-        ).first()
-
-        if default_appearance:
-            instance.selected_appearance = default_appearance
-            instance.save(update_fields=['selected_appearance'])
-
-        # Step 2: Create UserEquipment records for all items the user starts with
-        all_equipment = Equipment.objects.all()
-        for equipment in all_equipment:
-            # Mark as equipped ONLY if it's the selected appearance or the default theme
-            is_equipped = (
-                equipment == default_appearance or
-                (equipment.equipment_type == 'theme' and equipment.name == 'Default Theme')
-            )
+        with transaction.atomic():
+            starter_items = list(Equipment.objects.filter(is_default=True, is_loot_template=False))
 
-            UserEquipment.objects.get_or_create(
-                user=instance,
-                equipment=equipment,
-                defaults={'is_equipped': is_equipped}
+            # Step 1: The default appearance for the selected character
+            default_appearance = next((
+                item for item in starter_items
+                if item.equipment_slot == 'armor' and item.character_specific == instance.selected_character
+            ), None)
+
+            # Step 2: Grant the starter set in one insert, equipping only the
+            # selected appearance and the default theme
+            equipped = [
+                item for item in starter_items
+                if item == default_appearance or (item.equipment_type == 'theme' and item.name == 'Default Theme')
+            ]
+            UserEquipment.objects.bulk_create(
+                [
+                    UserEquipment(user=instance, equipment=item, is_equipped=item in equipped)
+                    for item in starter_items
+                ],
+                ignore_conflicts=True
             )
+
+            # Step 3: Materialize bonuses from the starting equipped set (no query needed)
+            update_fields = []
+            for stat_name in ATTRIBUTE_NAMES:
+                setattr(instance, f"{stat_name}_bonus", sum((item.stat_bonus or {}).get(stat_name, 0) for item in equipped))
+                update_fields.append(f"{stat_name}_bonus")
+            if default_appearance:
+                instance.selected_appearance = default_appearance
+                update_fields.append('selected_appearance')
+            instance.save(update_fields=update_fields)
     except Exception as e:
-        print(f"[!] Error initializing equipment for user {instance.username}: {e}")
\ No newline at end of file
+        print(f"[!] Error initializing equipment for user {instance.username}: {e}")
+
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def invalidate_achievement_index(sender, **kwargs):
+    """Rebuild the in-memory achievement index after catalog changes"""
+    achievement_index.invalidate()
+
+
+@receiver(post_save, sender=Enemy)
+@receiver(post_delete, sender=Enemy)
+def invalidate_wave_generator(sender, **kwargs):
+    """Reload enemy templates after catalog changes"""
+    wave_generator.invalidate()
+
+
+@receiver(post_delete, sender=User)
+def remove_user_rank(sender, instance, **kwargs):
+    """Drop deleted users from the leaderboard snapshot"""
+    record_rank_change(instance.id, (instance.level, instance.current_xp), None)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_read_models(sender, instance, created, update_fields=None, **kwargs):
+    """Stats come from the user row; equipped items also show level-based unlocks"""
+    if created:
+        # Nothing cached under a (reused) id may be served to a new user
+        read_models.invalidate(instance.id)
+    elif update_fields is None or 'level' in update_fields:
+        read_models.invalidate(instance.id, STATS, EQUIPPED)
+    else:
+        read_models.invalidate(instance.id, STATS)
+
+
+@receiver(post_delete, sender=User)
+def drop_user_read_models(sender, instance, **kwargs):
+    read_models.invalidate(instance.id)
+
+
+@receiver(post_save, sender=UserEquipment)
+@receiver(post_delete, sender=UserEquipment)
+def invalidate_equipped_read_model(sender, instance, **kwargs):
+    read_models.invalidate(instance.user_id, EQUIPPED)
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+def invalidate_catalog_read_models(sender, **kwargs):
+    """Stats and equipped items embed Equipment fields (names, sprites, bonuses)"""
+    read_models.invalidate_catalog()
+
+
+@receiver(post_delete, sender=HabitCompletion)
+def remove_completion_from_rollup(sender, instance, **kwargs):
+    """Keep rollups in step with raw completions, including cascades from deleted habits"""
+    remove_completion(instance.user_id, instance.habit_id, instance.completed_at.date(), instance.xp_earned)
+
+
+@receiver(post_save, sender=HabitCompletion)
+@receiver(post_delete, sender=HabitCompletion)
+def invalidate_stats_read_model(sender, instance, **kwargs):
+    read_models.invalidate(instance.user_id, STATS)
+
+
+@receiver(post_save, sender=UserAchievement)
+@receiver(post_delete, sender=UserAchievement)
+def invalidate_achievement_read_model(sender, instance, **kwargs):
+    read_models.invalidate(instance.user_id, ACHIEVEMENTS)
+
@@ -0,0 +1,124 @@
+"""
+Daily completion rollups.
+
+CompletionRollup keeps one row per (user, day, category) with the number of
+completions and XP earned, incremented as completions are saved and
+decremented as they are deleted (see signals.py). Stats,
+heatmaps and trends aggregate these rows, which grow with active days
+rather than with raw completion history.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Subquery, Sum
+from django.db.models.functions import TruncDate
+
+from .models import CompletionRollup, Habit, HabitCompletion
+
+# Rebuilds work through users in id ranges of this size, one transaction each
+REBUILD_USERS_PER_CHUNK = 1000
+REBUILD_BATCH_SIZE = 5000
+
+
+def record_completion(user_id, category, day, xp_earned):
+    """Add one completion to its (user, day, category) rollup"""
+    rollups = CompletionRollup.objects.filter(user_id=user_id, day=day, category=category)
+    if rollups.update(completions=F('completions') + 1, xp_earned=F('xp_earned') + xp_earned):
+        return
+
+    try:
+        with transaction.atomic():
+            CompletionRollup.objects.create(
+                user_id=user_id, day=day, category=category, completions=1, xp_earned=xp_earned
+            )
+    except IntegrityError:
+        # Created by a concurrent completion; add to it instead
+        rollups.update(completions=F('completions') + 1, xp_earned=F('xp_earned') + xp_earned)
+
+
+def remove_completion(user_id, habit_id, day, xp_earned):
+    """Take a deleted completion back out of its rollup (the habit may be going away with it)"""
+    category = Habit.objects.filter(pk=habit_id).values('category')[:1]
+    rollups = CompletionRollup.objects.filter(user_id=user_id, day=day, category=Subquery(category))
+    rollups.update(completions=F('completions') - 1, xp_earned=F('xp_earned') - xp_earned)
+    # An emptied day shouldn't show up in activity
+    rollups.filter(completions__lte=0).delete()
+
+
+def category_stats(user):
+    """Habits, completions and XP per category (same shape as the old join query)"""
+    stats = {
+        row['category']: {**row, 'total_completions': 0, 'total_xp': 0}
+        for row in Habit.objects.filter(user=user).order_by().values('category').annotate(total_habits=Count('id'))
+    }
+
+    totals = CompletionRollup.objects.filter(user=user).order_by().values('category').annotate(
+        total_completions=Sum('completions'),
+        total_xp=Sum('xp_earned')
+    )
+    for row in totals:
+        entry = stats.setdefault(row['category'], {'category': row['category'], 'total_habits': 0})
+        entry['total_completions'] = row['total_completions']
+        entry['total_xp'] = row['total_xp']
+
+    return [stats[category] for category in sorted(stats)]
+
+
+def daily_activity(user, today, days=30):
+    """
+    Per-day totals for heatmaps and trend charts over the last `days` days.
+
+    Returns:
+        list: [{'date', 'completions', 'xp_earned', 'categories': {category: completions}}]
+    """
+    rows = CompletionRollup.objects.filter(
+        user=user,
+        day__gt=today - timedelta(days=days),
+        day__lte=today
+    ).order_by('day').values_list('day', 'category', 'completions', 'xp_earned')
+
+    activity = {}
+    for day, category, completions, xp_earned in rows:
+        entry = activity.setdefault(day, {
+            'date': day.isoformat(), 'completions': 0, 'xp_earned': 0, 'categories': {}
+        })
+        entry['completions'] += completions
+        entry['xp_earned'] += xp_earned
+        entry['categories'][category] = completions
+    return list(activity.values())
+
+
+def rebuild_rollups(users_per_chunk=REBUILD_USERS_PER_CHUNK):
+    """
+    Recompute every rollup from raw completions, one user-id range at a time.
+
+    Each range is aggregated with GROUP BY in the database and swapped in its
+    own transaction, so memory and lock time are bounded by the range, not by
+    the size of the completion table.
+    """
+    bounds = [
+        HabitCompletion.objects.aggregate(last=Max('user_id'))['last'],
+        CompletionRollup.objects.aggregate(last=Max('user_id'))['last'],
+    ]
+    last_user_id = max((bound for bound in bounds if bound is not None), default=0)
+
+    written = 0
+    for start in range(0, last_user_id + 1, users_per_chunk):
+        user_range = {'user_id__gte': start, 'user_id__lt': start + users_per_chunk}
+        with transaction.atomic():
+            totals = HabitCompletion.objects.filter(**user_range).order_by().annotate(
+                day=TruncDate('completed_at', tzinfo=dt_timezone.utc)
+            ).values('user_id', 'day', 'habit__category').annotate(
+                count=Count('id'), xp=Sum('xp_earned')
+            )
+            rollups = [
+                CompletionRollup(
+                    user_id=row['user_id'], day=row['day'], category=row['habit__category'],
+                    completions=row['count'], xp_earned=row['xp']
+                )
+                for row in totals
+            ]
+            CompletionRollup.objects.filter(**user_range).delete()
+            CompletionRollup.objects.bulk_create(rollups, batch_size=REBUILD_BATCH_SIZE)
+        written += len(rollups)
+    return written
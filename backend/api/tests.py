@@ -1,3 +1,1165 @@
-from django.test import TestCase
+from importlib import import_module
+import io
+import os
+import json
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .models import (
+    CustomUser, Equipment, UserEquipment, Habit, HabitCompletion,
+    Achievement, UserAchievement, DailyCheckIn, CheckInCalendar, CompletionRollup,
+    Enemy, TowerProgress
+)
+from .game_serializers import UserStatsSerializer
+from .leaderboard import rank_snapshot
+from .achievement_engine import EVENT_LEVEL_UP, achievement_engine
+from .completion_service import complete_habit
+from .habit_scoring import schedule_habits_scoring
+from .ai_cache import DifficultyCache
+from .ai_batching import DifficultyBatcher
+from . import xp_curve
+from .checkin_calendar import checkin_summary, encode_days, has_checked_in
+from .tower_waves import wave_generator
+from .loot import get_loot_template, grant_loot
+from .combat import simulate_floor
+from .ai_service import AIService, ai_service
+from .ai_resilience import CircuitBreaker
+from . import benchmarks
+from .read_models import read_models
+from .db_instrumentation import QueryInstrumentationMiddleware, fingerprint
+
+
+class EquipmentBonusTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='hero', password='demo123', display_name='Hero')
+        self.sword = Equipment.objects.create(
+            name='Test Sword', equipment_type='outfit', equipment_slot='weapon',
+            stat_bonus={'strength': 5, 'health': 1}
+        )
+        UserEquipment.objects.create(user=self.user, equipment=self.sword)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_equip_updates_bonus_vector(self):
+        response = self.client.post(f'/api/game/equipment/{self.sword.id}/equip/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_stats']['strength'], 6)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.strength_bonus, 5)
+        self.assertEqual(self.user.health_bonus, 1)
+
+        # Toggling off removes the bonus again
+        self.client.post(f'/api/game/equipment/{self.sword.id}/equip/')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.strength_bonus, 0)
+
+    def test_stats_serialization_is_query_free(self):
+        with self.assertNumQueries(0):
+            UserStatsSerializer(self.user).data
+
+
+class EquipmentListQueryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='looter', password='demo123', display_name='Looter')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_items(self, count):
+        for i in range(count):
+            equipment = Equipment.objects.create(
+                name=f'Item {i}', equipment_type='theme', unlock_requirement=f'Unlocked at Level {i}'
+            )
+            if i % 2:
+                UserEquipment.objects.create(user=self.user, equipment=equipment, is_equipped=(i == 1))
+
+    def test_list_uses_constant_queries(self):
+        self._create_items(3)
+        # inventory index + equipment list
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/game/equipment/')
+        self.assertEqual(len(response.data), 3)
+
+        self._create_items(20)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/game/equipment/')
+        self.assertEqual(len(response.data), 23)
+        self.assertTrue(any(item['is_equipped'] for item in response.data))
+
+
+class HabitListQueryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='quester', password='demo123', display_name='Quester', level=20)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_habits(self, start, count):
+        habits = []
+        for i in range(start, start + count):
+            habits.append(Habit.objects.create(
+                user=self.user, name=f'Quest {i}', category='health', xp_reward=50
+            ))
+        return habits
+
+    def test_today_uses_single_query(self):
+        habits = self._create_habits(0, 3)
+        HabitCompletion.objects.create(habit=habits[0], user=self.user, xp_earned=50)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/game/habits/today/')
+        completed = {item['name']: item for item in response.data}
+        self.assertTrue(completed['Quest 0']['completed_today'])
+        self.assertIsNotNone(completed['Quest 0']['last_completed_at'])
+        self.assertFalse(completed['Quest 1']['completed_today'])
+        self.assertIsNone(completed['Quest 1']['last_completed_at'])
+
+        self._create_habits(3, 15)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/game/habits/')
+        self.assertEqual(len(response.data), 18)
+
+
+class AchievementListQueryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='collector', password='demo123', display_name='Collector')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_achievements(self, count):
+        return [
+            Achievement.objects.create(
+                name=f'Achievement {i}', description='', requirement_type='level',
+                requirement_value=5, reward_description=''
+            )
+            for i in range(count)
+        ]
+
+    def test_list_and_unlocked_use_constant_queries(self):
+        achievements = self._create_achievements(4)
+        UserAchievement.objects.create(user=self.user, achievement=achievements[0], progress=5)
+        UserAchievement.objects.create(user=self.user, achievement=achievements[1], progress=2)
+
+        # progress map + achievement list
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/game/achievements/')
+        by_name = {item['name']: item for item in response.data}
+        self.assertTrue(by_name['Achievement 0']['is_unlocked'])
+        self.assertEqual(by_name['Achievement 1']['user_progress'], 2)
+        self.assertFalse(by_name['Achievement 1']['is_unlocked'])
+
+        # Later requests reuse the cached progress map: achievement list only
+        self._create_achievements(20)
+        with self.assertNumQueries(1):
+            self.client.get('/api/game/achievements/')
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/game/achievements/unlocked/')
+        self.assertEqual([item['name'] for item in response.data], ['Achievement 0'])
+
+
+class AchievementEngineTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='achiever', password='demo123', display_name='Achiever')
+        self.habit = Habit.objects.create(user=self.user, name='Run', category='strength', xp_reward=50)
+        self.first = Achievement.objects.create(
+            name='First Steps', description='', requirement_type='total_completions',
+            requirement_value=1, reward_xp=60, reward_description=''
+        )
+        self.level_two = Achievement.objects.create(
+            name='Level 2', description='', requirement_type='level',
+            requirement_value=2, reward_xp=10, reward_description=''
+        )
+        Achievement.objects.create(
+            name='Social Streak', description='', requirement_type='streak',
+            requirement_value=1, requirement_category='social', reward_description=''
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_completion_unlocks_only_affected_rules(self):
+        response = self.client.post('/api/game/habits/complete/', {'habit_id': self.habit.id})
+        self.assertEqual(response.status_code, 200)
+
+        unlocked = set(
+            UserAchievement.objects.filter(user=self.user).values_list('achievement__name', flat=True)
+        )
+        # The completion reward levels the user up, which then unlocks the level rule
+        self.assertEqual(unlocked, {'First Steps', 'Level 2'})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.level, 2)
+
+    def test_rule_added_later_unlocks_on_next_completion(self):
+        self.user.apply_xp(1000)
+        self.user.save()
+        Achievement.objects.create(
+            name='Veteran', description='', requirement_type='level',
+            requirement_value=3, reward_description=''
+        )
+        self.client.post('/api/game/habits/complete/', {'habit_id': self.habit.id})
+        self.assertTrue(UserAchievement.objects.filter(user=self.user, achievement__name='Veteran').exists())
+
+    def test_concurrent_unlock_pays_the_reward_once(self):
+        self.user.apply_xp(100)
+        self.user.save()
+        claim = achievement_engine._claim
+
+        def unlocked_elsewhere_first(*args):
+            # Another worker unlocks the same achievement after this one read the user's rows
+            UserAchievement.objects.update_or_create(
+                user=self.user, achievement=self.level_two, defaults={'progress': 2}
+            )
+            return claim(*args)
+
+        for existing_progress in (None, 0):  # Racing the insert, then the progress update
+            UserAchievement.objects.filter(user=self.user).delete()
+            if existing_progress is not None:
+                UserAchievement.objects.create(user=self.user, achievement=self.level_two, progress=existing_progress)
+            lifetime_xp = self.user.lifetime_xp
+
+            with mock.patch.object(achievement_engine, '_claim', side_effect=unlocked_elsewhere_first):
+                unlocked = achievement_engine.evaluate(self.user, [EVENT_LEVEL_UP])
+
+            self.assertEqual(unlocked, [])
+            self.assertEqual(self.user.lifetime_xp, lifetime_xp)
+
+
+class LeaderboardSnapshotTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(LEADERBOARD_SNAPSHOT_PATH=f'{self.tmpdir.name}/ranks')
+        self.settings_override.enable()
+
+        self.users = [
+            CustomUser.objects.create_user(
+                username=f'player{i}', display_name=f'Player {i}', level=2 + i, current_xp=i
+            )
+            for i in range(12)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def test_pages_and_around_me(self):
+        response = self.client.get('/api/game/stats/leaderboard/', {'page': 2, 'page_size': 5})
+        self.assertEqual([row['rank'] for row in response.data], [6, 7, 8, 9, 10])
+        self.assertEqual(response.data[0]['username'], 'player6')
+        # Includes the demo users created on migrate, ranked last at level 1
+        self.assertEqual(response['X-Total-Count'], '14')
+
+        response = self.client.get('/api/game/stats/leaderboard/around-me/', {'radius': 1})
+        self.assertEqual(response.data['rank'], 12)
+        self.assertEqual(response.data['total_players'], 14)
+        self.assertEqual([row['username'] for row in response.data['players']], ['player1', 'player0', 'johndoe'])
+
+    def test_xp_change_moves_user_in_snapshot(self):
+        rank_snapshot.rebuild()
+        user = self.users[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            user.add_xp(101)  # level 3 with 1 XP: ties player1, wins on account age
+
+        self.assertEqual(rank_snapshot.rank_of(user.id, user.level, user.current_xp), 11)
+        self.assertEqual([entry[3] for entry in rank_snapshot.page(10, 2)], [user.id, self.users[1].id])
+
+    def test_drift_marks_snapshot_stale_and_next_read_rebuilds(self):
+        rank_snapshot.rebuild()
+        user = self.users[0]
+        CustomUser.objects.filter(pk=user.pk).update(level=50)  # Bypasses record_rank_change
+
+        with mock.patch('builtins.print'):
+            rank_snapshot.update(user.id, (7, 7), (50, 0))  # Stale "old" stats
+            self.assertTrue(os.path.exists(rank_snapshot.stale_path))
+            self.assertEqual(rank_snapshot.page(0, 1)[0][3], user.id)
+        self.assertFalse(os.path.exists(rank_snapshot.stale_path))
+
+    def test_update_during_rebuild_lands_in_the_new_snapshot(self):
+        rank_snapshot.rebuild()
+        user = self.users[0]
+        claim_stale = rank_snapshot._claim_stale
+        updater = threading.Thread(target=rank_snapshot.update, args=(user.id, (2, 0), (50, 0)))
+
+        def start_update_mid_rebuild():
+            updater.start()
+            time.sleep(0.1)  # Let it reach the lock before the user table is read
+            return claim_stale()
+
+        with mock.patch.object(rank_snapshot, '_claim_stale', side_effect=start_update_mid_rebuild):
+            rank_snapshot.rebuild()
+        updater.join()
+
+        self.assertEqual(rank_snapshot.page(0, 1)[0][3], user.id)
+
+    def test_update_already_picked_up_by_rebuild_is_skipped(self):
+        user = self.users[0]
+        CustomUser.objects.filter(pk=user.pk).update(level=50)
+        rank_snapshot.rebuild()
+
+        rank_snapshot.update(user.id, (2, 0), (50, 0))
+        self.assertFalse(os.path.exists(rank_snapshot.stale_path))
+        self.assertEqual(len(rank_snapshot), 14)
+
+
+class ConcurrentCompletionTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='racer', display_name='Racer', level=1)
+        self.habits = [
+            Habit.objects.create(user=self.user, name=f'Quest {i}', category='strength', xp_reward=50)
+            for i in range(8)
+        ]
+
+    def test_parallel_completions_do_not_lose_xp(self):
+        barrier = threading.Barrier(len(self.habits))
+        errors = []
+
+        def complete(habit):
+            try:
+                barrier.wait()
+                complete_habit(self.user, habit.id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=complete, args=(habit,)) for habit in self.habits]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.user.refresh_from_db()
+        earned = sum(HabitCompletion.objects.filter(user=self.user).values_list('xp_earned', flat=True))
+        self.assertEqual(HabitCompletion.objects.filter(user=self.user).count(), len(self.habits))
+        self.assertEqual(self.user.lifetime_xp, earned)
+
+    def test_same_habit_twice_is_rejected(self):
+        complete_habit(self.user, self.habits[0].id)
+        with self.assertRaises(ValueError):
+            complete_habit(self.user, self.habits[0].id)
+        self.habits[0].refresh_from_db()
+        self.assertEqual(self.habits[0].streak, 1)
+
+
+class AIDifficultyCacheTests(TestCase):
+    def setUp(self):
+        self.client_mock = mock.Mock()
+        self.client_mock.chat.completions.create.return_value = mock.Mock(
+            choices=[mock.Mock(message=mock.Mock(content='3'))]
+        )
+        self.service = AIService()
+        self.service.client = self.client_mock
+
+    def test_normalized_repeat_is_served_from_cache(self):
+        self.assertEqual(self.service.calculate_habit_difficulty('Drink 8 Glasses of Water', '', 'daily'), 3)
+        self.assertEqual(self.service.calculate_habit_difficulty('  drink 8 glasses  of water', '', 'Daily'), 3)
+        self.assertEqual(self.client_mock.chat.completions.create.call_count, 1)
+
+        # A fresh process still finds the score in the database tier
+        self.service.cache.clear_memory()
+        self.assertEqual(self.service.calculate_habit_difficulty('Drink 8 Glasses of Water', '', 'daily'), 3)
+        self.assertEqual(self.client_mock.chat.completions.create.call_count, 1)
+
+        stats = self.service.cache.stats()
+        self.assertEqual((stats['memory_hits'], stats['db_hits'], stats['misses']), (1, 1, 1))
+
+    def test_prompt_change_invalidates_entries(self):
+        self.service.calculate_habit_difficulty('Read', '', 'daily')
+        self.service.cache = DifficultyCache('new-prompt')
+        self.service.calculate_habit_difficulty('Read', '', 'daily')
+        self.assertEqual(self.client_mock.chat.completions.create.call_count, 2)
+
+
+@override_settings(AI_SCORING_ASYNC=False)
+class DeferredHabitScoringTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='planner', display_name='Planner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        client_mock = mock.Mock()
+        client_mock.chat.completions.create.return_value = mock.Mock(
+            choices=[mock.Mock(message=mock.Mock(content='[10]'))]
+        )
+        patcher = mock.patch.object(ai_service, 'client', client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client_mock = client_mock
+
+    def test_create_returns_provisional_xp_then_finalizes(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/game/habits/', {
+                'name': 'Marathon Training Block', 'category': 'strength', 'frequency': 'daily'
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['xp_status'], 'provisional')
+        self.client_mock.chat.completions.create.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+
+        habit = Habit.objects.get(pk=response.data['id'])
+        self.assertEqual(habit.xp_status, 'final')
+        self.assertEqual(habit.xp_reward, ai_service.calculate_xp_from_difficulty(10, 'daily'))
+
+    def test_bulk_created_habits_are_scored_in_one_batch(self):
+        self.client_mock.chat.completions.create.return_value = mock.Mock(
+            choices=[mock.Mock(message=mock.Mock(content='[6, 6, 6]'))]
+        )
+        habits = [
+            Habit(user=self.user, name=name, category='strength', frequency='daily', xp_reward=10, xp_status='provisional')
+            for name in ('Push-ups', 'Squats', 'Plank')
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.bulk_create(habits)
+            schedule_habits_scoring([habit.id for habit in habits])
+
+        self.assertEqual(self.client_mock.chat.completions.create.call_count, 1)
+        for habit in Habit.objects.filter(user=self.user):
+            self.assertEqual(habit.xp_status, 'final')
+            self.assertEqual(habit.xp_reward, ai_service.calculate_xp_from_difficulty(6, habit.frequency))
+
+
+class DifficultyBatcherTests(TestCase):
+    def setUp(self):
+        self.service = AIService()
+        self.service.client = mock.Mock()
+        self.batcher = DifficultyBatcher(self.service, max_batch_size=3, window_ms=200)
+
+    def _respond(self, content):
+        self.service.client.chat.completions.create.return_value = mock.Mock(
+            choices=[mock.Mock(message=mock.Mock(content=content))]
+        )
+
+    def test_concurrent_requests_share_one_completion(self):
+        self._respond('[2, 5, 9]')
+        futures = [self.batcher.submit(f'Habit {i}', '', 'daily') for i in range(3)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [2, 5, 9])
+        self.assertEqual(self.service.client.chat.completions.create.call_count, 1)
+
+    def test_group_is_submitted_together(self):
+        self._respond('[4, 4, 4]')
+        scores = self.batcher.score_many([(f'Habit {i}', '', 'daily') for i in range(3)])
+        self.assertEqual(scores, [4, 4, 4])
+        self.assertEqual(self.service.client.chat.completions.create.call_count, 1)
+
+    def test_wait_is_bounded(self):
+        release = threading.Event()
+        self.service.client.chat.completions.create.side_effect = lambda **kwargs: release.wait(5)
+        self.batcher.wait_seconds = 0.05
+        with mock.patch('builtins.print'):
+            score = self.batcher.score('Stretch', '', 'daily')
+        release.set()
+        self.assertEqual(score, self.service._fallback_difficulty_calculation('Stretch', '', 'daily'))
+        self.assertEqual(self.service.resilience_stats()['timeouts'], 1)
+
+    def test_unparseable_batch_falls_back_to_heuristic(self):
+        self._respond('two, five')
+        self.assertEqual(
+            self.batcher.score('Stretch', '', 'daily'),
+            self.service._fallback_difficulty_calculation('Stretch', '', 'daily')
+        )
+
+
+class XPCurveTests(TestCase):
+    def _loop_add_xp(self, level, current_xp, next_level_xp, amount):
+        """The original level-by-level loop, as a reference"""
+        current_xp += amount
+        while current_xp >= next_level_xp:
+            current_xp -= next_level_xp
+            level += 1
+            next_level_xp = int(next_level_xp * 1.5)
+        return level, current_xp, next_level_xp
+
+    def test_matches_loop_for_any_grant(self):
+        for amount in (0, 1, 99, 100, 250, 1234, 10 ** 6):
+            resolved = xp_curve.resolve_character_xp(1, 0, 100, amount)[:3]
+            self.assertEqual(resolved, self._loop_add_xp(1, 0, 100, amount))
+
+    def test_lifetime_xp_round_trips(self):
+        level, current_xp, _, _ = xp_curve.resolve_character_xp(1, 0, 100, 54321)
+        self.assertEqual(xp_curve.total_lifetime_xp(level, current_xp), 54321)
+        self.assertEqual(xp_curve.level_for_lifetime_xp(54321), level)
+
+    def test_large_attribute_grant_gains_several_levels(self):
+        user = CustomUser(level=1, strength=1, strength_xp=50)
+        user.apply_xp(275, 'strength')
+        self.assertEqual((user.strength, user.strength_xp), (4, 25))
+        self.assertEqual(user.max_hp, 100 + 10 * (user.level - 1))
+
+
+class CheckInCalendarTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='regular', display_name='Regular')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_check_in_sets_todays_bit_once(self):
+        self.assertEqual(self.client.post('/api/game/daily-checkin/check_in/').status_code, 201)
+        self.assertEqual(self.client.post('/api/game/daily-checkin/check_in/').status_code, 400)
+        self.assertTrue(has_checked_in(self.user, timezone.now().date()))
+        self.assertEqual(DailyCheckIn.objects.filter(user=self.user).count(), 1)
+
+    def test_streaks_span_year_boundary(self):
+        days = [date(2025, 12, 29), date(2025, 12, 30), date(2025, 12, 31), date(2026, 1, 1),
+                date(2026, 1, 5), date(2026, 1, 6)]
+        for year in (2025, 2026):
+            CheckInCalendar.objects.create(
+                user=self.user, year=year, days=encode_days(d for d in days if d.year == year)
+            )
+
+        summary = checkin_summary(self.user, date(2026, 1, 7))
+        self.assertEqual(summary['longest_streak'], 4)
+        self.assertEqual(summary['current_streak'], 2)
+        self.assertFalse(summary['checked_in_today'])
+        self.assertEqual(summary['checkin_dates'], [d.isoformat() for d in days])
+
+        self.assertEqual(checkin_summary(self.user, date(2026, 1, 8))['current_streak'], 0)
+
+    def test_backfill_command_rebuilds_bitsets(self):
+        DailyCheckIn.objects.create(user=self.user)
+        CheckInCalendar.objects.all().delete()
+        call_command('rebuild_checkin_calendars', stdout=io.StringIO())
+        self.assertTrue(has_checked_in(self.user, timezone.now().date()))
+
+    def test_rebuild_keeps_existing_rows_and_drops_unbacked_ones(self):
+        self.client.post('/api/game/daily-checkin/check_in/')
+        stray = CheckInCalendar.objects.create(user=self.user, year=2001, days=encode_days([date(2001, 5, 5)]))
+        call_command('rebuild_checkin_calendars', stdout=io.StringIO())
+        self.assertTrue(has_checked_in(self.user, timezone.now().date()))
+        self.assertFalse(CheckInCalendar.objects.filter(pk=stray.pk).exists())
+
+    def test_migration_backfills_existing_check_ins(self):
+        backfill = import_module('api.migrations.0016_checkincalendar').backfill_calendars
+        DailyCheckIn.objects.create(user=self.user)
+        CheckInCalendar.objects.all().delete()
+        backfill(django_apps, None)
+
+        # Already checked in today, so no second reward
+        self.assertEqual(self.client.post('/api/game/daily-checkin/check_in/').status_code, 400)
+        self.assertEqual(self.client.get('/api/game/daily-checkin/history/').data['total_checkins'], 1)
+
+    def test_history_uses_single_query(self):
+        self.client.post('/api/game/daily-checkin/check_in/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/game/daily-checkin/history/')
+        self.assertEqual(response.data['total_checkins'], 1)
+        self.assertEqual(response.data['current_streak'], 1)
+
+
+class CompletionRollupTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='tracker', display_name='Tracker')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habits = [
+            Habit.objects.create(user=self.user, name='Lift', category='strength', xp_reward=20),
+            Habit.objects.create(user=self.user, name='Squat', category='strength', xp_reward=20),
+            Habit.objects.create(user=self.user, name='Study', category='intelligence', xp_reward=30),
+        ]
+
+    def test_completions_update_rollups(self):
+        for habit in self.habits:
+            complete_habit(self.user, habit.id)
+
+        rollups = {r.category: r for r in CompletionRollup.objects.filter(user=self.user)}
+        self.assertEqual(rollups['strength'].completions, 2)
+        self.assertEqual(
+            rollups['strength'].xp_earned,
+            sum(HabitCompletion.objects.filter(habit__category='strength').values_list('xp_earned', flat=True))
+        )
+
+        response = self.client.get('/api/game/stats/detailed/')
+        by_category = {row['category']: row for row in response.data['category_stats']}
+        self.assertEqual(by_category['strength']['total_habits'], 2)
+        self.assertEqual(by_category['strength']['total_completions'], 2)
+        self.assertEqual(by_category['intelligence']['total_completions'], 1)
+
+        activity = self.client.get('/api/game/stats/activity/?days=7').data
+        self.assertEqual(len(activity), 1)
+        self.assertEqual(activity[0]['completions'], 3)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for habit in self.habits:
+            complete_habit(self.user, habit.id)
+        before = sorted(CompletionRollup.objects.values_list('user_id', 'day', 'category', 'completions', 'xp_earned'))
+
+        call_command('rebuild_completion_rollups', stdout=io.StringIO())
+        after = sorted(CompletionRollup.objects.values_list('user_id', 'day', 'category', 'completions', 'xp_earned'))
+        self.assertEqual(before, after)
+
+    def test_deleting_completions_updates_rollups(self):
+        for habit in self.habits:
+            complete_habit(self.user, habit.id)
+        HabitCompletion.objects.filter(habit=self.habits[0]).delete()
+        strength = CompletionRollup.objects.get(user=self.user, category='strength')
+        self.assertEqual(strength.completions, 1)
+        self.assertEqual(
+            strength.xp_earned, HabitCompletion.objects.get(habit=self.habits[1]).xp_earned
+        )
+
+        # Deleting a habit cascades to its completions
+        self.habits[2].delete()
+        self.assertFalse(CompletionRollup.objects.filter(user=self.user, category='intelligence').exists())
+
+    def test_migration_backfills_existing_completions(self):
+        backfill = import_module('api.migrations.0017_completionrollup').backfill_rollups
+        for habit in self.habits:
+            complete_habit(self.user, habit.id)
+        before = sorted(CompletionRollup.objects.values_list('user_id', 'day', 'category', 'completions', 'xp_earned'))
+        CompletionRollup.objects.all().delete()
+        backfill(django_apps, None)
+        after = sorted(CompletionRollup.objects.values_list('user_id', 'day', 'category', 'completions', 'xp_earned'))
+        self.assertEqual(before, after)
+
+    def test_rebuild_across_user_ranges(self):
+        other = CustomUser.objects.create_user(username='other', display_name='Other')
+        other_habit = Habit.objects.create(user=other, name='Run', category='health', xp_reward=10)
+        complete_habit(self.user, self.habits[0].id)
+        complete_habit(other, other_habit.id)
+        before = sorted(CompletionRollup.objects.values_list('user_id', 'day', 'category', 'completions', 'xp_earned'))
+        # A stray row the raw completions don't back is dropped
+        CompletionRollup.objects.create(
+            user=other, day=timezone.now().date() - timedelta(days=3), category='health', completions=4, xp_earned=40
+        )
+
+        call_command('rebuild_completion_rollups', users_per_chunk=1, stdout=io.StringIO())
+        after = sorted(CompletionRollup.objects.values_list('user_id', 'day', 'category', 'completions', 'xp_earned'))
+        self.assertEqual(before, after)
+
+
+class TowerWaveTests(TestCase):
+    def setUp(self):
+        wave_generator.invalidate()
+        self.user = CustomUser.objects.create_user(username='climber', display_name='Climber')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        wave_generator.invalidate()
+
+    def test_waves_come_from_enemy_catalog(self):
+        Enemy.objects.create(name='Bat', level=1, base_hp=40, base_damage=3, xp_reward=15, gold_reward=5)
+        Enemy.objects.create(name='Golem', level=3, base_hp=200, base_damage=20, xp_reward=50, gold_reward=30)
+
+        waves = wave_generator.waves_for(self.user.id, 2, seed=7)
+        self.assertEqual({wave['name'].rsplit(' ', 1)[0] for wave in waves}, {'Bat'})
+        self.assertEqual(waves[0]['base_hp'], int(40 * 1.15))
+
+        waves = wave_generator.waves_for(self.user.id, 5, seed=7)
+        self.assertEqual({wave['name'].rsplit(' ', 1)[0] for wave in waves}, {'Golem'})
+        self.assertEqual(waves[-1]['xp_reward'], 50 * 5)
+
+    def test_repeated_start_is_deterministic_and_memoized(self):
+        first = self.client.post('/api/game/tower/start_floor/').data
+        with self.assertNumQueries(1):  # Only the TowerProgress lookup
+            second = self.client.post('/api/game/tower/start_floor/').data
+        self.assertEqual(first, second)
+
+        wave_generator.invalidate()
+        self.assertEqual(self.client.post('/api/game/tower/start_floor/').data, first)
+
+    def test_completing_a_floor_rerolls_the_seed(self):
+        self.client.post('/api/game/tower/start_floor/')
+        response = self.client.post('/api/game/tower/complete_floor/')
+        self.assertEqual(response.data['next_floor'], 2)
+        self.assertNotEqual(TowerProgress.objects.get(user=self.user).wave_seed, 0)
+
+
+class TowerLootTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='looter', display_name='Looter')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_drops_reuse_templates(self):
+        catalog_size = Equipment.objects.count()
+        for floor in range(1, 60):
+            grant_loot(self.user, floor)
+        # 5 slots x 5 base names (Greaves appears in two slots)
+        self.assertLessEqual(Equipment.objects.count() - catalog_size, 25)
+        self.assertEqual(Equipment.objects.filter(is_loot_template=False).count(), catalog_size)
+
+    def test_concurrent_first_drop_reuses_the_other_template(self):
+        real_get = QuerySet.get
+
+        def created_elsewhere_first(queryset, *args, **kwargs):
+            # The first lookup misses, and another worker creates the template before our insert
+            mocked_get.side_effect = real_get
+            Equipment.objects.create(
+                is_loot_template=True, equipment_slot='weapon', name='Sword', equipment_type='outfit'
+            )
+            raise Equipment.DoesNotExist
+
+        with mock.patch.object(QuerySet, 'get', autospec=True, side_effect=created_elsewhere_first) as mocked_get:
+            template = get_loot_template('weapon', 'Sword')
+
+        templates = Equipment.objects.filter(is_loot_template=True, equipment_slot='weapon', name='Sword')
+        self.assertEqual(list(templates), [template])
+
+    def test_rolled_stats_drive_bonus_and_listing(self):
+        user_equipment = grant_loot(self.user, 10)
+
+        response = self.client.post(f'/api/game/equipment/inventory/{user_equipment.id}/equip/')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        for stat_name, value in user_equipment.rolled_stats.items():
+            self.assertEqual(getattr(self.user, f"{stat_name}_bonus"), value)
+
+        rows = self.client.get('/api/game/equipment/inventory/').data['results']
+        listed = next(row for row in rows if row['id'] == user_equipment.id)
+        self.assertTrue(listed['is_equipped'])
+        self.assertEqual(listed['equipment']['name'], user_equipment.display_name)
+        self.assertEqual(listed['equipment']['stat_bonus'], user_equipment.rolled_stats)
+
+        # Other players can't equip someone else's drop
+        other = CustomUser.objects.create_user(username='bystander', display_name='Bystander')
+        self.client.force_authenticate(other)
+        response = self.client.post(f'/api/game/equipment/inventory/{user_equipment.id}/equip/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_duplicate_drops_are_separate_items(self):
+        rng = mock.Mock()
+        rng.choice.side_effect = lambda options: options[0]
+        rng.sample.side_effect = lambda population, k: population[:k]
+        rng.randint.return_value = 0
+        weak = grant_loot(self.user, 1, rng=rng)
+        strong = grant_loot(self.user, 9, rng=rng)
+        self.assertEqual(weak.equipment_id, strong.equipment_id)
+        self.assertEqual(UserEquipment.objects.filter(user=self.user, equipment=weak.equipment).count(), 2)
+
+        # Equipping is per item: each keeps its own roll and equipped state
+        self.client.post(f'/api/game/equipment/inventory/{weak.id}/equip/')
+        self.client.post(f'/api/game/equipment/inventory/{strong.id}/equip/')
+        weak.refresh_from_db()
+        strong.refresh_from_db()
+        self.assertFalse(weak.is_equipped)
+        self.assertTrue(strong.is_equipped)
+
+        self.user.refresh_from_db()
+        for stat_name, value in strong.rolled_stats.items():
+            self.assertEqual(getattr(self.user, f"{stat_name}_bonus"), value)
+
+        equipped = self.client.get('/api/game/equipment/equipped/').data
+        self.assertEqual([(item['item_id'], item['name']) for item in equipped], [(strong.id, strong.display_name)])
+
+
+class InventoryEndpointTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='collector', display_name='Collector')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            item = Equipment.objects.create(
+                name=f'Ring {i}', equipment_type='accessory', equipment_slot='accessory'
+            )
+            UserEquipment.objects.create(user=self.user, equipment=item, is_equipped=(i == 0))
+        self.owned = UserEquipment.objects.filter(user=self.user).count()
+
+    def test_keyset_pages_cover_inventory_once(self):
+        seen = []
+        params = {'limit': 3}
+        while True:
+            with self.assertNumQueries(1):
+                data = self.client.get('/api/game/equipment/inventory/', params).data
+            seen += [row['id'] for row in data['results']]
+            if data['next_cursor'] is None:
+                break
+            params['after'] = data['next_cursor']
+        self.assertEqual(len(seen), self.owned)
+        self.assertEqual(len(set(seen)), self.owned)
+
+    def test_filters(self):
+        data = self.client.get('/api/game/equipment/inventory/', {'slot': 'accessory', 'equipped': 'true'}).data
+        names = [row['equipment']['name'] for row in data['results']]
+        self.assertIn('Ring 0', names)
+        self.assertNotIn('Ring 1', names)
+
+
+class CombatSimulatorTests(TestCase):
+    def setUp(self):
+        wave_generator.invalidate()
+        self.waves = wave_generator.waves_for(1, 2, seed=3)
+
+    def tearDown(self):
+        wave_generator.invalidate()
+
+    def test_replay_is_deterministic(self):
+        player = {'hp': 100, 'strength': 5, 'intelligence': 5, 'creativity': 5}
+        first = simulate_floor(self.waves, player, seed='1:2:3')
+        self.assertEqual(first, simulate_floor(self.waves, player, seed='1:2:3'))
+        self.assertEqual(len(first['log']), first['waves_cleared'] + (0 if first['victory'] else 1))
+
+    def test_stats_decide_the_outcome(self):
+        strong = {'hp': 100, 'strength': 200, 'intelligence': 80, 'creativity': 100}
+        weak = {'hp': 1, 'strength': 1, 'intelligence': 1, 'creativity': 1}
+        self.assertTrue(simulate_floor(self.waves, strong, seed=0)['victory'])
+        self.assertFalse(simulate_floor(self.waves, weak, seed=0)['victory'])
+
+    def _complete_as_glass_cannon(self):
+        user = CustomUser.objects.create_user(username='glass', display_name='Glass', current_hp=1)
+        client = APIClient()
+        client.force_authenticate(user)
+        return user, client.post('/api/game/tower/complete_floor/')
+
+    @override_settings(TOWER_VERIFY_CLEARS=True)
+    def test_unverified_clear_is_rejected_as_a_defeat(self):
+        with mock.patch('builtins.print'):
+            user, response = self._complete_as_glass_cannon()
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['defeat'])
+        self.assertFalse(response.data['combat']['victory'])
+        progress = TowerProgress.objects.get(user=user)
+        self.assertEqual(progress.current_floor, 1)
+        self.assertNotEqual(progress.wave_seed, 0)  # Retry gets new waves
+
+    def test_verification_is_off_by_default(self):
+        user, response = self._complete_as_glass_cannon()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['combat']['victory'])
+        self.assertEqual(TowerProgress.objects.get(user=user).current_floor, 2)
+
+
+class RegistrationEquipmentTests(TestCase):
+    def _registration_queries(self, username):
+        with CaptureQueriesContext(connection) as queries:
+            CustomUser.objects.create_user(username=username, display_name=username)
+        return len(queries)
+
+    def test_query_count_is_independent_of_catalog_size(self):
+        baseline = self._registration_queries('first')
+        Equipment.objects.bulk_create([
+            Equipment(name=f'Trinket {i}', equipment_type='accessory', equipment_slot='accessory')
+            for i in range(50)
+        ])
+        self.assertEqual(self._registration_queries('second'), baseline)
+
+    def test_new_user_gets_starter_set_only(self):
+        Equipment.objects.create(name='Shop Ring', equipment_type='accessory', equipment_slot='accessory')
+        theme = Equipment.objects.create(
+            name='Default Theme', equipment_type='theme', is_default=True, stat_bonus={'social': 2}
+        )
+        user = CustomUser.objects.create_user(username='newbie', display_name='Newbie')
+
+        owned = UserEquipment.objects.filter(user=user)
+        self.assertFalse(owned.filter(equipment__name='Shop Ring').exists())
+        self.assertTrue(owned.get(equipment=theme).is_equipped)
+        user.refresh_from_db()
+        self.assertEqual(user.social_bonus, 2)
+
+
+class GenerateDatasetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.settings_override = override_settings(LEADERBOARD_SNAPSHOT_PATH=f'{cls.tmpdir.name}/ranks')
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.tmpdir.cleanup()
+        super().tearDownClass()
+
+    def _generate(self, prefix):
+        call_command(
+            'generate_dataset', users=6, habits_per_user=3, completions_per_habit=5, days=30,
+            workers=1, chunk_users=4, prefix=prefix, seed=7, stdout=io.StringIO()
+        )
+        return CustomUser.objects.filter(username__startswith=prefix).order_by('id')
+
+    def test_generates_consistent_rows(self):
+        users = self._generate('load_')
+        self.assertEqual(users.count(), 6)
+        for user in users:
+            completions = HabitCompletion.objects.filter(user=user)
+            rollup_total = sum(CompletionRollup.objects.filter(user=user).values_list('completions', flat=True))
+            self.assertEqual(rollup_total, completions.count())
+            self.assertEqual(
+                xp_curve.total_lifetime_xp(user.level, user.current_xp), user.lifetime_xp
+            )
+
+            # At most one completion per habit per day and one check-in per day, none in the future
+            now = timezone.now()
+            completion_days = [(c.habit_id, c.completed_at.date()) for c in completions]
+            self.assertEqual(len(completion_days), len(set(completion_days)))
+            checkin_times = list(DailyCheckIn.objects.filter(user=user).values_list('checked_in_at', flat=True))
+            self.assertEqual(len(checkin_times), len({moment.date() for moment in checkin_times}))
+            self.assertTrue(all(moment <= now for moment in checkin_times))
+            self.assertTrue(all(c.completed_at <= now for c in completions))
+
+            # Stored streaks agree with the completion dates
+            for habit in Habit.objects.filter(user=user):
+                days = {c.completed_at.date() for c in completions if c.habit_id == habit.id}
+                day = now.date() if now.date() in days else now.date() - timedelta(days=1)
+                streak = 0
+                while day in days:
+                    streak += 1
+                    day -= timedelta(days=1)
+                self.assertEqual(habit.streak, streak)
+
+    def test_same_seed_same_dataset(self):
+        first = [(u.lifetime_xp, u.level) for u in self._generate('a_')]
+        second = [(u.lifetime_xp, u.level) for u in self._generate('b_')]
+        self.assertEqual(first, second)
+
+
+class BenchmarkBudgetTests(TestCase):
+    def test_budgets_from_results_fit_their_own_run(self):
+        results = {'stats': {'ms': 12.5, 'queries': 2, 'peak_kb': 40.0}}
+        budgets = benchmarks.budgets_from_results(results)
+        self.assertEqual(budgets['stats']['max_queries'], 2)
+        self.assertEqual(benchmarks.check_budgets(results, budgets), [])
+
+    def test_extra_query_is_a_violation(self):
+        budgets = {'stats': {'max_queries': 2, 'max_ms': 50, 'max_peak_kb': 100}}
+        results = {'stats': {'ms': 10, 'queries': 3, 'peak_kb': 20}}
+        violations = benchmarks.check_budgets(results, budgets)
+        self.assertEqual(len(violations), 1)
+        self.assertIn('queries', violations[0])
+
+    def test_measures_an_endpoint(self):
+        user = CustomUser.objects.create_user(username='bench', password='pw')
+        client = APIClient()
+        client.force_authenticate(user)
+        measured = benchmarks.measure_endpoint(client, 'get', '/api/game/stats/', repeats=2)
+        self.assertGreater(measured['queries'], 0)
+        self.assertGreater(measured['peak_kb'], 0)
+
+    def test_cold_calls_miss_the_read_model_cache(self):
+        user = CustomUser.objects.create_user(username='bench', password='pw')
+        client = APIClient()
+        client.force_authenticate(user)
+        path = '/api/game/achievements/'
+        cold = benchmarks.measure_endpoint(
+            client, 'get', path, repeats=2, before_call=lambda: read_models.invalidate(user.id)
+        )
+        warm = benchmarks.measure_endpoint(client, 'get', path, repeats=2)
+        self.assertEqual(cold['queries'], warm['queries'] + 1)  # + the progress map
+
+
+class DBInstrumentationTests(TestCase):
+    def test_fingerprint_ignores_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s)  AND name = 'y'"),
+        )
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id = 42'), 'SELECT * FROM t WHERE id = ?')
+
+    def test_server_timing_header(self):
+        user = CustomUser.objects.create_user(username='timed', password='pw')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/game/stats/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertNotIn('db-repeated', response['Server-Timing'])
+
+    def test_repeated_queries_are_flagged(self):
+        users = [CustomUser.objects.create_user(username=f'n{i}', password='pw') for i in range(6)]
+
+        def n_plus_one_view(request):
+            for user in users:
+                CustomUser.objects.get(pk=user.pk)
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/loop/')
+        with mock.patch('builtins.print') as log:
+            response = QueryInstrumentationMiddleware(n_plus_one_view)(request)
+
+        self.assertIn('db-repeated', response['Server-Timing'])
+        line = log.call_args[0][0]
+        self.assertTrue(line.startswith('[DB] '))
+        payload = json.loads(line[len('[DB] '):])
+        self.assertTrue(payload['n_plus_one'])
+        self.assertEqual(payload['repeated'][0]['count'], 6)
+
+
+class RequestProfilerTests(TestCase):
+    def _client(self, is_superuser):
+        user = CustomUser.objects.create_user(username='prof', password='pw', is_superuser=is_superuser)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        return client
+
+    def test_inline_profile_for_superuser(self):
+        response = self._client(True).get('/api/game/stats/', HTTP_X_PROFILE='inline')
+        report = response.json()
+        self.assertEqual(report['status'], 200)
+        self.assertGreater(report['orm']['queries'], 0)
+        self.assertTrue(report['top_functions'])
+        self.assertIn('peak_kb', report)
+
+    def test_report_written_to_file(self):
+        with tempfile.TemporaryDirectory() as output_dir, override_settings(PROFILE_OUTPUT_DIR=output_dir):
+            with mock.patch('builtins.print'):
+                response = self._client(True).get('/api/game/stats/?_profile=1')
+            name = response['X-Profile-Report']
+            report = json.loads((Path(output_dir) / f'{name}.json').read_text())
+            self.assertTrue((Path(output_dir) / f'{name}.prof').exists())
+        self.assertEqual(report['path'], '/api/game/stats/?_profile=1')
+
+    def test_ignored_for_regular_users(self):
+        response = self._client(False).get('/api/game/stats/', HTTP_X_PROFILE='inline')
+        self.assertIn('level', response.json())
+        self.assertFalse(response.has_header('X-Profile-Report'))
+
+    def test_session_superuser_can_profile(self):
+        user = CustomUser.objects.create_user(username='admin', password='pw', is_superuser=True)
+        client = APIClient()
+        client.force_login(user)
+        report = client.get('/api/game/stats/', HTTP_X_PROFILE='inline').json()
+        self.assertEqual(report['status'], 200)
+
+    def test_only_explicit_values_turn_profiling_on(self):
+        client = self._client(True)
+        for value in ('0', 'false', 'no', ''):
+            response = client.get('/api/game/stats/', HTTP_X_PROFILE=value)
+            self.assertIn('level', response.json())
+            self.assertFalse(response.has_header('X-Profile-Report'))
+
+
+class AIResilienceTests(TestCase):
+    def setUp(self):
+        self.service = AIService()
+        self.service.client = mock.Mock()
+        self.service.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+        self.create = self.service.client.chat.completions.create
+        self.fallback = self.service._fallback_difficulty_calculation('Plank', '', 'daily')
+
+    def _respond(self, content):
+        self.create.side_effect = None
+        self.create.return_value = mock.Mock(choices=[mock.Mock(message=mock.Mock(content=content))])
+
+    def test_calls_carry_a_deadline(self):
+        self._respond('6')
+        self.assertEqual(self.service.calculate_habit_difficulty('Plank', '', 'daily'), 6)
+        self.assertEqual(self.create.call_args.kwargs['timeout'], self.service.timeout)
+        self.assertEqual(self.service.resilience_stats()['latency']['single']['count'], 1)
+
+    def test_breaker_opens_then_recovers(self):
+        self.create.side_effect = TimeoutError('upstream timed out')
+        for _ in range(3):
+            self.assertEqual(self.service.calculate_habit_difficulty('Plank', '', 'daily'), self.fallback)
+        self.assertEqual(self.create.call_count, 2)  # third call short-circuited
+        self.assertEqual(self.service.breaker.stats()['state'], 'open')
+
+        time.sleep(0.06)
+        self._respond('8')
+        self.assertEqual(self.service.calculate_habit_difficulty('Plank', '', 'daily'), 8)
+        self.assertEqual(self.service.breaker.state, 'closed')
+
+    def test_hedge_answers_with_heuristic_and_keeps_late_score(self):
+        def slow_completion(**kwargs):
+            time.sleep(0.2)
+            return mock.Mock(choices=[mock.Mock(message=mock.Mock(content='9'))])
+
+        self.create.side_effect = slow_completion
+        self.service.hedge_ms = 20
+        self.assertEqual(self.service.calculate_habit_difficulty('Plank', '', 'daily'), self.fallback)
+
+        deadline = time.monotonic() + 2
+        while self.service.resilience_stats()['late_scores'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.service.resilience_stats()['hedged'], 1)
+        self.assertEqual(self.service.calculate_habit_difficulty('Plank', '', 'daily'), 9)
+        self.assertEqual(self.create.call_count, 1)
+
+    def test_stats_endpoint_is_superuser_only(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(username='plain', password='pw'))
+        self.assertEqual(client.get('/api/admin/ai-service-stats/').status_code, 403)
+
+        client.force_authenticate(CustomUser.objects.create_superuser(username='root', password='pw'))
+        response = client.get('/api/admin/ai-service-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('state', response.data['breaker'])
+
+
+class ReadModelCacheTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='cached', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_stats_cached_until_user_changes(self):
+        self.client.get('/api/game/stats/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/game/stats/').data['level'], 1)
+
+        self.user.add_xp(500)
+        self.assertEqual(self.client.get('/api/game/stats/').data['level'], self.user.level)
+        self.assertGreater(self.user.level, 1)
+
+    def test_equip_invalidates_equipped_items(self):
+        item = Equipment.objects.create(
+            name='Lucky Charm', equipment_type='accessory', equipment_slot='accessory',
+            stat_bonus={'social': 2}
+        )
+        UserEquipment.objects.create(user=self.user, equipment=item, is_equipped=False)
+        self.assertEqual(self.client.get('/api/game/equipment/equipped/').data, [])
+
+        self.client.post(f'/api/game/equipment/{item.id}/equip/')
+        names = [row['name'] for row in self.client.get('/api/game/equipment/equipped/').data]
+        self.assertEqual(names, ['Lucky Charm'])
+
+    def test_catalog_change_invalidates_equipped_items(self):
+        item = Equipment.objects.create(name='Lucky Charm', equipment_type='accessory', equipment_slot='accessory')
+        UserEquipment.objects.create(user=self.user, equipment=item, is_equipped=True)
+        self.assertEqual(self.client.get('/api/game/equipment/equipped/').data[0]['name'], 'Lucky Charm')
+
+        item.name = 'Lucky Clover'
+        item.save()
+        self.assertEqual(self.client.get('/api/game/equipment/equipped/').data[0]['name'], 'Lucky Clover')
+
+    @override_settings(WEB_CONCURRENCY=4)
+    def test_local_memory_cache_is_off_with_several_workers(self):
+        before = read_models.stats()['read_models']['stats']
+        with mock.patch('builtins.print'):
+            self.assertFalse(read_models.enabled)
+            self.client.get('/api/game/stats/')
+            self.client.get('/api/game/stats/')
+            after = read_models.stats()['read_models']['stats']
+        self.assertEqual(after['hits'], before['hits'])
+        self.assertEqual(after['misses'], before['misses'])
+
+    @override_settings(
+        WEB_CONCURRENCY=4,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}},
+    )
+    def test_shared_cache_stays_on_with_several_workers(self):
+        self.assertTrue(read_models.enabled)
+
+    def test_achievement_progress_invalidated_on_unlock(self):
+        achievement = Achievement.objects.create(
+            name='First Step', description='', requirement_type='level',
+            requirement_value=1, reward_description=''
+        )
+        self.assertFalse(self.client.get('/api/game/achievements/').data[0]['is_unlocked'])
+        UserAchievement.objects.create(user=self.user, achievement=achievement, progress=1)
+        self.assertTrue(self.client.get('/api/game/achievements/').data[0]['is_unlocked'])
+
+    def test_hit_ratio_reported(self):
+        read_models.invalidate(self.user.id)
+        before = read_models.stats()['read_models']['stats']
+        self.client.get('/api/game/stats/')
+        self.client.get('/api/game/stats/')
+        after = read_models.stats()['read_models']['stats']
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
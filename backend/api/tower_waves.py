@@ -0,0 +1,122 @@
+"""
+Deterministic tower wave generation.
+
+Enemy templates come from the Enemy table, grouped into tiers by their level
+(the tier for a floor is the highest template level at or below it). Waves
+are derived from (user, floor, seed) with a private Random, so the same
+attempt always produces the same waves, and generated floors are memoized
+so repeated start/complete calls are a dictionary lookup.
+"""
+import bisect
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from .models import Enemy
+
+WAVES_PER_FLOOR = 5
+
+# Used until the Enemy table is seeded (see seed_enemies)
+DEFAULT_ENEMY_TEMPLATES = [
+    {'name': 'Blue Slime', 'level': 1, 'base_hp': 70, 'base_damage': 8,
+     'sprite_path': '/enemies/blue_slime.png', 'xp_reward': 20, 'gold_reward': 10},
+    {'name': 'Red Slime', 'level': 1, 'base_hp': 70, 'base_damage': 8,
+     'sprite_path': '/enemies/red_slime.png', 'xp_reward': 20, 'gold_reward': 10},
+    {'name': 'Skeleton Warrior', 'level': 4, 'base_hp': 70, 'base_damage': 8,
+     'sprite_path': '/enemies/skeleton_warrior.png', 'xp_reward': 20, 'gold_reward': 10},
+    {'name': 'Skeleton Captain', 'level': 4, 'base_hp': 70, 'base_damage': 8,
+     'sprite_path': '/enemies/skeleton_captain.png', 'xp_reward': 20, 'gold_reward': 10},
+]
+
+TEMPLATE_FIELDS = ('name', 'level', 'base_hp', 'base_damage', 'sprite_path', 'xp_reward', 'gold_reward')
+
+
+class WaveGenerator:
+    """Builds and memoizes floor waves from a cached enemy catalog"""
+
+    # Other worker processes pick up catalog edits after this long
+    TTL_SECONDS = 300
+    MAX_CACHED_FLOORS = 4096
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = None  # (sorted tier levels, templates per tier)
+        self._built_at = 0
+        self._floors = OrderedDict()  # (user_id, floor, seed) -> waves
+
+    def invalidate(self):
+        with self._lock:
+            self._tiers = None
+            self._floors.clear()
+
+    def _build_tiers(self):
+        templates = list(Enemy.objects.order_by('level', 'id').values(*TEMPLATE_FIELDS)) or DEFAULT_ENEMY_TEMPLATES
+        by_level = {}
+        for template in templates:
+            by_level.setdefault(template['level'], []).append(template)
+        levels = sorted(by_level)
+        return levels, [by_level[level] for level in levels]
+
+    def _get_tiers(self):
+        with self._lock:
+            if self._tiers is None or time.monotonic() - self._built_at > self.TTL_SECONDS:
+                self._tiers = self._build_tiers()
+                self._built_at = time.monotonic()
+                self._floors.clear()
+            return self._tiers
+
+    def _templates_for_floor(self, floor):
+        levels, tiers = self._get_tiers()
+        # Highest tier unlocked at this floor (the lowest tier if none is)
+        return tiers[max(0, bisect.bisect_right(levels, floor) - 1)]
+
+    def _generate(self, user_id, floor, seed):
+        rng = random.Random(f"{user_id}:{floor}:{seed}")
+        templates = self._templates_for_floor(floor)
+
+        waves = []
+        for i in range(WAVES_PER_FLOOR):
+            template = rng.choice(templates)
+            waves.append({
+                'id': i + 1,  # Pseudo ID for the session
+                'name': f"{template['name']} {i + 1}",
+                'level': floor,
+                # HP: Exponential Growth (base * 1.15^(floor-1))
+                'base_hp': int(template['base_hp'] * (1.15 ** (floor - 1))) + (i * 5),
+                # Damage: Aggressive Linear (base + 2.5*floor)
+                'base_damage': int(template['base_damage'] + (2.5 * floor)) + i,
+                'sprite_path': template['sprite_path'],
+                'xp_reward': template['xp_reward'] * floor,
+                'gold_reward': template['gold_reward'] * floor
+            })
+        return waves
+
+    def waves_for(self, user_id, floor, seed):
+        """Waves for this attempt at a floor (generated once, then served from memory)"""
+        key = (user_id, floor, seed)
+        with self._lock:
+            waves = self._floors.get(key)
+            if waves is not None:
+                self._floors.move_to_end(key)
+                return waves
+
+        waves = self._generate(user_id, floor, seed)
+        with self._lock:
+            self._floors[key] = waves
+            while len(self._floors) > self.MAX_CACHED_FLOORS:
+                self._floors.popitem(last=False)
+        return waves
+
+    def forget(self, user_id, floor, seed):
+        """Drop a finished attempt from the memo"""
+        with self._lock:
+            self._floors.pop((user_id, floor, seed), None)
+
+
+def new_wave_seed():
+    return random.randint(0, 2 ** 31 - 1)
+
+
+# Singleton instance
+wave_generator = WaveGenerator()
@@ -3,7 +3,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     health, user_profile, change_password, update_display_name,
-    create_initial_habits, AdminUserViewSet
+    create_initial_habits, AdminUserViewSet, ai_cache_stats, ai_service_stats,
+    read_cache_stats
 )
 from .game_views import (
     UserStatsViewSet, HabitViewSet,
@@ -27,5 +28,8 @@ urlpatterns = [
     path("change-password/", change_password),
     path("update-display-name/", update_display_name),
     path("create-initial-habits/", create_initial_habits),
+    path("admin/ai-cache-stats/", ai_cache_stats),
+    path("admin/ai-service-stats/", ai_service_stats),
+    path("admin/read-cache-stats/", read_cache_stats),
     path("", include(router.urls)),
 ]
\ No newline at end of file
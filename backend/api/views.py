@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from .serializers import (
     CustomUserDetailsSerializer,
     AdminUserListSerializer,
@@ -11,6 +12,7 @@ from .serializers import (
     AdminUserUpdateSerializer
 )
 from .models import Habit
+from .habit_scoring import schedule_habits_scoring
 
 User = get_user_model()
 
@@ -27,6 +29,34 @@ class IsSuperUser(BasePermission):
 def health(request):
     return Response({"status": "ok"})
 
+@api_view(["GET"])
+@permission_classes([IsSuperUser])
+def ai_cache_stats(request):
+    """
+    Hit/miss counters for the AI difficulty cache in this worker process
+    """
+    from .ai_service import ai_service
+    return Response(ai_service.cache.stats())
+
+@api_view(["GET"])
+@permission_classes([IsSuperUser])
+def ai_service_stats(request):
+    """
+    Circuit breaker state, latency histograms and hedge counters for the AI
+    upstream in this worker process
+    """
+    from .ai_service import ai_service
+    return Response(ai_service.resilience_stats())
+
+@api_view(["GET"])
+@permission_classes([IsSuperUser])
+def read_cache_stats(request):
+    """
+    Hit ratios of the per-user read model cache in this worker process
+    """
+    from .read_models import read_models
+    return Response(read_models.stats())
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def user_profile(request):
@@ -127,27 +157,22 @@ def create_initial_habits(request):
     likelihood_to_habits = {
         'very_likely': {
             'frequency': 'daily',
-            'xp_reward': 20,
             'count': 2
         },
         'somewhat_likely': {
             'frequency': 'daily',
-            'xp_reward': 15,
             'count': 1
         },
         'neutral': {
             'frequency': 'weekly',
-            'xp_reward': 25,
             'count': 1
         },
         'somewhat_unlikely': {
             'frequency': 'weekly',
-            'xp_reward': 20,
             'count': 1
         },
         'very_unlikely': {
             'frequency': 'monthly',
-            'xp_reward': 30,
             'count': 0
         }
     }
@@ -191,7 +216,7 @@ def create_initial_habits(request):
         ]
     }
 
-    created_habits = []
+    habits = []
 
     for category, likelihood in survey_data.items():
         if category not in likelihood_to_habits:
@@ -202,22 +227,33 @@ def create_initial_habits(request):
         for i in range(config['count']):
             habit_name = habit_templates[category][i % len(habit_templates[category])]
 
-            habit = Habit.objects.create(
+            habit = Habit(
                 user=request.user,
                 name=habit_name,
                 category=category,
                 frequency=config['frequency'],
-                xp_reward=config['xp_reward'],
                 description=f"Habit for {category} development"
             )
+            # Instant estimate now; the AI scores the whole set after commit
+            habit.xp_reward, is_final = habit.calculate_provisional_xp_reward()
+            habit.xp_status = 'final' if is_final else 'provisional'
+            habits.append(habit)
+
+    with transaction.atomic():
+        Habit.objects.bulk_create(habits)
+        schedule_habits_scoring([habit.id for habit in habits if habit.xp_status == 'provisional'])
 
-            created_habits.append({
-                'id': habit.id,
-                'name': habit.name,
-                'category': habit.category,
-                'frequency': habit.frequency,
-                'xp_reward': habit.xp_reward
-            })
+    created_habits = [
+        {
+            'id': habit.id,
+            'name': habit.name,
+            'category': habit.category,
+            'frequency': habit.frequency,
+            'xp_reward': habit.xp_reward,
+            'xp_status': habit.xp_status
+        }
+        for habit in habits
+    ]
 
     return Response({
         'message': f'Created {len(created_habits)} initial habits',
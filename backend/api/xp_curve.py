@@ -0,0 +1,94 @@
+"""
+XP curve: closed-form level resolution for any XP grant.
+
+Character levels follow the original curve (100 XP for level 1 -> 2, and
+each level needs int(previous * 1.5)). Cumulative thresholds are precomputed
+so a grant of any size resolves to its final level with one bisection
+instead of a level-by-level loop. Attributes level up every 100 XP.
+"""
+import bisect
+import threading
+
+BASE_LEVEL_XP = 100
+LEVEL_XP_GROWTH = 1.5
+HP_PER_LEVEL = 10
+ATTRIBUTE_XP_PER_LEVEL = 100
+
+# _requirements[i]: XP needed to go from level i+1 to i+2
+# _thresholds[i]: total XP needed to reach level i+1 from level 1 with 0 XP
+_requirements = [BASE_LEVEL_XP]
+_thresholds = [0]
+_table_lock = threading.Lock()
+
+
+def _extend_table(lifetime_xp=0, level=0):
+    """Grow the tables until they cover this much lifetime XP and this level"""
+    with _table_lock:
+        while _thresholds[-1] <= lifetime_xp or len(_thresholds) <= level:
+            _thresholds.append(_thresholds[-1] + _requirements[-1])
+            _requirements.append(int(_requirements[-1] * LEVEL_XP_GROWTH))
+
+
+# Precompute well past any realistic level
+_extend_table(level=200)
+
+
+def xp_to_next_level(level):
+    """XP needed to go from `level` to `level + 1`"""
+    if level > len(_requirements):
+        _extend_table(level=level)
+    return _requirements[level - 1]
+
+
+def level_threshold(level):
+    """Total XP needed to reach `level` from level 1"""
+    if level > len(_thresholds):
+        _extend_table(level=level)
+    return _thresholds[level - 1]
+
+
+def level_for_lifetime_xp(lifetime_xp):
+    """Highest level reachable with this much total XP"""
+    if lifetime_xp >= _thresholds[-1]:
+        _extend_table(lifetime_xp=lifetime_xp)
+    return bisect.bisect_right(_thresholds, lifetime_xp)
+
+
+def total_lifetime_xp(level, current_xp):
+    """Total XP earned to be at `level` with `current_xp` progress"""
+    return level_threshold(level) + current_xp
+
+
+def resolve_character_xp(level, current_xp, next_level_xp, amount):
+    """
+    Apply an XP grant to a character level.
+
+    The current level is finished with the stored next_level_xp (older rows
+    may not match the curve); everything after that follows the curve.
+
+    Returns:
+        tuple: (level, current_xp, next_level_xp, levels_gained)
+    """
+    current_xp += amount
+    if current_xp < next_level_xp:
+        return level, current_xp, next_level_xp, 0
+
+    lifetime_xp = level_threshold(level + 1) + (current_xp - next_level_xp)
+    new_level = level_for_lifetime_xp(lifetime_xp)
+    return (
+        new_level,
+        lifetime_xp - level_threshold(new_level),
+        xp_to_next_level(new_level),
+        new_level - level,
+    )
+
+
+def resolve_attribute_xp(level, current_xp, amount):
+    """
+    Apply an XP grant to an attribute.
+
+    Returns:
+        tuple: (level, current_xp, levels_gained)
+    """
+    levels_gained, current_xp = divmod(current_xp + amount, ATTRIBUTE_XP_PER_LEVEL)
+    return level + levels_gained, current_xp, levels_gained
@@ -50,6 +50,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.profiling.RequestProfilerMiddleware",  # superuser-only, on request (X-Profile header); needs request.user
+    "api.db_instrumentation.QueryInstrumentationMiddleware",  # session/user loads are lazy, so view-time queries include them
     "allauth.account.middleware.AccountMiddleware",  # required by allauth (newer versions)
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -81,6 +83,14 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Take the write lock when a transaction starts so concurrent
+            # completions queue up instead of failing with "database is locked"
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
+        # File-backed test DB so concurrency tests get real cross-connection locking
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
@@ -144,5 +154,74 @@ REST_AUTH = {
     'REGISTER_SERIALIZER': 'api.serializers.CustomRegisterSerializer',
 }
 
+# --- Cache ---
+# locmem is per process (fine for one worker); use the file backend, or any
+# shared backend, when several workers serve requests (see WEB_CONCURRENCY)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+            "OPTIONS": {"MAX_ENTRIES": 100000},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "habit-rpg",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+
+# Per-user read models (stats, equipped items, achievement progress)
+READ_MODEL_CACHE_TTL = 300  # seconds
+# Worker processes serving requests (the usual WEB_CONCURRENCY variable). With
+# more than one, read models are only cached on a shared backend.
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# --- Database instrumentation ---
+# Requests running one query fingerprint this many times are logged as likely N+1s
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv('DB_REPEATED_QUERY_THRESHOLD', '5'))
+# Log a line for every request, not only flagged ones
+DB_INSTRUMENTATION_LOG_ALL = os.getenv('DB_INSTRUMENTATION_LOG_ALL', 'False') == 'True'
+# Where on-demand request profiles are written
+PROFILE_OUTPUT_DIR = os.getenv('PROFILE_OUTPUT_DIR', str(BASE_DIR / 'profiles'))
+
+# --- Leaderboard ---
+# Memory-mapped rank snapshot shared by all worker processes
+LEADERBOARD_SNAPSHOT_PATH = os.getenv('LEADERBOARD_SNAPSHOT_PATH', str(BASE_DIR / 'leaderboard.snapshot'))
+
+# --- Tower ---
+# Reject floor clears the server-side combat simulation says were lost.
+# Off by default: the combat model isn't calibrated against the client yet,
+# so simulated losses are only logged until it is.
+TOWER_VERIFY_CLEARS = os.getenv('TOWER_VERIFY_CLEARS', 'False') == 'True'
+
 # --- OpenAI API Configuration ---
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
\ No newline at end of file
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+# AI difficulty score cache (in-process LRU + database table)
+AI_DIFFICULTY_CACHE_SIZE = 2048
+AI_DIFFICULTY_CACHE_TTL = 30 * 24 * 3600  # seconds
+
+# Background AI scoring for new habits (set ASYNC to False to score inline after commit)
+AI_SCORING_ASYNC = True
+# Workers mostly wait on the batcher, so there are enough of them to fill a batch
+AI_SCORING_WORKERS = 20
+
+# Micro-batching of AI scoring requests into a single prompt
+AI_BATCH_MAX_SIZE = 20
+AI_BATCH_WINDOW_MS = 50
+AI_BATCH_WAIT_SECONDS = 30  # Then the waiting caller falls back to the heuristic
+
+# Upstream failure handling: hard per-call deadline (seconds, no SDK retries),
+# circuit breaker, and an optional hedge that answers with the heuristic when
+# the AI takes longer than AI_HEDGE_MS (0 = off)
+AI_REQUEST_TIMEOUT = 10
+AI_MAX_RETRIES = 0
+AI_BREAKER_FAILURE_THRESHOLD = 5
+AI_BREAKER_RESET_SECONDS = 30
+AI_HEDGE_MS = int(os.getenv('AI_HEDGE_MS', '0'))
+AI_HEDGE_WORKERS = 4
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { Shield, Shirt, Palette, Loader, Lock, Check } from 'lucide-react'
+import { Shield, Shirt, Palette, Loader, Lock, Check, Sword } from 'lucide-react'
 import { gameApi } from '../services/gameApi'
 import { getThemePreviewImage } from '../utils/themeBackgrounds'
 import { getCharacterDefaultSprite } from '../utils/characterSprites'
@@ -7,6 +7,8 @@ import { getCharacterDefaultSprite } from '../utils/characterSprites'
 export function CharacterCustomizer({ onCharacterChanged, userStats }) {
   const [activeCategory, setActiveCategory] = useState('character')
   const [equipment, setEquipment] = useState([])
+  const [loot, setLoot] = useState([])
+  const [lootCursor, setLootCursor] = useState(null)
   const [characters, setCharacters] = useState([])
   const [currentCharacter, setCurrentCharacter] = useState('default')
   const [currentTheme, setCurrentTheme] = useState('Default Theme')
@@ -32,10 +34,16 @@ export function CharacterCustomizer({ onCharacterChanged, userStats }) {
       label: 'Themes',
       icon: <Palette size={18} />,
     },
+    {
+      id: 'loot',
+      label: 'Loot',
+      icon: <Sword size={18} />,
+    },
   ]
 
   useEffect(() => {
     loadEquipment()
+    loadLoot()
     loadCharacters()
   }, [])
 
@@ -61,6 +69,25 @@ export function CharacterCustomizer({ onCharacterChanged, userStats }) {
     }
   }
 
+  // Tower drops come from the paginated inventory, one entry per item
+  const loadLoot = async (after = null) => {
+    try {
+      setError(null)
+      const data = await gameApi.getInventory({ type: 'outfit', ...(after ? { after } : {}) })
+      const items = data.results.map(row => ({
+        ...row.equipment,
+        id: row.id,
+        is_equipped: row.is_equipped,
+        is_unlocked: true,
+      }))
+      setLoot(previous => (after ? [...previous, ...items] : items))
+      setLootCursor(data.next_cursor)
+    } catch (err) {
+      console.error('Failed to load loot:', err)
+      setError('Failed to load loot')
+    }
+  }
+
   const loadCharacters = async () => {
     try {
       setLoading(true)
@@ -120,6 +147,23 @@ export function CharacterCustomizer({ onCharacterChanged, userStats }) {
     }
   }
 
+  const handleEquipLoot = async (itemId) => {
+    try {
+      setEquippingId(itemId)
+      const result = await gameApi.equipInventoryItem(itemId)
+      // Equipping one drop can unequip another in the same slot on any page
+      await loadLoot()
+      if (onCharacterChanged && result.user_stats) {
+        onCharacterChanged(result.user_stats)
+      }
+    } catch (err) {
+      console.error('Failed to equip item:', err)
+      setError('Failed to equip item')
+    } finally {
+      setEquippingId(null)
+    }
+  }
+
   const handleSelectCharacter = async (characterId) => {
     try {
       setSelectingCharacterId(characterId)
@@ -174,6 +218,8 @@ export function CharacterCustomizer({ onCharacterChanged, userStats }) {
 
   const filteredItems = activeCategory === 'character'
     ? characters
+    : activeCategory === 'loot'
+    ? loot
     : equipment.filter(item => {
         // Filter by category
         if (activeCategory === 'armor') {
@@ -289,6 +335,8 @@ export function CharacterCustomizer({ onCharacterChanged, userStats }) {
                         ) : (
                           <Palette size={32} className={isUnlocked ? "text-rulebook-ink" : "text-rulebook-ink/30"} />
                         )
+                      ) : activeCategory === 'loot' ? (
+                        <Sword size={32} className="text-rulebook-ink" />
                       ) : null}
                     </div>
 
@@ -353,7 +401,7 @@ export function CharacterCustomizer({ onCharacterChanged, userStats }) {
                       </button>
                     ) : (
                       <button
-                        onClick={() => handleEquip(item.id)}
+                        onClick={() => (activeCategory === 'loot' ? handleEquipLoot(item.id) : handleEquip(item.id))}
                         disabled={!item.is_unlocked || equippingId === item.id || (isTheme && isThemeSelected) || (activeCategory === 'armor' && item.is_equipped)}
                         className={`px-4 py-2 text-xs font-serif font-bold uppercase tracking-widest border-2 transition-all shadow-sm ${item.is_unlocked
                             ? isTheme
@@ -400,6 +448,17 @@ export function CharacterCustomizer({ onCharacterChanged, userStats }) {
           })
         )}
       </div>
+
+      {activeCategory === 'loot' && lootCursor && (
+        <div className="mt-6 flex justify-center">
+          <button
+            onClick={() => loadLoot(lootCursor)}
+            className="px-4 py-2 text-xs font-serif font-bold uppercase tracking-widest border-2 bg-rulebook-ink/5 text-rulebook-ink border-rulebook-ink/30 hover:border-rulebook-crimson transition-colors"
+          >
+            Load More
+          </button>
+        </div>
+      )}
     </div>
   )
 }
\ No newline at end of file
@@ -62,6 +62,12 @@ export function Tower() {
             }
         } catch (error) {
             console.error('Failed to complete floor:', error);
+            // The server's replay lost the floor: treat it as a defeat (the retry gets new waves)
+            if (error.response?.data?.defeat) {
+                setGameState('defeat');
+            } else {
+                handleReturnToLobby();
+            }
         }
     };
 
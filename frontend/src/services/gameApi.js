@@ -93,6 +93,12 @@ export const gameApi = {
     return response.data
   },
 
+  // Own items only, one page at a time; pass next_cursor back as `after`
+  getInventory: async (params = {}) => {
+    const response = await api.get('/api/game/equipment/inventory/', { params })
+    return response.data
+  },
+
   getEquippedItems: async () => {
     const response = await api.get('/api/game/equipment/equipped/')
     return response.data
@@ -103,6 +109,12 @@ export const gameApi = {
     return response.data
   },
 
+  // Equip/unequip one inventory row (tower loot drops can share a template)
+  equipInventoryItem: async (itemId) => {
+    const response = await api.post(`/api/game/equipment/inventory/${itemId}/equip/`)
+    return response.data
+  },
+
   // Onboarding
   createInitialHabits: async (surveyData) => {
     const response = await api.post('/api/create-initial-habits/', surveyData)